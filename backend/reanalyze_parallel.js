@@ -9,6 +9,10 @@ console.log('PARALLEL RE-ANALYSIS WITH LUFS NORMALIZATION');
 console.log('Fair energy comparison + faster processing');
 console.log('═══════════════════════════════════════════════════════\n');
 
+// Checkpoint journal: an interrupted run (deploy, crash) resumes where it stopped.
+// A journal left by a run with other analysis parameters is moved aside, not resumed.
+const journalFile = path.join(__dirname, '.reanalyze_parallel.journal.ndjson');
+
 async function runParallelAnalysis(tracksData) {
   return new Promise((resolve, reject) => {
     // Write tracks to temp JSON file
@@ -16,7 +20,7 @@ async function runParallelAnalysis(tracksData) {
     fs.writeFileSync(tempFile, JSON.stringify(tracksData, null, 2));
 
     const pythonScript = path.join(__dirname, 'src/python/batch_analyzer.py');
-    const python = spawn('python3', [pythonScript, tempFile]);
+    const python = spawn('python3', [pythonScript, tempFile, '--journal', journalFile, '--discard-stale-journal']);
 
     let output = '';
     let error = '';
@@ -28,7 +32,7 @@ async function runParallelAnalysis(tracksData) {
     python.stderr.on('data', (data) => {
       const msg = data.toString();
       // Print progress messages
-      if (msg.includes('Analyzing') || msg.includes('Success') || msg.includes('Errors')) {
+      if (msg.includes('Analyzing') || msg.includes('Journal') || msg.includes('Success') || msg.includes('Errors')) {
         process.stderr.write(msg);
       }
       error += msg;
@@ -130,6 +134,9 @@ async function main() {
 
     const elapsed = ((Date.now() - startTime) / 1000).toFixed(1);
 
+    // Run finished and was stored - the next run should start fresh
+    try { fs.unlinkSync(journalFile); } catch (e) { }
+
     console.log('\n═══════════════════════════════════════════════════════');
     console.log('PARALLEL RE-ANALYSIS COMPLETE');
     console.log('═══════════════════════════════════════════════════════');
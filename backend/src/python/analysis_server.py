@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Persistent analysis worker
+Keeps librosa, scipy, sklearn and numba loaded between requests so callers
+don't pay interpreter start-up and import time for every file.
+
+Protocol: newline-delimited JSON over stdin/stdout (default) or a Unix socket.
+
+Request:  {"id": "req-1", "method": "analyze_audio", "params": {"audio_path": "/x.mp3"}}
+Response: {"id": "req-1", "result": {...}}   or   {"id": "req-1", "error": "message"}
+
+Methods:
+    analyze_audio             params: audio_path, include_quality, detect_highlights, num_highlights,
+                                      highlight_seconds, streaming, tier, profile, lean
+    analyze_track_collection  params: tracks (list of track dicts, as sonic_palette_analyzer.py),
+                                      num_workers, time_budget, max_tracks, include_state
+    update_track_collection   params: state (from include_state), tracks (new or changed tracks, or
+                                      stored feature records), full_collection, removed_paths,
+                                      max_tracks, num_workers, time_budget
+    profile_track_library     params: tracks, or tracks_file (JSON array or NDJSON, read lazily); state,
+                                      num_workers, time_budget, shard ([index, count])
+    merge_library_states      params: states (library states of disjoint shards)
+    analyze_photo_collection  params: photos (list of photo dicts, as visual_dna_analyzer.py), quantizer,
+                                      decode_workers, color_space, use_cache, mode, previous_palette
+    stream_photo_collection   params: photos, or photos_file (JSON array or NDJSON, read lazily);
+                                      sample_size, plus the analyze_photo_collection options
+    ping                      liveness check
+    shutdown                  finish in-flight requests, then exit
+
+Requests run concurrently on a thread pool, so responses may arrive out of
+order - match them by id.
+"""
+
+import os
+import sys
+import json
+import signal
+import argparse
+import importlib
+import multiprocessing
+import threading
+import socketserver
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# stdout is the protocol channel in stdio mode; anything the analyzers print
+# (progress, warnings, import errors) must not corrupt it
+PROTOCOL_OUT = sys.stdout
+sys.stdout = sys.stderr
+
+
+class ServerShutdown(Exception):
+    """Raised in the main thread to stop accepting requests"""
+
+
+def load_analyzers():
+    """
+    Import every analyzer once at start-up (this is the expensive part).
+    An analyzer with missing dependencies only disables its own methods.
+    """
+    modules = {}
+    for name in ('audio_analyzer', 'sonic_palette_analyzer', 'visual_dna_analyzer'):
+        try:
+            modules[name] = __import__(name)
+        except (ImportError, SystemExit) as e:
+            print(f"Analyzer {name} unavailable: {e}", file=sys.stderr)
+            modules[name] = None
+    return modules
+
+
+def configure_process_pools(modules):
+    """
+    Requests run on threads, and forking a multithreaded process can copy a
+    lock another thread holds into the child, deadlocking it. Analyzer
+    process pools start their workers from a fork server (or spawn) instead.
+    """
+    sonic = modules.get('sonic_palette_analyzer')
+    if sonic is None:
+        return
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        sonic.POOL_START_METHOD = 'forkserver'
+        # Workers fork from a server that has already imported the analyzer
+        multiprocessing.set_forkserver_preload(['sonic_palette_analyzer'])
+    else:
+        sonic.POOL_START_METHOD = 'spawn'
+
+
+# Analyzers import these lazily; the server loads them up front instead
+# so the first request does not pay for them
+HEAVY_DEPENDENCIES = (
+    'scipy.signal',
+    'pyloudnorm',
+    'sklearn.cluster',
+    'librosa.beat',
+    'librosa.feature',
+    'librosa.onset',
+)
+
+
+def preload_dependencies():
+    for name in HEAVY_DEPENDENCIES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            print(f"Preload of {name} skipped: {e}", file=sys.stderr)
+
+
+# Options shared by the photo collection methods
+PHOTO_OPTIONS = ('quantizer', 'decode_workers', 'color_space', 'use_cache', 'mode', 'previous_palette')
+
+
+def build_methods(modules):
+    """Map protocol method names to analyzer calls"""
+
+    def require(name):
+        module = modules.get(name)
+        if module is None:
+            raise RuntimeError(f"{name} is not available (missing dependency)")
+        return module
+
+    def analyze_audio(params):
+        return require('audio_analyzer').analyze_audio(**params)
+
+    def analyze_track_collection(params):
+        options = {k: params[k] for k in ('num_workers', 'time_budget', 'max_tracks', 'include_state')
+                   if k in params}
+        return require('sonic_palette_analyzer').analyze_track_collection(params.get('tracks', []), **options)
+
+    def update_track_collection(params):
+        options = {k: params[k] for k in ('num_workers', 'time_budget', 'max_tracks', 'full_collection',
+                                          'removed_paths') if k in params}
+        return require('sonic_palette_analyzer').update_track_collection(params.get('state'),
+                                                                        params.get('tracks', []), **options)
+
+    def profile_track_library(params):
+        sonic = require('sonic_palette_analyzer')
+        options = {k: params[k] for k in ('state', 'num_workers', 'time_budget') if k in params}
+        if params.get('shard'):
+            options['shard'] = tuple(params['shard'])
+        if params.get('tracks_file'):
+            tracks = sonic.iter_tracks_file(params['tracks_file'])
+        else:
+            tracks = params.get('tracks', [])
+        return sonic.profile_track_library(tracks, **options)
+
+    def merge_library_states(params):
+        sonic = require('sonic_palette_analyzer')
+        merged = sonic.merge_library_states(params.get('states', []))
+        result = sonic.build_library_dna(merged)
+        result['state'] = merged.to_dict()
+        return result
+
+    def analyze_photo_collection(params):
+        options = {k: params[k] for k in PHOTO_OPTIONS if k in params}
+        return require('visual_dna_analyzer').analyze_photo_collection(params.get('photos', []), **options)
+
+    def stream_photo_collection(params):
+        visual_dna = require('visual_dna_analyzer')
+        options = {k: params[k] for k in PHOTO_OPTIONS + ('sample_size',) if k in params}
+        if params.get('photos_file'):
+            photos = visual_dna.iter_photos_file(params['photos_file'])
+        else:
+            photos = params.get('photos', [])
+        return visual_dna.stream_photo_collection(photos, **options)
+
+    return {
+        'analyze_audio': analyze_audio,
+        'analyze_track_collection': analyze_track_collection,
+        'update_track_collection': update_track_collection,
+        'profile_track_library': profile_track_library,
+        'merge_library_states': merge_library_states,
+        'analyze_photo_collection': analyze_photo_collection,
+        'stream_photo_collection': stream_photo_collection
+    }
+
+
+class AnalysisWorker:
+    """
+    Dispatches JSON-lines requests onto a shared thread pool
+    """
+
+    def __init__(self, num_workers=2):
+        modules = load_analyzers()
+        configure_process_pools(modules)
+        self.methods = build_methods(modules)
+        preload_dependencies()
+        self.executor = ThreadPoolExecutor(max_workers=num_workers)
+        self.shutdown_requested = threading.Event()
+        self.on_shutdown = None
+
+    def handle_line(self, line, respond):
+        """
+        Parse one request line and schedule it
+        respond(dict) is called exactly once with the response
+        Returns the pending future for scheduled requests, else None
+        """
+        line = line.strip()
+        if not line:
+            return
+
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('request must be a JSON object')
+        except ValueError as e:
+            respond({'id': None, 'error': f'Invalid request: {e}'})
+            return
+
+        request_id = request.get('id')
+        method = request.get('method')
+        params = request.get('params') or {}
+
+        if method == 'ping':
+            respond({'id': request_id, 'result': {'status': 'ok', 'pid': os.getpid(), 'methods': sorted(self.methods)}})
+            return
+
+        if method == 'shutdown':
+            respond({'id': request_id, 'result': {'status': 'shutting_down'}})
+            self.request_shutdown()
+            return
+
+        if self.shutdown_requested.is_set():
+            respond({'id': request_id, 'error': 'Server is shutting down'})
+            return
+
+        handler = self.methods.get(method)
+        if handler is None:
+            respond({'id': request_id, 'error': f'Unknown method: {method}'})
+            return
+
+        if not isinstance(params, dict):
+            respond({'id': request_id, 'error': 'params must be a JSON object'})
+            return
+
+        return self.executor.submit(self._run, handler, params, request_id, respond)
+
+    def _run(self, handler, params, request_id, respond):
+        try:
+            respond({'id': request_id, 'result': handler(params)})
+        except Exception as e:
+            respond({'id': request_id, 'error': str(e)})
+
+    def request_shutdown(self):
+        self.shutdown_requested.set()
+        if self.on_shutdown:
+            self.on_shutdown()
+
+    def drain(self):
+        """Wait for every in-flight request to finish"""
+        self.executor.shutdown(wait=True)
+
+
+def make_writer(stream):
+    """Thread-safe JSON-lines writer (responses come from pool threads)"""
+    lock = threading.Lock()
+
+    def respond(message):
+        data = json.dumps(message) + '\n'
+        with lock:
+            try:
+                stream.write(data)
+                stream.flush()
+            except (BrokenPipeError, ValueError, OSError):
+                # Client went away - nothing left to deliver to
+                pass
+
+    return respond
+
+
+def raise_shutdown(signum, frame):
+    raise ServerShutdown()
+
+
+def serve_stdio(worker):
+    """Serve requests from stdin until EOF, shutdown request or SIGTERM"""
+    respond = make_writer(PROTOCOL_OUT)
+
+    try:
+        for line in sys.stdin:
+            worker.handle_line(line, respond)
+            if worker.shutdown_requested.is_set():
+                break
+    except (ServerShutdown, KeyboardInterrupt):
+        pass
+
+    worker.shutdown_requested.set()
+    worker.drain()
+
+
+class _TextWriter:
+    """Adapts a binary socket stream to the text writer interface"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, data):
+        self.stream.write(data.encode('utf-8'))
+
+    def flush(self):
+        self.stream.flush()
+
+
+def serve_socket(worker, socket_path):
+    """Serve requests on a Unix socket; each connection may pipeline requests"""
+
+    class RequestHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            respond = make_writer(_TextWriter(self.wfile))
+            pending = []
+            for raw in self.rfile:
+                future = worker.handle_line(raw.decode('utf-8', errors='replace'), respond)
+                if future is not None:
+                    pending.append(future)
+                if worker.shutdown_requested.is_set():
+                    break
+
+            # Keep the connection open until this client's responses are written
+            wait(pending)
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    server = Server(socket_path, RequestHandler)
+    # server.shutdown() blocks until serve_forever returns, so call it off-thread
+    worker.on_shutdown = lambda: threading.Thread(target=server.shutdown).start()
+
+    print(f"Analysis worker listening on {socket_path}", file=sys.stderr)
+
+    try:
+        server.serve_forever()
+    except (ServerShutdown, KeyboardInterrupt):
+        pass
+    finally:
+        worker.shutdown_requested.set()
+        worker.drain()
+        server.server_close()
+        try:
+            os.unlink(socket_path)
+        except OSError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Persistent JSON-lines analysis worker')
+    parser.add_argument('--socket', help='Listen on this Unix socket path instead of stdin/stdout')
+    parser.add_argument('--workers', type=int, default=2, help='Concurrent requests (default: 2)')
+
+    args = parser.parse_args()
+
+    signal.signal(signal.SIGTERM, raise_shutdown)
+
+    worker = AnalysisWorker(num_workers=max(1, args.workers))
+
+    if args.socket:
+        serve_socket(worker, args.socket)
+    else:
+        serve_stdio(worker)
+
+    print("Analysis worker stopped", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
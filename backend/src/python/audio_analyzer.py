@@ -5,31 +5,389 @@ Enhanced audio analyzer with quality scoring and highlight detection
 
 import sys
 import json
+import time
 import argparse
 import numpy as np
-import librosa
-from scipy.signal import find_peaks
-import pyloudnorm as pyln
+import librosa  # submodules load on first use
+
+import feature_cache
+
+# scipy.signal and pyloudnorm (~1 s of imports) are loaded inside the functions
+# that need them, so cache hits and --help never pay for them
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Bump when analysis output changes so cached results are recomputed
+ANALYZER_VERSION = '5'
+
+# Shared STFT parameters (librosa defaults, used by every spectral feature)
+N_FFT = 2048
+HOP_LENGTH = 512
+
+# Fidelity tiers: trade accuracy for speed (bulk imports run 'fast' and can be
+# upgraded later; single uploads keep 'full')
+#   sr          decode sample rate (None = native)
+#   res_type    resampler quality when sr is set
+#   n_fft, hop  STFT size; halved at 22.05 kHz so frames keep the same duration
+#               (onset strength per frame, and so energy, stays on the same scale)
+#   chroma      'cqt' (accurate, slow) or 'stft' (reuses the shared spectrogram)
+#   octave_only only try 2x / 0.5x BPM corrections, not the dubstep ratios
+ANALYSIS_TIERS = {
+    'fast': {'sr': 22050, 'res_type': 'soxr_mq', 'n_fft': 1024, 'hop': 256,
+             'chroma': 'stft', 'octave_only': True},
+    'standard': {'sr': 22050, 'res_type': 'soxr_hq', 'n_fft': 1024, 'hop': 256,
+                 'chroma': 'cqt', 'octave_only': False},
+    'full': {'sr': None, 'res_type': None, 'n_fft': N_FFT, 'hop': HOP_LENGTH,
+             'chroma': 'cqt', 'octave_only': False}
+}
+DEFAULT_TIER = 'full'
+
+# Default highlight length
+HIGHLIGHT_SECONDS = 10.0
+
+
+def get_tier(tier):
+    """Settings for a named fidelity tier"""
+    if tier not in ANALYSIS_TIERS:
+        raise ValueError(f"Unknown analysis tier: {tier} (choose from {', '.join(ANALYSIS_TIERS)})")
+    return ANALYSIS_TIERS[tier]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, or None if unavailable"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class StageProfiler:
+    """
+    Lap timer behind analyze_audio(profile=True)
+    lap(name) charges the time since the previous lap to that stage. When
+    disabled every call is a no-op, so the laps stay in the normal code path.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stages = {}
+        self.info = {}
+        self.arrays = {}
+        self.start = self.last = time.perf_counter()
+
+    def lap(self, name):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.stages[name] = self.stages.get(name, 0.0) + (now - self.last)
+        self.last = now
+
+    def note(self, **info):
+        if self.enabled:
+            self.info.update(info)
+
+    def array(self, name, value):
+        """Record the size of a large intermediate array"""
+        if self.enabled:
+            self.arrays[name] = {'shape': list(value.shape), 'mb': value.nbytes / (1024 * 1024)}
+
+    def report(self):
+        """The 'timings' block added to profiled results"""
+        return {
+            'total_s': time.perf_counter() - self.start,
+            'stages': dict(self.stages),
+            **self.info,
+            'arrays': dict(self.arrays),
+            # Process-wide: includes other requests running in the same process
+            'peak_rss_mb': peak_rss_mb()
+        }
+
+
+# Frames per chunk in lean mode (~12 s of audio at 44.1 kHz / hop 512)
+LEAN_CHUNK_FRAMES = 1024
+
+
+def centered_frame_count(n_samples, frame_length, hop_length):
+    """Frames librosa produces for a centered (center=True) analysis"""
+    return 1 + (n_samples + 2 * (frame_length // 2) - frame_length) // hop_length
+
+
+def iter_frame_segments(y, frame_length, hop_length, pad_mode='constant', chunk_frames=LEAN_CHUNK_FRAMES):
+    """
+    Centered framing, chunk by chunk
+    Yields (first_frame, segment): the padded signal under up to chunk_frames
+    consecutive frames, ready for center=False feature calls. Gives the same
+    frames as center=True on the whole signal without a padded copy of it or a
+    full-length framed / complex intermediate.
+    """
+    pad = frame_length // 2
+    n_frames = centered_frame_count(len(y), frame_length, hop_length)
+
+    for first in range(0, n_frames, chunk_frames):
+        last = min(first + chunk_frames, n_frames)
+        lo = first * hop_length - pad
+        hi = (last - 1) * hop_length + frame_length - pad
+
+        segment = y[max(lo, 0):min(hi, len(y))]
+        before, after = max(0, -lo), max(0, hi - len(y))
+        if before or after:
+            segment = np.pad(segment, (before, after), mode=pad_mode)
+        yield first, segment
+
+
+def framewise(y, feature, frame_length=N_FFT, hop_length=HOP_LENGTH, pad_mode='constant'):
+    """
+    A librosa frame feature (rms, zero_crossing_rate) computed chunk by chunk
+    pad_mode must match the feature's own centering (rms: constant, zcr: edge)
+    """
+    return np.concatenate([
+        feature(y=segment, frame_length=frame_length, hop_length=hop_length, center=False)[0]
+        for _, segment in iter_frame_segments(y, frame_length, hop_length, pad_mode)
+    ])
+
+
+def spectral_framewise(feature, S, sr, n_fft, chunk_frames=LEAN_CHUNK_FRAMES):
+    """
+    A per-frame spectral feature (centroid, rolloff, contrast) over column
+    chunks of S - librosa promotes the whole spectrogram to float64 otherwise
+    """
+    return np.concatenate([
+        feature(S=S[:, i:i + chunk_frames], sr=sr, n_fft=n_fft)
+        for i in range(0, S.shape[1], chunk_frames)
+    ], axis=1)
+
+
+def spectrogram_chunks(S, chunk_frames=LEAN_CHUNK_FRAMES, power=1):
+    for i in range(0, S.shape[1], chunk_frames):
+        chunk = S[:, i:i + chunk_frames]
+        yield chunk if power == 1 else chunk ** power
+
+
+def estimate_tuning_chunks(chunks, sr, n_fft, bins_per_octave):
+    """
+    librosa.estimate_tuning over spectrogram chunks
+    Exact: piptrack is frame-local, and only the detected pitches (with their
+    magnitudes, for the global median threshold) are kept between chunks
+    """
+    pitches, mags = [], []
+    for S in chunks:
+        pitch, mag = librosa.piptrack(S=S, sr=sr, n_fft=n_fft)
+        found = pitch > 0
+        pitches.append(pitch[found])
+        mags.append(mag[found])
+
+    pitch = np.concatenate(pitches)
+    mag = np.concatenate(mags)
+    threshold = np.median(mag) if len(mag) else 0.0
+    return librosa.pitch_tuning(pitch[mag >= threshold], bins_per_octave=bins_per_octave)
+
+
+def chroma_lean(y, sr, ctx, mode='cqt', chunk_seconds=30.0, margin_seconds=2.0):
+    """
+    Chromagram without full-length CQT / power-spectrogram intermediates
+
+    Tuning is estimated once over the whole track (as librosa does), then the
+    chroma is built chunk by chunk. STFT chroma is frame-local, so exact. CQT
+    chunks overlap by margin_seconds (longer than the lowest filter) and only
+    their interior frames are kept.
+    """
+    n_fft, hop = ctx['n_fft'], ctx['hop_length']
+
+    if mode == 'stft':
+        tuning = estimate_tuning_chunks(spectrogram_chunks(ctx['S'], power=2), sr, n_fft, bins_per_octave=12)
+        return np.concatenate([
+            librosa.feature.chroma_stft(S=chunk, sr=sr, n_fft=n_fft, tuning=tuning)
+            for chunk in spectrogram_chunks(ctx['S'], power=2)
+        ], axis=1)
+
+    # chroma_cqt tunes from a 2048 / 512 magnitude STFT at 36 bins per octave
+    if n_fft == 2048 and hop == 512:
+        chunks = spectrogram_chunks(ctx['S'])
+    else:
+        chunks = (np.abs(librosa.stft(segment, n_fft=2048, hop_length=512, center=False))
+                  for _, segment in iter_frame_segments(y, 2048, 512))
+    tuning = estimate_tuning_chunks(chunks, sr, 2048, bins_per_octave=36)
+
+    chunk = max(1, int(chunk_seconds * sr) // hop) * hop
+    margin = int(margin_seconds * sr) // hop * hop
+    parts = []
+    for start in range(0, len(y), chunk):
+        lo = max(0, start - margin)
+        hi = min(len(y), start + chunk + margin)
+        chroma = librosa.feature.chroma_cqt(y=y[lo:hi], sr=sr, hop_length=hop, tuning=tuning)
+        first = start // hop - lo // hop
+        last = min(start + chunk, len(y) + hop) // hop - lo // hop
+        parts.append(chroma[:, first:last])
+    return np.concatenate(parts, axis=1)
+
+
+def integrated_loudness_blocks(y, sr, block_seconds=10.0):
+    """
+    BS.1770 integrated loudness measured block by block (same value as
+    pyloudnorm.Meter.integrated_loudness, without full-length filtered copies)
+    """
+    from audio_stream_analyzer import GatedLoudness
+
+    meter = GatedLoudness(sr)
+    block = int(block_seconds * sr)
+    for start in range(0, len(y), block):
+        meter.add(y[start:start + block])
+    return meter.integrated()
+
+
+def build_feature_context(y, sr, n_fft=N_FFT, hop_length=HOP_LENGTH, lean=False):
+    """
+    Compute the per-track spectral front-end once so every feature can reuse it.
+
+    librosa recomputes an STFT inside each spectral feature call; on long DJ sets
+    that dominates run time. The magnitude spectrogram is built once here and the
+    onset envelope is derived from its mel projection.
+
+    The onset envelope is a first difference of log-mel power, so it is unchanged
+    by the scalar gain of LUFS normalization: one envelope serves both the rhythm
+    features and the spectral flux energy term. Beat tracking gets its own
+    median-aggregated envelope from the same log-mel power, as beat_track(y=...)
+    would build.
+
+    lean=True fills float32 magnitude and mel matrices chunk by chunk, so the
+    complex STFT and the squared spectrogram never exist at full length.
+    """
+    if lean:
+        n_frames = centered_frame_count(len(y), n_fft, hop_length)
+        mel_basis = librosa.filters.mel(sr=sr, n_fft=n_fft).astype(np.float32)
+        S = np.empty((1 + n_fft // 2, n_frames), dtype=np.float32)
+        mel_power = np.empty((mel_basis.shape[0], n_frames), dtype=np.float32)
+
+        for first, segment in iter_frame_segments(y, n_fft, hop_length):
+            chunk = np.abs(librosa.stft(segment, n_fft=n_fft, hop_length=hop_length, center=False))
+            S[:, first:first + chunk.shape[1]] = chunk
+            mel_power[:, first:first + chunk.shape[1]] = mel_basis @ (chunk * chunk)
+    else:
+        S = np.abs(librosa.stft(y, n_fft=n_fft, hop_length=hop_length))
+        mel_power = librosa.feature.melspectrogram(S=S ** 2, sr=sr)
+
+    mel_db = librosa.power_to_db(mel_power)
+    onset_env = librosa.onset.onset_strength(S=mel_db, sr=sr, hop_length=hop_length)
+
+    # beat_track(y=...) aggregates its envelope over mel bands with the median,
+    # not the mean; keep that envelope for beat tracking so BPM is unchanged
+    beat_onset_env = librosa.onset.onset_strength(S=mel_db, sr=sr, hop_length=hop_length,
+                                                  aggregate=np.median)
+
+    return {
+        'sr': sr,
+        'n_fft': n_fft,
+        'hop_length': hop_length,
+        'lean': lean,
+        'S': S,
+        'onset_env': onset_env,
+        'beat_onset_env': beat_onset_env
+    }
+
+
+def build_rhythm_features(ctx):
+    """
+    Rhythm stage: tempogram built once from the shared onset envelope.
+    Stores the per-lag mean tempogram so any number of candidate tempos
+    can be scored with a single array lookup.
+    """
+    if 'tempogram_mean' in ctx:
+        return ctx
+
+    ctx['tempogram_mean'] = tempogram_mean(ctx['onset_env'], ctx['sr'], ctx['hop_length'])
+    ctx['tempo_freqs'] = librosa.tempo_frequencies(
+        len(ctx['tempogram_mean']),
+        sr=ctx['sr'],
+        hop_length=ctx['hop_length']
+    )
+    return ctx
+
+
+def tempogram_mean(onset_env, sr, hop_length=HOP_LENGTH, win_length=384, chunk_frames=1024):
+    """
+    Mean over time of librosa.feature.tempogram, computed in chunks
+
+    Each tempogram column only depends on win_length onset frames around it,
+    so chunks padded with that much context give the same columns as the full
+    tempogram without holding a (win_length x n_frames) matrix - which for a
+    2-hour set would be ~1 GB.
+    """
+    n_frames = len(onset_env)
+    if n_frames <= chunk_frames:
+        tempogram = librosa.feature.tempogram(onset_envelope=onset_env, sr=sr,
+                                              hop_length=hop_length, win_length=win_length)
+        return np.mean(tempogram, axis=1)
+
+    # Same edge handling as the centered full tempogram (linear ramp padding)
+    pad = win_length // 2
+    padded = np.pad(onset_env, pad, mode='linear_ramp', end_values=[0, 0])
+
+    total = np.zeros(win_length)
+    for start in range(0, n_frames, chunk_frames):
+        stop = min(start + chunk_frames, n_frames)
+        # Columns start..stop of the full tempogram see padded[start : stop + 2 * pad]
+        segment = padded[start:stop + 2 * pad]
+        tempogram = librosa.feature.tempogram(onset_envelope=segment, sr=sr, hop_length=hop_length,
+                                              win_length=win_length, center=False)
+        total += np.sum(tempogram[:, :stop - start], axis=1)
+
+    return total / n_frames
+
+
+def track_beats(onset_env, sr, hop_length=HOP_LENGTH):
+    """
+    librosa.beat.beat_track on an onset envelope, with the global tempo
+    estimated from a chunked tempogram (same result, without materializing
+    the full autocorrelation tempogram, which takes gigabytes on long sets)
+    """
+    ac_win = int(librosa.time_to_frames(8.0, sr=sr, hop_length=hop_length))
+    tg = tempogram_mean(onset_env, sr, hop_length, win_length=ac_win)[:, np.newaxis]
+    bpm = librosa.feature.tempo(onset_envelope=onset_env, sr=sr, hop_length=hop_length, tg=tg)
+    return librosa.beat.beat_track(onset_envelope=onset_env, sr=sr, hop_length=hop_length, bpm=bpm)
+
 
-def validate_bpm_with_multiples(tempo, y, sr, filename=''):
+def score_tempo_candidates(ctx, candidates):
+    """
+    Score candidate tempos against the tempogram in one vectorized pass
+    Returns the mean tempogram energy at the lag closest to each candidate
+    """
+    build_rhythm_features(ctx)
+    candidates = np.asarray(candidates, dtype=float).ravel()
+
+    # Closest tempogram lag for every candidate at once
+    idx = np.argmin(np.abs(ctx['tempo_freqs'][np.newaxis, :] - candidates[:, np.newaxis]), axis=1)
+    return ctx['tempogram_mean'][idx]
+
+
+def extract_filename_bpm(filename):
+    """
+    BPM hint from the filename (many producers include it), or None
+    """
+    import re
+    bpm_pattern = r'\b(\d{2,3})\s*(?:bpm|BPM)?\b'
+    matches = re.findall(bpm_pattern, filename)
+    for match in matches:
+        potential_bpm = int(match)
+        if 60 <= potential_bpm <= 200:  # Reasonable BPM range
+            return potential_bpm
+    return None
+
+
+def validate_bpm_with_multiples(tempo, y, sr, filename='', ctx=None, octave_only=False):
     """
     Check if detected BPM makes sense or if a multiple/division is more accurate
     Common issues:
     - Drum & Bass detected as half (86 instead of 174)
     - Dubstep detected as 1.2x or 1.5x (147 instead of 124)
     - Slow tracks detected as double (180 instead of 90)
+    octave_only=True skips the dubstep ratios (fewer candidates for the fast tier)
     """
     # Try to extract BPM from filename (many producers include it)
-    import re
-    filename_bpm = None
-    bpm_pattern = r'\b(\d{2,3})\s*(?:bpm|BPM)?\b'
-    matches = re.findall(bpm_pattern, filename)
-    if matches:
-        for match in matches:
-            potential_bpm = int(match)
-            if 60 <= potential_bpm <= 200:  # Reasonable BPM range
-                filename_bpm = potential_bpm
-                break
+    filename_bpm = extract_filename_bpm(filename)
 
     # If filename has BPM, trust it (unless very different from detection)
     if filename_bpm:
@@ -53,7 +411,7 @@ def validate_bpm_with_multiples(tempo, y, sr, filename=''):
 
     # If detected BPM is in awkward range (145-155), check 0.8x or 1.2x
     # (might be dubstep detected wrong)
-    if 145 <= tempo <= 155:
+    if 145 <= tempo <= 155 and not octave_only:
         candidates.append(tempo / 1.2)  # ~124 dubstep
         candidates.append(tempo * 0.8)
 
@@ -61,32 +419,25 @@ def validate_bpm_with_multiples(tempo, y, sr, filename=''):
     if tempo > 170:
         candidates.append(tempo / 2)
 
-    # Calculate onset strength for each candidate to see which fits best
-    onset_env = librosa.onset.onset_strength(y=y, sr=sr)
-    best_tempo = tempo
-    best_score = 0
+    # Score every candidate against the shared tempogram in one lookup
+    if ctx is None:
+        ctx = build_feature_context(y, sr)
 
-    for candidate in candidates:
-        # Calculate how well this BPM matches the onset patterns
-        # Use tempogram to see energy at this BPM
-        if candidate > 0:
-            try:
-                tempogram = librosa.feature.tempogram(onset_envelope=onset_env, sr=sr)
-                tempo_freqs = librosa.core.tempo_frequencies(len(tempogram), sr=sr)
+    candidates = np.asarray(candidates, dtype=float).ravel()
+    candidates = candidates[candidates > 0]
+    if len(candidates) == 0:
+        return tempo
 
-                # Find closest frequency to candidate BPM
-                idx = np.argmin(np.abs(tempo_freqs - candidate))
-                score = np.mean(tempogram[idx])
+    scores = score_tempo_candidates(ctx, candidates)
 
-                if score > best_score:
-                    best_score = score
-                    best_tempo = candidate
-            except:
-                pass
+    # First candidate with the highest positive score wins (detected tempo on ties)
+    best = int(np.argmax(scores))
+    if scores[best] > 0:
+        return float(candidates[best])
 
-    return best_tempo
+    return tempo
 
-def detect_halftime(y, sr, tempo, beat_frames):
+def detect_halftime(y, sr, tempo, beat_frames, onset_env=None, duration=None, hop_length=HOP_LENGTH):
     """
     Detect half-time feel (high BPM but feels slower)
     Common in: R&B, slow jams, chill trap, lo-fi hip hop
@@ -98,16 +449,19 @@ def detect_halftime(y, sr, tempo, beat_frames):
         return False, tempo
 
     # Calculate onset strength (how pronounced the beats are)
-    onset_env = librosa.onset.onset_strength(y=y, sr=sr)
+    if onset_env is None:
+        onset_env = librosa.onset.onset_strength(y=y, sr=sr)
 
     # Count actual onsets (detected beats)
-    onset_frames = librosa.onset.onset_detect(y=y, sr=sr, units='frames')
+    onset_frames = librosa.onset.onset_detect(onset_envelope=onset_env, sr=sr, hop_length=hop_length,
+                                              units='frames')
 
     # Expected beats per second at detected tempo
     expected_beats_per_sec = tempo / 60.0
 
     # Actual beats per second
-    duration = librosa.get_duration(y=y, sr=sr)
+    if duration is None:
+        duration = librosa.get_duration(y=y, sr=sr)
     actual_beats_per_sec = len(onset_frames) / duration if duration > 0 else 0
 
     # If actual beat density is much lower than expected, likely half-time
@@ -134,50 +488,151 @@ def detect_halftime(y, sr, tempo, beat_frames):
     else:
         return False, tempo
 
-def analyze_audio(audio_path, include_quality=False, detect_highlights=False, num_highlights=3):
+def analysis_cache_params(audio_path, include_quality=False, detect_highlights=False, num_highlights=3,
+                          streaming=False, tier=DEFAULT_TIER, lean=False, highlight_seconds=HIGHLIGHT_SECONDS):
+    """
+    Everything besides file content that changes analyze_audio's output
+    (the filename matters because BPM validation trusts a BPM in the name)
+    """
+    params = {
+        'include_quality': bool(include_quality),
+        'num_highlights': int(num_highlights) if detect_highlights else 0,
+        'filename_bpm': extract_filename_bpm(audio_path),
+        'streaming': bool(streaming),
+        'tier': 'streaming' if streaming else tier
+    }
+    # Only lean runs carry the flag, so existing cache entries stay valid
+    if lean and not streaming:
+        params['lean'] = True
+    if detect_highlights:
+        params['highlight_seconds'] = float(highlight_seconds)
+    return params
+
+
+def analyze_audio(audio_path, include_quality=False, detect_highlights=False, num_highlights=3, use_cache=True,
+                  streaming=False, tier=DEFAULT_TIER, profile=False, lean=False,
+                  highlight_seconds=HIGHLIGHT_SECONDS):
     """
     Analyze audio file with comprehensive feature extraction
+    Results are served from / stored in the shared feature cache unless use_cache=False
+    streaming=True reads the file in blocks with bounded memory (for multi-hour mixes),
+    see audio_stream_analyzer.py
+    tier selects speed vs fidelity (see ANALYSIS_TIERS) and is recorded as 'analysis_tier'
+    profile=True adds a 'timings' block (seconds per stage, sample rate, array
+    sizes, peak memory); profiled calls always compute rather than read the cache
+    lean=True keeps peak memory near the decoded audio itself: float32 throughout,
+    chunked STFT and frame features, loudness normalization applied as a
+    scalar gain on frame RMS, and silence counted chunk by chunk; results carry
+    analysis_mode='lean'
+    highlight_seconds sets the length of each detected highlight
     """
+    settings = get_tier(tier)
+    profiler = StageProfiler(profile)
+    cache_params = analysis_cache_params(audio_path, include_quality, detect_highlights, num_highlights,
+                                         streaming, tier, lean, highlight_seconds)
+    if use_cache and not profile:
+        cached = feature_cache.get_cached(audio_path, 'audio_analyzer', ANALYZER_VERSION, cache_params)
+        if cached is not None:
+            return cached
+
+    if streaming:
+        # Imported here: audio_stream_analyzer builds on this module
+        from audio_stream_analyzer import analyze_audio_streaming
+        result = analyze_audio_streaming(audio_path, include_quality, detect_highlights, num_highlights)
+        profiler.lap('streaming')
+        if use_cache:
+            feature_cache.put_cached(audio_path, 'audio_analyzer', ANALYZER_VERSION, cache_params, result)
+        if profile:
+            result['timings'] = profiler.report()
+        return result
+
     try:
+        import pyloudnorm as pyln
+
         # Load audio
-        y, sr = librosa.load(audio_path, sr=None)
+        if settings['sr'] is None:
+            y, sr = librosa.load(audio_path, sr=None)
+        else:
+            y, sr = librosa.load(audio_path, sr=settings['sr'], res_type=settings['res_type'])
         duration = librosa.get_duration(y=y, sr=sr)
+        profiler.lap('decode')
+        profiler.note(sample_rate=sr, samples=len(y), audio_duration_s=duration)
+        profiler.array('audio', y)
 
         # LUFS LOUDNESS NORMALIZATION (for fair energy comparison)
         # Normalize to -14 LUFS (streaming standard) before energy calculation
         # This removes mastering loudness bias - quiet tracks normalized UP, loud tracks normalized DOWN
-        meter = pyln.Meter(sr)  # Create loudness meter
-        loudness = meter.integrated_loudness(y)  # Measure current loudness
+        if lean:
+            # Normalization is a scalar gain, so apply it to frame RMS instead of copying the signal
+            y = y.astype(np.float32, copy=False)
+            loudness = integrated_loudness_blocks(y, sr)
+            energy_gain = 10.0 ** ((-14.0 - loudness) / 20.0)
+        else:
+            meter = pyln.Meter(sr)  # Create loudness meter
+            loudness = meter.integrated_loudness(y)  # Measure current loudness
+
+            # Normalize to -14 LUFS target (Spotify/Apple Music standard)
+            y_normalized = pyln.normalize.loudness(y, loudness, -14.0)
 
-        # Normalize to -14 LUFS target (Spotify/Apple Music standard)
-        y_normalized = pyln.normalize.loudness(y, loudness, -14.0)
+            # Use normalized audio for energy calculation (but original for BPM/key/spectral)
+            y_for_energy = y_normalized
+        profiler.lap('loudness_normalize')
 
-        # Use normalized audio for energy calculation (but original for BPM/key/spectral)
-        y_for_energy = y_normalized
+        # Shared spectral front-end (one STFT per track)
+        ctx = build_feature_context(y, sr, n_fft=settings['n_fft'], hop_length=settings['hop'], lean=lean)
+        onset_env = ctx['onset_env']
+        profiler.lap('stft_onset')
+        profiler.array('stft', ctx['S'])
+        profiler.array('onset_env', onset_env)
 
-        # Basic features
-        tempo, beat_frames = librosa.beat.beat_track(y=y, sr=sr)
+        # Basic features (beat tracking reuses the shared log-mel front-end)
+        tempo, beat_frames = track_beats(ctx['beat_onset_env'], sr, hop_length=ctx['hop_length'])
+        profiler.lap('beat_track')
 
         # IMPROVED: Validate BPM and check multiples (fixes D&B detected as half, etc.)
-        tempo = validate_bpm_with_multiples(tempo, y, sr, audio_path)
+        tempo = validate_bpm_with_multiples(tempo, y, sr, audio_path, ctx=ctx,
+                                            octave_only=settings['octave_only'])
+        profiler.lap('bpm_validation')
 
-        tempo_confidence = calculate_tempo_confidence(y, sr, tempo)
+        tempo_confidence = calculate_tempo_confidence(y, sr, tempo, onset_env=onset_env)
 
         # Half-time detection (critical for R&B, slow jams, chill trap)
-        is_halftime, effective_bpm = detect_halftime(y, sr, tempo, beat_frames)
+        is_halftime, effective_bpm = detect_halftime(y, sr, tempo, beat_frames, onset_env=onset_env,
+                                                     hop_length=ctx['hop_length'])
+        profiler.lap('halftime')
 
         # Chromagram for key detection
-        chroma = librosa.feature.chroma_cqt(y=y, sr=sr)
-        key = estimate_key(chroma)
+        if lean:
+            chroma = chroma_lean(y, sr, ctx, mode=settings['chroma'])
+        elif settings['chroma'] == 'stft':
+            chroma = librosa.feature.chroma_stft(S=ctx['S'] ** 2, sr=sr, n_fft=ctx['n_fft'])
+        else:
+            chroma = librosa.feature.chroma_cqt(y=y, sr=sr)
+        key, key_confidence = estimate_key(chroma, with_confidence=True)
+        profiler.lap('chroma')
 
         # Spectral features
-        spectral_centroids = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
-        spectral_rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr)[0]
-        zero_crossing_rate = librosa.feature.zero_crossing_rate(y)[0]
+        if lean:
+            spectral_centroids = spectral_framewise(librosa.feature.spectral_centroid, ctx['S'], sr, ctx['n_fft'])[0]
+            spectral_rolloff = spectral_framewise(librosa.feature.spectral_rolloff, ctx['S'], sr, ctx['n_fft'])[0]
+            zero_crossing_rate = framewise(y, librosa.feature.zero_crossing_rate, ctx['n_fft'],
+                                           ctx['hop_length'], pad_mode='edge')
+        else:
+            spectral_centroids = librosa.feature.spectral_centroid(S=ctx['S'], sr=sr, n_fft=ctx['n_fft'])[0]
+            spectral_rolloff = librosa.feature.spectral_rolloff(S=ctx['S'], sr=sr, n_fft=ctx['n_fft'])[0]
+            zero_crossing_rate = librosa.feature.zero_crossing_rate(y, frame_length=ctx['n_fft'],
+                                                                    hop_length=ctx['hop_length'])[0]
+        profiler.lap('spectral')
 
         # IMPROVED ENERGY CALCULATION (using LUFS-normalized audio)
         # 1. RMS energy per frame (from normalized audio for fair comparison)
-        rms = librosa.feature.rms(y=y_for_energy, frame_length=2048, hop_length=512)[0]
+        # Time-domain framing needs no STFT; computing it from the windowed
+        # spectrogram would bias the level and shift the energy calibration
+        if lean:
+            raw_rms = framewise(y, librosa.feature.rms, ctx['n_fft'], ctx['hop_length'])
+            rms = raw_rms * np.float32(energy_gain)
+        else:
+            rms = librosa.feature.rms(y=y_for_energy, frame_length=ctx['n_fft'], hop_length=ctx['hop_length'])[0]
 
         # 2. Exclude quiet sections (below threshold)
         rms_db = librosa.amplitude_to_db(rms, ref=np.max)
@@ -193,7 +648,8 @@ def analyze_audio(audio_path, include_quality=False, detect_highlights=False, nu
         improved_energy = np.mean(active_rms)
 
         # 4. Calculate spectral flux (perceived energy from normalized audio)
-        spectral_flux = librosa.onset.onset_strength(y=y_for_energy, sr=sr)
+        # (onset envelope is gain-invariant, so the shared one is reused)
+        spectral_flux = onset_env
         spectral_energy = np.mean(spectral_flux) / 10.0
 
         # 5. Combine RMS and spectral flux (weighted)
@@ -222,9 +678,14 @@ def analyze_audio(audio_path, include_quality=False, detect_highlights=False, nu
 
         # Valence estimation (rough approximation from spectral features)
         valence = estimate_valence(spectral_centroids, spectral_rolloff)
+        profiler.lap('energy')
 
         # Silence ratio
-        silence_ratio = calculate_silence_ratio(y, sr)
+        if lean:
+            silence_ratio = calculate_silence_ratio_chunked(y)
+        else:
+            silence_ratio = calculate_silence_ratio(y, sr)
+        profiler.lap('silence_ratio')
 
         result = {
             'duration': float(duration),
@@ -232,6 +693,7 @@ def analyze_audio(audio_path, include_quality=False, detect_highlights=False, nu
             'effective_bpm': float(np.asarray(effective_bpm).item()) if hasattr(effective_bpm, '__iter__') else float(effective_bpm),
             'is_halftime': bool(is_halftime),
             'key': key,
+            'key_confidence': key_confidence,
             'energy': float(energy),
             'valence': float(valence),
             'loudness': float(loudness_db),
@@ -239,8 +701,11 @@ def analyze_audio(audio_path, include_quality=False, detect_highlights=False, nu
             'spectral_rolloff': float(np.mean(spectral_rolloff)),
             'zero_crossing_rate': float(np.mean(zero_crossing_rate)),
             'silence_ratio': float(silence_ratio),
-            'tempo_confidence': float(tempo_confidence)
+            'tempo_confidence': float(tempo_confidence),
+            'analysis_tier': tier
         }
+        if lean:
+            result['analysis_mode'] = 'lean'
 
         # Quality scoring
         if include_quality:
@@ -250,21 +715,30 @@ def analyze_audio(audio_path, include_quality=False, detect_highlights=False, nu
 
         # Highlight detection
         if detect_highlights:
-            highlights = detect_track_highlights(y, sr, num_highlights)
+            highlights = detect_track_highlights(y, sr, num_highlights, ctx=ctx, rms=rms,
+                                                 window_seconds=highlight_seconds)
             result['highlights'] = highlights
+            profiler.lap('highlights')
 
-        return result
+        if use_cache:
+            feature_cache.put_cached(audio_path, 'audio_analyzer', ANALYZER_VERSION, cache_params, result)
 
     except Exception as e:
-        return {'error': str(e)}
+        result = {'error': str(e)}
+
+    if profile:
+        result['timings'] = profiler.report()
 
+    return result
 
-def calculate_tempo_confidence(y, sr, estimated_tempo):
+
+def calculate_tempo_confidence(y, sr, estimated_tempo, onset_env=None):
     """
     Calculate confidence in tempo detection
     """
     # Use onset strength as a proxy for rhythm clarity
-    onset_env = librosa.onset.onset_strength(y=y, sr=sr)
+    if onset_env is None:
+        onset_env = librosa.onset.onset_strength(y=y, sr=sr)
     onset_strength = np.mean(onset_env)
 
     # Normalize to 0-1
@@ -272,30 +746,55 @@ def calculate_tempo_confidence(y, sr, estimated_tempo):
     return confidence
 
 
-def estimate_key(chroma):
-    """
-    Estimate musical key from chromagram
-    """
-    # Average chroma across time
-    chroma_avg = np.mean(chroma, axis=1)
+PITCH_CLASSES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
 
-    # Find dominant pitch class
-    dominant_pitch = np.argmax(chroma_avg)
+# Krumhansl-Kessler probe-tone profiles for C major / C minor
+MAJOR_PROFILE = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
+MINOR_PROFILE = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
 
-    # Map to key names
-    keys = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
 
-    # Simple major/minor detection (heuristic)
-    # If 3rd and 5th are strong -> major, if minor 3rd -> minor
-    third = (dominant_pitch + 4) % 12
-    minor_third = (dominant_pitch + 3) % 12
+def _key_profiles():
+    """All 24 key profiles as zero-mean, unit-norm rows (major keys first)"""
+    profiles = np.array([np.roll(MAJOR_PROFILE, tonic) for tonic in range(12)] +
+                        [np.roll(MINOR_PROFILE, tonic) for tonic in range(12)])
+    profiles -= profiles.mean(axis=1, keepdims=True)
+    return profiles / np.linalg.norm(profiles, axis=1, keepdims=True)
 
-    if chroma_avg[third] > chroma_avg[minor_third]:
-        mode = 'major'
-    else:
-        mode = 'minor'
 
-    return f"{keys[dominant_pitch]} {mode}"
+KEY_PROFILES = _key_profiles()
+KEY_LABELS = [f"{name} major" for name in PITCH_CLASSES] + [f"{name} minor" for name in PITCH_CLASSES]
+
+
+def estimate_keys(chroma_means):
+    """
+    Keys for many tracks at once from their time-averaged chroma
+
+    chroma_means: (n_tracks, 12) array (any chroma - CQT or STFT)
+    Returns (keys, confidences): the best of the 24 major / minor profiles
+    by Pearson correlation, computed for every track and key in one matrix
+    product, and that correlation clipped to 0-1 as a confidence. Flat or
+    silent chroma gets confidence 0.
+    """
+    chroma_means = np.atleast_2d(np.asarray(chroma_means, dtype=np.float64))
+    centred = chroma_means - chroma_means.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(centred, axis=1, keepdims=True)
+    centred = np.divide(centred, norms, out=np.zeros_like(centred), where=norms > 0)
+
+    correlations = centred @ KEY_PROFILES.T
+    best = np.argmax(correlations, axis=1)
+    confidences = np.clip(correlations[np.arange(len(best)), best], 0.0, 1.0)
+    return [KEY_LABELS[i] for i in best], confidences
+
+
+def estimate_key(chroma, with_confidence=False):
+    """
+    Estimate musical key from a chromagram (12 x frames)
+    With with_confidence=True returns (key, confidence)
+    """
+    keys, confidences = estimate_keys(np.mean(chroma, axis=1))
+    if with_confidence:
+        return keys[0], float(confidences[0])
+    return keys[0]
 
 
 def estimate_valence(spectral_centroids, spectral_rolloff):
@@ -327,6 +826,25 @@ def calculate_silence_ratio(y, sr, threshold_db=-40):
     return silent_frames / total_frames if total_frames > 0 else 0
 
 
+def calculate_silence_ratio_chunked(y, threshold_db=-40, chunk_samples=1 << 20):
+    """
+    calculate_silence_ratio without a full-length dB array (lean mode)
+    Same per-sample test - more than threshold_db below the peak, with
+    amplitude_to_db's 1e-10 power floor - done on squared samples chunk by chunk
+    """
+    if len(y) == 0:
+        return 0
+    amin = 1e-10
+    peak = max(float(np.max(y)), -float(np.min(y)))
+    limit = max(peak * peak, amin) * 10.0 ** (threshold_db / 10.0)
+
+    silent = 0
+    for start in range(0, len(y), chunk_samples):
+        power = np.square(y[start:start + chunk_samples], dtype=np.float64)
+        silent += int(np.count_nonzero(np.maximum(power, amin) < limit))
+    return silent / len(y)
+
+
 def calculate_quality_score(analysis):
     """
     Calculate quality score from analysis features
@@ -375,63 +893,102 @@ def calculate_quality_score(analysis):
     }
 
 
-def detect_track_highlights(y, sr, num_highlights=3):
+# Per-frame curves scored by the highlight engine: (reason, peak_feature)
+HIGHLIGHT_FEATURES = (
+    ('energy_peak', 'energy'),
+    ('novelty_peak', 'onset_strength'),
+    ('spectral_interest', 'spectral_contrast'),
+)
+
+
+def window_means(curve, window):
     """
-    Detect the best moments/highlights in a track
+    Mean of curve over every window of `window` consecutive frames
+    One prefix sum makes every window O(1), so the whole track is O(n)
     """
-    highlights = []
+    csum = np.concatenate(([0.0], np.cumsum(curve, dtype=np.float64)))
+    return (csum[window:] - csum[:-window]) / window
 
-    # 1. Energy-based highlights
-    rms = librosa.feature.rms(y=y)[0]
-    energy_peaks_idx = find_peaks(rms, height=np.percentile(rms, 75))[0]
 
-    # Convert to time
-    times = librosa.frames_to_time(np.arange(len(rms)), sr=sr)
+def select_windows(scores, window, count, max_overlap=0.0):
+    """
+    Greedy non-maximum suppression over window start frames
+    Takes the best remaining window, then rules out every start that would
+    overlap it by more than max_overlap of the window length
+    """
+    scores = np.array(scores, dtype=np.float64)
+    min_gap = max(1, int(round(window * (1.0 - max_overlap))))
+    picked = []
+    while len(picked) < count:
+        best = int(np.argmax(scores))
+        if not np.isfinite(scores[best]):
+            break
+        picked.append(best)
+        scores[max(0, best - min_gap + 1):best + min_gap] = -np.inf
+    return picked
+
+
+def _normalize_curve(curve):
+    """Scale a feature curve to 0-1 between its 5th and 95th percentiles"""
+    lo, hi = np.percentile(curve, [5, 95])
+    if hi <= lo:
+        return np.zeros(len(curve))
+    return np.clip((curve - lo) / (hi - lo), 0.0, 1.0)
+
+
+def detect_track_highlights(y, sr, num_highlights=3, ctx=None, rms=None, window_seconds=HIGHLIGHT_SECONDS,
+                            max_overlap=0.0):
+    """
+    Detect the best moments/highlights in a track
 
-    for idx in energy_peaks_idx[:num_highlights]:
-        start_time = times[idx]
-        highlights.append({
-            'start': float(start_time),
-            'end': float(start_time + 10),  # 10-second highlight
-            'score': float(rms[idx]),
-            'reason': 'energy_peak',
-            'peak_feature': 'energy'
-        })
+    Every window of window_seconds, at every frame, is scored on the mean of
+    three normalized per-frame curves - RMS energy, onset strength (novelty)
+    and spectral contrast - using prefix sums. The top windows across the
+    whole track are kept, with overlapping ones suppressed. Each highlight's
+    reason names the curve that stands out most in it.
 
-    # 2. Novelty-based highlights (unique moments)
-    onset_env = librosa.onset.onset_strength(y=y, sr=sr)
-    novelty_peaks_idx = find_peaks(onset_env, height=np.percentile(onset_env, 75))[0]
+    Reuses the shared spectral front-end when a feature context is given,
+    and precomputed frame RMS when given (any gain: curves are normalized)
+    """
+    if ctx is None:
+        ctx = build_feature_context(y, sr)
+    hop_length = ctx['hop_length']
+
+    if rms is None:
+        rms = librosa.feature.rms(y=y, frame_length=ctx['n_fft'], hop_length=hop_length)[0]
+    if ctx.get('lean'):
+        spectral_contrast = spectral_framewise(librosa.feature.spectral_contrast, ctx['S'], sr, ctx['n_fft'])
+    else:
+        spectral_contrast = librosa.feature.spectral_contrast(S=ctx['S'], sr=sr, n_fft=ctx['n_fft'])
 
-    for idx in novelty_peaks_idx[:num_highlights]:
-        frame_idx = min(idx, len(times) - 1)
-        start_time = times[frame_idx]
-        highlights.append({
-            'start': float(start_time),
-            'end': float(start_time + 10),
-            'score': float(onset_env[idx]),
-            'reason': 'novelty_peak',
-            'peak_feature': 'onset_strength'
-        })
+    curves = [rms, ctx['onset_env'], np.mean(spectral_contrast, axis=0)]
+    n_frames = min(len(curve) for curve in curves)
+    if n_frames == 0:
+        return []
+
+    duration = len(y) / sr
+    window = int(np.clip(round(window_seconds * sr / hop_length), 1, n_frames))
 
-    # 3. Spectral contrast highlights (interesting frequency content)
-    spectral_contrast = librosa.feature.spectral_contrast(y=y, sr=sr)
-    contrast_mean = np.mean(spectral_contrast, axis=0)
-    contrast_peaks_idx = find_peaks(contrast_mean, height=np.percentile(contrast_mean, 75))[0]
+    # (features, starts) window means per curve, and their combined score
+    feature_means = np.array([window_means(_normalize_curve(curve[:n_frames]), window) for curve in curves])
+    scores = feature_means.mean(axis=0)
 
-    for idx in contrast_peaks_idx[:num_highlights]:
-        frame_idx = min(idx, len(times) - 1)
-        start_time = times[frame_idx]
+    # How far each curve sits above its own typical window, for the reason label
+    standout = feature_means - np.median(feature_means, axis=1, keepdims=True)
+
+    highlights = []
+    for start in select_windows(scores, window, num_highlights, max_overlap):
+        reason, peak_feature = HIGHLIGHT_FEATURES[int(np.argmax(standout[:, start]))]
+        start_time = float(librosa.frames_to_time(start, sr=sr, hop_length=hop_length))
         highlights.append({
-            'start': float(start_time),
-            'end': float(start_time + 10),
-            'score': float(contrast_mean[idx]),
-            'reason': 'spectral_interest',
-            'peak_feature': 'spectral_contrast'
+            'start': start_time,
+            'end': float(min(start_time + window_seconds, duration)),
+            'score': float(scores[start]),
+            'reason': reason,
+            'peak_feature': peak_feature
         })
 
-    # Sort by score and take top N
-    highlights.sort(key=lambda x: x['score'], reverse=True)
-    return highlights[:num_highlights]
+    return highlights
 
 
 def main():
@@ -441,6 +998,17 @@ def main():
     parser.add_argument('--quality', action='store_true', help='Include quality scoring')
     parser.add_argument('--highlights', action='store_true', help='Detect highlights')
     parser.add_argument('--num-highlights', type=int, default=3, help='Number of highlights to detect')
+    parser.add_argument('--highlight-seconds', type=float, default=HIGHLIGHT_SECONDS,
+                        help=f'Highlight window length (default: {HIGHLIGHT_SECONDS:g}s)')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the shared feature cache')
+    parser.add_argument('--tier', choices=list(ANALYSIS_TIERS), default=DEFAULT_TIER,
+                        help=f'Speed vs fidelity (default: {DEFAULT_TIER})')
+    parser.add_argument('--profile', action='store_true',
+                        help='Add per-stage timings, array sizes and peak memory to the result')
+    parser.add_argument('--lean', action='store_true',
+                        help='Memory-lean mode: float32, chunked STFT, frame-level gain')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Read the file in blocks with bounded memory (for very long files)')
 
     args = parser.parse_args()
 
@@ -448,7 +1016,13 @@ def main():
         args.audio_path,
         include_quality=args.quality,
         detect_highlights=args.highlights,
-        num_highlights=args.num_highlights
+        num_highlights=args.num_highlights,
+        highlight_seconds=args.highlight_seconds,
+        use_cache=not args.no_cache,
+        streaming=args.streaming,
+        tier=args.tier,
+        profile=args.profile,
+        lean=args.lean
     )
 
     if args.json:
@@ -9,6 +9,8 @@ import json
 import numpy as np
 import librosa
 
+from audio_analyzer import estimate_key
+
 def analyze_audio_improved(audio_path):
     """
     Improved energy calculation using librosa
@@ -26,10 +28,7 @@ def analyze_audio_improved(audio_path):
 
         # Chromagram for key
         chroma = librosa.feature.chroma_cqt(y=y, sr=sr)
-        chroma_avg = np.mean(chroma, axis=1)
-        dominant_pitch = np.argmax(chroma_avg)
-        pitch_names = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
-        key = pitch_names[dominant_pitch] + ' major'
+        key = estimate_key(chroma)
 
         # IMPROVED ENERGY CALCULATION
         # 1. RMS energy per frame
@@ -76,7 +75,7 @@ def analyze_audio_improved(audio_path):
 
         result = {
             'duration': float(duration),
-            'bpm': float(tempo),
+            'bpm': float(np.asarray(tempo).item()),
             'key': key,
             'energy': float(normalized_energy),
             'energy_raw': float(improved_energy),
@@ -173,7 +172,7 @@ def analyze_audio_current(audio_path):
         energy = np.mean(rms)  # Basic average
 
         result = {
-            'bpm': float(tempo),
+            'bpm': float(np.asarray(tempo).item()),
             'energy': float(energy),
             'method': 'current_basic'
         }
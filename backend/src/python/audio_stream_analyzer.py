@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Block-streaming audio analysis for very long files (multi-hour DJ sets)
+
+analyze_audio decodes the whole file and then makes several full-length
+copies (loudness-normalized audio, per-sample dB, spectrograms). Here the
+file is read in fixed-size blocks and every feature is a running statistic,
+so peak memory is set by the block size, not the file length:
+
+- RMS / active-section energy: histogram of frame levels (dB) with per-bin sums
+- spectral centroid, rolloff, zero-crossing rate: running means
+- silence ratio: histogram of per-sample levels
+- chroma (for key): running sum of STFT chroma
+- gated loudness (BS.1770): K-weighting filtered with carried state,
+  400 ms gating blocks accumulated into a loudness histogram
+
+The onset envelope (one float per hop, ~90/s) is kept for BPM detection.
+
+Differences from analyze_audio: chroma comes from the STFT rather than CQT,
+frames are not centered, percentiles/gates are resolved to histogram bin
+width (0.01-0.05 dB), and highlights are not computed.
+"""
+
+import sys
+import json
+import argparse
+import numpy as np
+import librosa
+import soundfile as sf
+from scipy.signal import lfilter, lfilter_zi
+
+import audio_analyzer as aa
+
+DEFAULT_BLOCK_FRAMES = 1024  # ~12 s per block at 44.1 kHz
+
+
+class LevelHistogram:
+    """
+    Fixed-size histogram over a dB range with per-bin value sums
+    Answers percentile and "mean of values above a level" queries in O(bins)
+    """
+
+    def __init__(self, low_db, high_db, bin_db):
+        self.low = low_db
+        self.bin = bin_db
+        self.n_bins = int(round((high_db - low_db) / bin_db))
+        self.counts = np.zeros(self.n_bins, dtype=np.int64)
+        self.sums = np.zeros(self.n_bins, dtype=np.float64)
+        self.below = 0
+        self.max_db = -np.inf
+
+    def add(self, levels_db, values=None):
+        if len(levels_db) == 0:
+            return
+        self.max_db = max(self.max_db, float(np.max(levels_db)))
+        # -inf (digital silence) and anything under the range count as "below"
+        under = ~(levels_db >= self.low)
+        self.below += int(np.count_nonzero(under))
+        idx = np.floor((levels_db[~under] - self.low) / self.bin).astype(np.int64)
+        idx = np.clip(idx, 0, self.n_bins - 1)
+        self.counts += np.bincount(idx, minlength=self.n_bins)
+        if values is not None:
+            self.sums += np.bincount(idx, weights=values[~under], minlength=self.n_bins)
+
+    def total(self):
+        return self.below + int(self.counts.sum())
+
+    def bin_index(self, level_db):
+        return int(np.clip(np.floor((level_db - self.low) / self.bin), 0, self.n_bins))
+
+    def count_below(self, level_db):
+        return self.below + int(self.counts[:self.bin_index(level_db)].sum())
+
+    def percentile(self, q, floor_db=None):
+        """
+        q-th percentile of the recorded levels, with levels under floor_db
+        counted as floor_db (like amplitude_to_db's top_db clipping)
+        """
+        total = self.total()
+        if total == 0:
+            return self.low
+
+        rank = q / 100.0 * (total - 1)
+        floor_count = self.count_below(floor_db) if floor_db is not None else self.below
+        if rank < floor_count:
+            return floor_db if floor_db is not None else self.low
+
+        cumulative = self.below + np.cumsum(self.counts)
+        i = int(np.searchsorted(cumulative, rank, side='right'))
+        return self.low + (i + 0.5) * self.bin
+
+    def mean_above(self, level_db):
+        """(mean of summed values, count) over bins strictly above level_db"""
+        i = self.bin_index(level_db) + 1
+        count = int(self.counts[i:].sum())
+        if count == 0:
+            return 0.0, 0
+        return float(self.sums[i:].sum() / count), count
+
+
+def k_weighting_filters(sr):
+    """
+    BS.1770 K-weighting as two RBJ-cookbook biquads (b, a): the +4 dB high shelf
+    at 1.5 kHz and the 38 Hz high pass, with the coefficients pyloudnorm.Meter
+    uses for its default 'K-weighting' filter class
+    """
+    filters = []
+    for kind, gain_db, q, fc in (('high_shelf', 4.0, 1 / np.sqrt(2), 1500.0),
+                                 ('high_pass', 0.0, 0.5, 38.0)):
+        A = 10 ** (gain_db / 40.0)
+        w0 = 2.0 * np.pi * fc / sr
+        cos_w0 = np.cos(w0)
+        alpha = np.sin(w0) / (2.0 * q)
+        if kind == 'high_shelf':
+            root = 2 * np.sqrt(A) * alpha
+            b = [A * ((A + 1) + (A - 1) * cos_w0 + root),
+                 -2 * A * ((A - 1) + (A + 1) * cos_w0),
+                 A * ((A + 1) + (A - 1) * cos_w0 - root)]
+            a = [(A + 1) - (A - 1) * cos_w0 + root,
+                 2 * ((A - 1) - (A + 1) * cos_w0),
+                 (A + 1) - (A - 1) * cos_w0 - root]
+        else:
+            b = [(1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2]
+            a = [1 + alpha, -2 * cos_w0, 1 - alpha]
+        filters.append((np.array(b) / a[0], np.array(a) / a[0]))
+    return filters
+
+
+class GatedLoudness:
+    """
+    Streaming ITU-R BS.1770 integrated loudness (mono), matching pyloudnorm.Meter
+    """
+
+    BLOCK_SECONDS = 0.4
+    STEP_SECONDS = 0.1  # 75% overlap
+    ABSOLUTE_GATE = -70.0
+
+    def __init__(self, sr):
+        self.stages = [[b, a, lfilter_zi(b, a) * 0.0] for b, a in k_weighting_filters(sr)]
+
+        self.step = int(round(self.STEP_SECONDS * sr))
+        self.block_len = int(round(self.BLOCK_SECONDS * sr))
+        self.leftover = np.zeros(0)     # squared samples not yet filling a 100 ms step
+        self.recent = np.zeros(0)       # last three 100 ms energy sums
+        self.hist = LevelHistogram(self.ABSOLUTE_GATE, 20.0, 0.01)
+
+    def add(self, samples):
+        x = samples.astype(np.float64)
+        for stage in self.stages:
+            b, a, zi = stage
+            x, stage[2] = lfilter(b, a, x, zi=zi)
+
+        squares = np.concatenate([self.leftover, np.square(x)])
+        n_steps = len(squares) // self.step
+        self.leftover = squares[n_steps * self.step:]
+        if n_steps == 0:
+            return
+
+        step_sums = np.concatenate([
+            self.recent,
+            squares[:n_steps * self.step].reshape(n_steps, self.step).sum(axis=1)
+        ])
+        self.recent = step_sums[-3:]
+        if len(step_sums) < 4:
+            return
+
+        # Each 400 ms gating block is four consecutive 100 ms steps
+        z = np.convolve(step_sums, np.ones(4), mode='valid') / self.block_len
+        with np.errstate(divide='ignore'):
+            levels = -0.691 + 10.0 * np.log10(z)
+        self.hist.add(levels, z)
+
+    def integrated(self):
+        # Absolute gate: the histogram floor is -70 LUFS, so every binned block passes
+        z_abs, count = self.hist.mean_above(self.ABSOLUTE_GATE - self.hist.bin)
+        if count == 0:
+            return -np.inf
+        relative_gate = -0.691 + 10.0 * np.log10(z_abs) - 10.0
+        z_rel, count = self.hist.mean_above(max(relative_gate, self.ABSOLUTE_GATE))
+        if count == 0 or z_rel <= 0:
+            return -np.inf
+        return -0.691 + 10.0 * np.log10(z_rel)
+
+
+def analyze_audio_streaming(audio_path, include_quality=False, detect_highlights=False, num_highlights=3,
+                            block_frames=DEFAULT_BLOCK_FRAMES):
+    """
+    Analyze an audio file block by block with bounded memory
+    Returns the same fields as audio_analyzer.analyze_audio
+    """
+    try:
+        sr = sf.info(audio_path).samplerate
+        n_fft, hop = aa.N_FFT, aa.HOP_LENGTH
+        overlap = n_fft - hop
+
+        # Filterbanks and frequency axes built once per file
+        freqs = librosa.fft_frequencies(sr=sr, n_fft=n_fft)
+        mel_fb = librosa.filters.mel(sr=sr, n_fft=n_fft)
+        chroma_fb = librosa.filters.chroma(sr=sr, n_fft=n_fft)
+        window = librosa.filters.get_window('hann', n_fft, fftbins=True)
+
+        # Running statistics
+        rms_hist = LevelHistogram(-200.0, 20.0, 0.05)     # frame RMS level -> RMS sums
+        sample_hist = LevelHistogram(-200.0, 20.0, 0.05)  # per-sample level
+        loudness = GatedLoudness(sr)
+        centroid_sum = rolloff_sum = 0.0
+        chroma_sum = np.zeros(12)
+        n_spec_frames = 0
+        zero_crossings = 0
+        n_samples = 0
+        last_sample = None
+        onset_chunks = []
+        beat_onset_chunks = []
+        prev_mel_db = None
+        mel_max_db = -np.inf
+
+        stream = librosa.stream(audio_path, block_length=block_frames, frame_length=n_fft,
+                                hop_length=hop, mono=True, fill_value=None)
+
+        for i, block in enumerate(stream):
+            # Samples not already seen in the previous block's overlap
+            new = block if i == 0 else block[overlap:]
+            if len(new) == 0:
+                continue
+            n_samples += len(new)
+
+            # Per-sample level (silence ratio) and zero crossings
+            with np.errstate(divide='ignore'):
+                sample_hist.add(20.0 * np.log10(np.maximum(np.abs(new), 1e-10)))
+            signs = np.signbit(new)
+            zero_crossings += int(np.count_nonzero(signs[1:] != signs[:-1]))
+            if last_sample is not None and signs[0] != last_sample:
+                zero_crossings += 1
+            last_sample = signs[-1]
+
+            loudness.add(new)
+
+            if len(block) < n_fft:
+                continue
+
+            # Frame RMS (time domain, like librosa.feature.rms)
+            frames = librosa.util.frame(block, frame_length=n_fft, hop_length=hop)
+            rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=0))
+            rms_hist.add(20.0 * np.log10(np.maximum(rms, 1e-10)), rms)
+
+            # Spectral features from one STFT per block
+            S = np.abs(np.fft.rfft(frames * window[:, np.newaxis], axis=0))
+            power = S ** 2
+
+            norm = np.sum(S, axis=0)
+            norm[norm == 0] = 1.0
+            centroid = freqs @ S / norm
+            centroid_sum += float(np.sum(centroid))
+
+            cumulative = np.cumsum(S, axis=0)
+            thresholds = 0.85 * cumulative[-1]
+            rolloff_idx = np.argmax(cumulative >= thresholds[np.newaxis, :], axis=0)
+            rolloff_sum += float(np.sum(freqs[rolloff_idx]))
+
+            chroma = chroma_fb @ power
+            chroma = chroma / np.maximum(np.max(chroma, axis=0, keepdims=True), 1e-10)
+            chroma_sum += np.sum(chroma, axis=1)
+
+            # Onset strength: positive log-mel flux, carried across blocks
+            # (top_db floor is relative to the loudest mel bin seen so far)
+            mel_db = librosa.power_to_db(mel_fb @ power, top_db=None)
+            mel_max_db = max(mel_max_db, float(np.max(mel_db)))
+            mel_db = np.maximum(mel_db, mel_max_db - 80.0)
+            if prev_mel_db is not None:
+                mel_db_ext = np.concatenate([prev_mel_db, mel_db], axis=1)
+            else:
+                mel_db_ext = np.concatenate([mel_db[:, :1], mel_db], axis=1)
+            flux = np.maximum(0.0, np.diff(mel_db_ext, axis=1))
+            onset_chunks.append(np.mean(flux, axis=0).astype(np.float32))
+            beat_onset_chunks.append(np.median(flux, axis=0).astype(np.float32))
+            prev_mel_db = mel_db[:, -1:]
+
+            n_spec_frames += S.shape[1]
+
+        if n_samples == 0 or n_spec_frames == 0:
+            return {'error': 'Audio too short for streaming analysis'}
+
+        duration = n_samples / sr
+        onset_env = np.concatenate(onset_chunks)
+        beat_onset_env = np.concatenate(beat_onset_chunks)
+
+        # Loudness and normalization gain (applied to the frame RMS statistics)
+        integrated = loudness.integrated()
+        gain = 10.0 ** ((-14.0 - integrated) / 20.0) if np.isfinite(integrated) else 1.0
+
+        # Rhythm (same stages as analyze_audio, on the streamed onset envelope)
+        ctx = {'sr': sr, 'hop_length': hop, 'onset_env': onset_env}
+        tempo, beat_frames = aa.track_beats(beat_onset_env, sr, hop)
+        tempo = aa.validate_bpm_with_multiples(tempo, None, sr, audio_path, ctx=ctx)
+        tempo_confidence = aa.calculate_tempo_confidence(None, sr, tempo, onset_env=onset_env)
+        is_halftime, effective_bpm = aa.detect_halftime(None, sr, tempo, beat_frames,
+                                                        onset_env=onset_env, duration=duration)
+
+        key, key_confidence = aa.estimate_key(chroma_sum[:, np.newaxis], with_confidence=True)
+
+        # Energy from active (non-quiet) frames, relative to the loudest frame
+        floor_db = rms_hist.max_db - 80.0
+        threshold_db = rms_hist.percentile(25, floor_db=floor_db)
+        active_mean, active_count = rms_hist.mean_above(threshold_db)
+        if active_count == 0:
+            active_mean = float(np.sum(rms_hist.sums) / max(rms_hist.total(), 1))
+        active_rms_mean = active_mean * gain
+
+        spectral_energy = np.mean(onset_env) / 10.0
+        combined_energy = (active_rms_mean * 0.4) + (spectral_energy * 0.6)
+        energy = min(1.0, (combined_energy / 0.2) ** 0.7) if combined_energy > 0 else 0
+        if is_halftime:
+            energy = energy * 0.6
+
+        loudness_db = librosa.amplitude_to_db(np.array([active_rms_mean]))[0]
+
+        mean_centroid = centroid_sum / n_spec_frames
+        mean_rolloff = rolloff_sum / n_spec_frames
+        valence = aa.estimate_valence(np.array([mean_centroid]), np.array([mean_rolloff]))
+
+        # Silence: samples more than 40 dB below the loudest sample
+        silence_ratio = sample_hist.count_below(sample_hist.max_db - 40.0) / n_samples
+
+        result = {
+            'duration': float(duration),
+            'bpm': float(np.asarray(tempo).item()),
+            'effective_bpm': float(np.asarray(effective_bpm).item()),
+            'is_halftime': bool(is_halftime),
+            'key': key,
+            'key_confidence': key_confidence,
+            'energy': float(energy),
+            'valence': float(valence),
+            'loudness': float(loudness_db),
+            'spectral_centroid': float(mean_centroid),
+            'spectral_rolloff': float(mean_rolloff),
+            'zero_crossing_rate': float(zero_crossings / n_samples),
+            'silence_ratio': float(silence_ratio),
+            'tempo_confidence': float(tempo_confidence),
+            'analysis_mode': 'streaming',
+            'analysis_tier': 'streaming'
+        }
+
+        if include_quality:
+            quality = aa.calculate_quality_score(result)
+            result['quality_score'] = quality['overall']
+            result['quality_breakdown'] = quality['breakdown']
+
+        if detect_highlights:
+            # Highlight detection needs per-frame curves over the whole file
+            result['highlights'] = []
+
+        return result
+
+    except Exception as e:
+        return {'error': str(e)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyze a long audio file with bounded memory')
+    parser.add_argument('audio_path', help='Path to audio file')
+    parser.add_argument('--json', action='store_true', help='Output JSON')
+    parser.add_argument('--quality', action='store_true', help='Include quality scoring')
+    parser.add_argument('--block-frames', type=int, default=DEFAULT_BLOCK_FRAMES,
+                        help='STFT frames per streamed block')
+
+    args = parser.parse_args()
+
+    result = analyze_audio_streaming(args.audio_path, include_quality=args.quality,
+                                     block_frames=args.block_frames)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for key, value in result.items():
+            print(f"{key}: {value}")
+
+
+if __name__ == '__main__':
+    main()
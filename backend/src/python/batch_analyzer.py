@@ -4,37 +4,44 @@ Parallel batch audio analyzer for fast processing of multiple tracks
 Uses multiprocessing to analyze tracks simultaneously
 """
 
+import os
 import sys
 import json
+import time
 import argparse
+from functools import partial
 from multiprocessing import Pool, cpu_count
-from pathlib import Path
-import importlib.util
+import numpy as np
 
-# Import audio_analyzer module
-spec = importlib.util.spec_from_file_location("audio_analyzer", Path(__file__).parent / "audio_analyzer.py")
-audio_analyzer = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(audio_analyzer)
+import audio_analyzer
 
-def analyze_single_track(args):
+def analyze_single_track(args, use_cache=True, tier=audio_analyzer.DEFAULT_TIER, profile=False, lean=False):
     """
     Analyze a single track (wrapper for multiprocessing)
     Returns: (track_id, result_dict)
     """
     track_id, audio_path = args
     try:
-        result = audio_analyzer.analyze_audio(audio_path, include_quality=False, detect_highlights=False)
+        result = audio_analyzer.analyze_audio(audio_path, include_quality=False, detect_highlights=False,
+                                              use_cache=use_cache, tier=tier, profile=profile, lean=lean)
         return (track_id, result)
     except Exception as e:
         return (track_id, {'error': str(e)})
 
-def analyze_batch(tracks, num_workers=None):
+def analyze_batch(tracks, num_workers=None, use_cache=True, journal=None, max_retries=2,
+                  tier=audio_analyzer.DEFAULT_TIER, profile=False, lean=False):
     """
     Analyze multiple tracks in parallel
 
     Args:
         tracks: List of (track_id, audio_path) tuples
         num_workers: Number of parallel workers (default: CPU count - 1)
+        use_cache: Serve unchanged files from the shared feature cache
+        journal: Optional BatchJournal - resume from / checkpoint to it
+        max_retries: Retries for tracks that failed in earlier journaled runs
+        tier: Analysis fidelity tier ('fast', 'standard' or 'full')
+        profile: Add a per-stage 'timings' block to every result (always recomputes)
+        lean: Memory-lean float32 analysis (for very long files or small machines)
 
     Returns:
         Dictionary mapping track_id -> analysis results
@@ -42,18 +49,339 @@ def analyze_batch(tracks, num_workers=None):
     if num_workers is None:
         num_workers = max(1, cpu_count() - 1)  # Leave 1 core free
 
-    # Use multiprocessing pool for parallel analysis
+    if journal is not None:
+        results = dict(iter_journaled(tracks, journal, max_retries=max_retries,
+                                      num_workers=num_workers, use_cache=use_cache, tier=tier,
+                                      profile=profile, lean=lean))
+        return {track_id: results[track_id] for track_id, _ in tracks}
+
+    # Cache lookups (content hashing included) run in the workers, in parallel
+    results = dict(iter_batch(tracks, num_workers=num_workers, use_cache=use_cache, tier=tier,
+                              profile=profile, lean=lean))
+
+    # Keep input order in the output
+    return {track_id: results[track_id] for track_id, _ in tracks}
+
+def iter_batch(tracks, num_workers=None, use_cache=True, tier=audio_analyzer.DEFAULT_TIER, profile=False,
+               lean=False):
+    """
+    Analyze tracks in parallel, yielding (track_id, result) as each one finishes
+
+    Results come back in completion order, not input order, and nothing is
+    held after it is yielded - memory stays flat however long the list is.
+    Cache lookups happen inside the workers so hashing runs in parallel too.
+    """
+    if num_workers is None:
+        num_workers = max(1, cpu_count() - 1)  # Leave 1 core free
+
     with Pool(processes=num_workers) as pool:
-        results = pool.map(analyze_single_track, tracks)
+        worker = partial(analyze_single_track, use_cache=use_cache, tier=tier, profile=profile, lean=lean)
+        for item in pool.imap_unordered(worker, tracks, chunksize=1):
+            yield item
+
+def journal_params(tier=audio_analyzer.DEFAULT_TIER, lean=False):
+    """
+    Batch-wide analysis parameters a journal is tied to: the analyzer version
+    plus analysis_cache_params without the per-file filename BPM
+    """
+    params = audio_analyzer.analysis_cache_params('', tier=tier, lean=lean)
+    params.pop('filename_bpm')
+    params['version'] = audio_analyzer.ANALYZER_VERSION
+    return params
+
+class BatchJournal:
+    """
+    Append-only NDJSON journal of completed tracks for resumable batch jobs
+
+    The first line is a {"header": {"params"}} record of the journal_params the
+    job runs with. Every finished track is then written as {"id", "result", "ts"}
+    and fsync'd, so a killed run loses at most the tracks that were still in
+    flight. On restart the journal is replayed: succeeded tracks are skipped,
+    failed ones are retried until they have failed more than max_retries times.
+    Reopening a journal with different params raises ValueError instead of
+    mixing results from two configurations; with discard_stale=True the old
+    journal is moved aside to <path>.stale and the job starts over.
+    """
+
+    def __init__(self, path, params, discard_stale=False):
+        self.path = path
+        self._reset()
+        self._load()
+
+        stale = None
+        if self.params is None and (self.done or self.failed):
+            stale = f"Journal {path} has no parameter header"
+        elif self.params is not None and self.params != params:
+            stale = f"Journal {path} was written with {self.params}, not {params}"
+        if stale and not discard_stale:
+            raise ValueError(f"{stale}; delete it or use another journal")
+        if stale:
+            os.replace(path, path + '.stale')
+            print(f"{stale}; moved it to {path}.stale and starting over", file=sys.stderr)
+            self._reset()
+
+        self._file = open(path, 'a')
+        if self._file.tell() > 0 and not self._ends_with_newline():
+            # Terminate a torn final line so the next record starts clean
+            self._file.write('\n')
+        if self.params is None:
+            self.params = params
+            self._write({'header': {'params': params}})
+
+    def _reset(self):
+        self.params = None  # journal_params from the header
+        self.done = {}      # track_id -> successful result
+        self.failed = {}    # track_id -> last error result
+        self.failures = {}  # track_id -> number of failed attempts
+
+    def _ends_with_newline(self):
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    if 'header' in entry:
+                        self.params = entry['header']['params']
+                        continue
+                    track_id, result = entry['id'], entry['result']
+                except (ValueError, KeyError, TypeError):
+                    # Torn final line from a killed run
+                    continue
+
+                if isinstance(result, dict) and 'error' in result:
+                    self.failures[track_id] = self.failures.get(track_id, 0) + 1
+                    self.failed[track_id] = result
+                else:
+                    self.done[track_id] = result
+                    self.failed.pop(track_id, None)
+
+    def plan(self, tracks, max_retries=2):
+        """
+        Split tracks into (todo, finished)
+        finished maps track_id -> result for succeeded and retry-exhausted tracks
+        """
+        todo = []
+        finished = {}
+        for track_id, audio_path in tracks:
+            if track_id in self.done:
+                finished[track_id] = self.done[track_id]
+            elif self.failures.get(track_id, 0) > max_retries:
+                finished[track_id] = self.failed[track_id]
+            else:
+                todo.append((track_id, audio_path))
+        return todo, finished
+
+    def record(self, track_id, result):
+        self._write({'id': track_id, 'result': result, 'ts': time.time()})
+
+    def _write(self, entry):
+        self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+def iter_journaled(tracks, journal, max_retries=2, num_workers=None, use_cache=True,
+                   tier=audio_analyzer.DEFAULT_TIER, profile=False, lean=False):
+    """
+    Like iter_batch, but resumes from and checkpoints to a BatchJournal
+    Results already in the journal are yielded first, without re-analysis;
+    a journal written with other journal_params than tier/lean raises ValueError
+    """
+    params = journal_params(tier, lean)
+    if journal.params != params:
+        raise ValueError(f"Journal {journal.path} was written with {journal.params}, not {params}")
+
+    todo, finished = journal.plan(tracks, max_retries=max_retries)
+
+    print(
+        f"Journal {journal.path}: {len(finished)} already finished, {len(todo)} to analyze",
+        file=sys.stderr
+    )
 
-    # Convert list of tuples to dictionary
-    return dict(results)
+    for item in finished.items():
+        yield item
+
+    if not todo:
+        return
+
+    for track_id, result in iter_batch(todo, num_workers=num_workers, use_cache=use_cache, tier=tier,
+                                       profile=profile, lean=lean):
+        journal.record(track_id, result)
+        yield track_id, result
+
+class ProgressReporter:
+    """
+    Periodic progress / throughput lines on stderr
+    """
+
+    def __init__(self, total, interval=5.0):
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.errors = 0
+        self.audio_seconds = 0.0
+        self.start = time.time()
+        self.last_report = self.start
+
+    def update(self, result):
+        self.done += 1
+        if 'error' in result:
+            self.errors += 1
+        else:
+            self.audio_seconds += result.get('duration', 0) or 0
+
+        now = time.time()
+        if now - self.last_report >= self.interval or self.done == self.total:
+            self.report(now)
+
+    def report(self, now=None):
+        now = now or time.time()
+        self.last_report = now
+        elapsed = max(now - self.start, 1e-6)
+        rate = self.done / elapsed
+        remaining = (self.total - self.done) / rate if rate > 0 else 0
+        pct = (self.done / self.total * 100) if self.total else 100
+
+        print(
+            f"Progress: {self.done}/{self.total} ({pct:.1f}%) | "
+            f"{rate:.2f} tracks/s | {self.audio_seconds / elapsed:.1f}x realtime | "
+            f"errors {self.errors} | ETA {remaining:.0f}s",
+            file=sys.stderr,
+            flush=True
+        )
+
+def stream_batch(tracks, out, num_workers=None, use_cache=True, progress_interval=5.0,
+                 journal=None, max_retries=2, tier=audio_analyzer.DEFAULT_TIER, timings=None,
+                 lean=False):
+    """
+    Write one JSON line per track to `out` as soon as it finishes:
+        {"id": "track1", "result": {...}}
+    With a journal, tracks finished in earlier runs are replayed first
+    With a TimingSummary, tracks are profiled and aggregated into it
+    Returns (success_count, error_count)
+    """
+    progress = ProgressReporter(len(tracks), interval=progress_interval)
+    profile = timings is not None
+
+    if journal is not None:
+        results = iter_journaled(tracks, journal, max_retries=max_retries,
+                                 num_workers=num_workers, use_cache=use_cache, tier=tier, profile=profile,
+                                 lean=lean)
+    else:
+        results = iter_batch(tracks, num_workers=num_workers, use_cache=use_cache, tier=tier, profile=profile,
+                             lean=lean)
+
+    for track_id, result in results:
+        out.write(json.dumps({'id': track_id, 'result': result}) + '\n')
+        out.flush()
+        progress.update(result)
+        if profile:
+            timings.add(track_id, result)
+
+    return progress.done - progress.errors, progress.errors
+
+class TimingSummary:
+    """
+    Aggregates the per-track 'timings' blocks of a profiled batch run:
+    per-stage total / mean / p95 / max and share of analysis time, plus the
+    slowest tracks
+    """
+
+    def __init__(self, slowest=5):
+        self.slowest = slowest
+        self.stages = {}   # stage -> [seconds per track]
+        self.totals = []   # (total seconds, track_id, audio seconds)
+        self.peak_rss_mb = 0.0
+
+    def add(self, track_id, result):
+        timings = result.get('timings')
+        if not timings:
+            return
+
+        for stage, seconds in timings.get('stages', {}).items():
+            self.stages.setdefault(stage, []).append(seconds)
+        self.totals.append((timings.get('total_s', 0.0), track_id, timings.get('audio_duration_s')))
+        self.peak_rss_mb = max(self.peak_rss_mb, timings.get('peak_rss_mb') or 0.0)
+
+    def summary(self):
+        grand_total = sum(t for t, _, _ in self.totals) or 1e-9
+        stages = {}
+        for stage, values in self.stages.items():
+            values = np.asarray(values)
+            stages[stage] = {
+                'tracks': int(len(values)),
+                'total_s': float(values.sum()),
+                'mean_s': float(values.mean()),
+                'p95_s': float(np.percentile(values, 95)),
+                'max_s': float(values.max()),
+                'share': float(values.sum() / grand_total)
+            }
+
+        slowest = sorted(self.totals, key=lambda t: t[0], reverse=True)[:self.slowest]
+        return {
+            'tracks': len(self.totals),
+            'total_s': float(sum(t for t, _, _ in self.totals)),
+            'peak_rss_mb': self.peak_rss_mb,
+            'stages': dict(sorted(stages.items(), key=lambda kv: kv[1]['total_s'], reverse=True)),
+            'slowest_tracks': [
+                {'id': track_id, 'total_s': total, 'audio_duration_s': audio_s}
+                for total, track_id, audio_s in slowest
+            ]
+        }
+
+    def report(self, file=sys.stderr):
+        summary = self.summary()
+        print(f"\nProfile: {summary['tracks']} tracks, {summary['total_s']:.1f}s analysis time, "
+              f"peak RSS {summary['peak_rss_mb']:.0f} MB (per worker)", file=file)
+        for stage, s in summary['stages'].items():
+            print(f"  {stage:<20} {s['total_s']:8.2f}s total  {s['mean_s']:7.3f}s mean  "
+                  f"{s['p95_s']:7.3f}s p95  {s['share'] * 100:5.1f}%", file=file)
+        for track in summary['slowest_tracks']:
+            print(f"  slowest: {track['id']} {track['total_s']:.2f}s", file=file)
+        return summary
+
+def write_profile(timings, path=None):
+    """Print the aggregate profile, and save it as JSON when a path is given"""
+    summary = timings.report()
+    if path:
+        with open(path, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"Profile summary written to {path}", file=sys.stderr)
 
 def main():
     parser = argparse.ArgumentParser(description='Batch analyze audio files in parallel')
     parser.add_argument('tracks_json', help='JSON file with track list: [{"id": "track1", "path": "/path/to/file"}, ...]')
     parser.add_argument('--workers', type=int, default=None, help='Number of parallel workers')
     parser.add_argument('--output', help='Output JSON file (default: stdout)')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the shared feature cache')
+    parser.add_argument('--tier', choices=list(audio_analyzer.ANALYSIS_TIERS), default=audio_analyzer.DEFAULT_TIER,
+                        help='Analysis fidelity: fast for bulk imports, full for single tracks '
+                             f'(default: {audio_analyzer.DEFAULT_TIER})')
+    parser.add_argument('--lean', action='store_true',
+                        help='Memory-lean float32 analysis: chunked STFT and features, lower peak RAM per worker')
+    parser.add_argument('--profile', action='store_true',
+                        help='Add per-stage timings to every result and print an aggregate summary')
+    parser.add_argument('--profile-output', help='With --profile, also write the aggregate summary as JSON')
+    parser.add_argument('--stream', action='store_true',
+                        help='Write NDJSON ({"id", "result"} per line) as each track finishes')
+    parser.add_argument('--progress-interval', type=float, default=5.0,
+                        help='Seconds between progress lines on stderr in --stream mode')
+    parser.add_argument('--journal', help='Job journal (NDJSON): checkpoint every finished track and '
+                                          'resume from it on restart (with the same --tier/--lean)')
+    parser.add_argument('--discard-stale-journal', action='store_true',
+                        help='Move a --journal written with other parameters aside and start over '
+                             'instead of failing')
+    parser.add_argument('--max-retries', type=int, default=2,
+                        help='With --journal, retry tracks that failed in earlier runs up to this many times')
 
     args = parser.parse_args()
 
@@ -66,8 +394,45 @@ def main():
 
     print(f"Analyzing {len(tracks)} tracks using {args.workers or (cpu_count() - 1)} workers...", file=sys.stderr)
 
+    try:
+        journal = BatchJournal(args.journal, journal_params(args.tier, args.lean),
+                               discard_stale=args.discard_stale_journal) if args.journal else None
+    except ValueError as e:
+        parser.error(str(e))
+    timings = TimingSummary() if args.profile else None
+
+    if args.stream:
+        out = open(args.output, 'w') if args.output else sys.stdout
+        try:
+            success_count, error_count = stream_batch(
+                tracks, out,
+                num_workers=args.workers,
+                use_cache=not args.no_cache,
+                progress_interval=args.progress_interval,
+                journal=journal,
+                max_retries=args.max_retries,
+                tier=args.tier,
+                timings=timings,
+                lean=args.lean
+            )
+        finally:
+            if args.output:
+                out.close()
+            if journal:
+                journal.close()
+        print(f"\n✓ Success: {success_count}, ✗ Errors: {error_count}", file=sys.stderr)
+        if timings:
+            write_profile(timings, args.profile_output)
+        return
+
     # Run batch analysis
-    results = analyze_batch(tracks, num_workers=args.workers)
+    try:
+        results = analyze_batch(tracks, num_workers=args.workers, use_cache=not args.no_cache,
+                                journal=journal, max_retries=args.max_retries, tier=args.tier,
+                                profile=args.profile, lean=args.lean)
+    finally:
+        if journal:
+            journal.close()
 
     # Output results
     if args.output:
@@ -82,5 +447,10 @@ def main():
     error_count = len(results) - success_count
     print(f"\n✓ Success: {success_count}, ✗ Errors: {error_count}", file=sys.stderr)
 
+    if timings:
+        for track_id, result in results.items():
+            timings.add(track_id, result)
+        write_profile(timings, args.profile_output)
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,16 @@
+"""
+Reproducible benchmarks for the Python audio analysis pipeline
+
+Run from backend/src/python:
+
+    python -m benchmarks fixtures                 # write the synthetic audio set
+    python -m benchmarks run --suite quick        # time it, save JSON results
+    python -m benchmarks compare old.json new.json
+    python -m benchmarks bpm                      # tempo accuracy per backend
+    python -m benchmarks startup                  # entry point start-up time guard
+    python -m benchmarks palette                  # Visual DNA quantizers: speed vs palette
+
+Fixtures are deterministic synthetic audio (click tracks at known BPMs,
+tonal pads, silence-padded clips, 1 s to 2 h), so runs on different
+machines or commits measure the same input.
+"""
@@ -0,0 +1,124 @@
+"""
+python -m benchmarks {fixtures,run,compare,bpm,startup,palette}
+"""
+
+import sys
+import json
+import argparse
+
+from benchmarks.fixtures import ensure_fixtures, default_fixture_dir
+from benchmarks.runner import run_suite, save_report, compare_reports
+from benchmarks.bpm import BACKENDS, run_bpm_harness, print_summary
+from benchmarks.startup import run_startup, check_startup
+from benchmarks import palette
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='Benchmark the audio analysis pipeline')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    fixtures = sub.add_parser('fixtures', help='Write the synthetic fixture set')
+    fixtures.add_argument('--suite', default='quick', choices=['quick', 'standard', 'long'])
+    fixtures.add_argument('--dir', help=f'Fixture directory (default: {default_fixture_dir()})')
+
+    run = sub.add_parser('run', help='Run the benchmarks and save JSON results')
+    run.add_argument('--suite', default='quick', choices=['quick', 'standard', 'long'])
+    run.add_argument('--dir', help='Fixture directory')
+    run.add_argument('--workers', default='1,2,4', help='Worker counts for batch scaling (default: 1,2,4)')
+    run.add_argument('--tier', default='full', help='Analysis tier for analyze_audio / batch (default: full)')
+    run.add_argument('--pipelines', default='analyze,batch,sonic',
+                     help='Comma-separated subset of analyze,batch,sonic')
+    run.add_argument('--output', help='Results JSON (default: benchmarks/results/bench-<suite>-<time>.json)')
+
+    compare = sub.add_parser('compare', help='Compare two saved results files')
+    compare.add_argument('old')
+    compare.add_argument('new')
+
+    bpm = sub.add_parser('bpm', help='BPM accuracy / speed across tempo backends')
+    bpm.add_argument('--backends', default=','.join(BACKENDS),
+                     help=f'Comma-separated subset of {",".join(BACKENDS)}')
+    bpm.add_argument('--dir', help='Fixture directory')
+    bpm.add_argument('--output', help='Write per-track rows and summaries as JSON')
+
+    startup = sub.add_parser('startup', help='Entry point start-up time (fails on regressions)')
+    startup.add_argument('--repeats', type=int, default=5, help='Runs per case (median is reported)')
+    startup.add_argument('--max-seconds', type=float, help='Fail if any case is slower than this')
+    startup.add_argument('--dir', help='Fixture directory')
+    startup.add_argument('--output', help='Write the report as JSON')
+
+    quant = sub.add_parser('palette', help='Visual DNA color quantizers: speed and palette similarity')
+    quant.add_argument('--quantizers', help='Comma-separated subset (default: all)')
+    quant.add_argument('--images', help='Directory of photos to use instead of the generated fixtures')
+    quant.add_argument('--repeats', type=int, default=3, help='Runs per photo (median is reported)')
+    quant.add_argument('--dir', help='Fixture directory')
+    quant.add_argument('--output', help='Write per-photo rows and summaries as JSON')
+
+    args = parser.parse_args()
+
+    if args.command == 'fixtures':
+        for spec, path in ensure_fixtures(args.suite, args.dir):
+            log(f"{spec['name']:<28} {spec['duration']:>6}s  {path}")
+
+    elif args.command == 'run':
+        report = run_suite(
+            suite=args.suite,
+            workers=[int(n) for n in args.workers.split(',') if n.strip()],
+            tier=args.tier,
+            fixture_dir=args.dir,
+            pipelines=[p.strip() for p in args.pipelines.split(',') if p.strip()],
+            log=log
+        )
+        log(f"Results written to {save_report(report, args.output)}")
+
+    elif args.command == 'bpm':
+        report = run_bpm_harness(
+            backends=[b.strip() for b in args.backends.split(',') if b.strip()],
+            fixture_dir=args.dir,
+            log=log
+        )
+        print_summary(report['summary'], log=print)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+            log(f"Results written to {args.output}")
+
+    elif args.command == 'startup':
+        report = run_startup(repeats=args.repeats, fixture_dir=args.dir, log=log)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+            log(f"Results written to {args.output}")
+        problems = check_startup(report, args.max_seconds)
+        for problem in problems:
+            log(f"REGRESSION: {problem}")
+        return 1 if problems else 0
+
+    elif args.command == 'palette':
+        report = palette.run_palette_bench(
+            quantizers=[q.strip() for q in args.quantizers.split(',') if q.strip()] if args.quantizers else None,
+            repeats=args.repeats,
+            image_dir=args.images,
+            fixture_dir=args.dir,
+            log=log
+        )
+        palette.print_summary(report['summary'], log=print)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+            log(f"Results written to {args.output}")
+
+    else:
+        with open(args.old) as f:
+            old = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        compare_reports(old, new, log=print)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
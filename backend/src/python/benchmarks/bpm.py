@@ -0,0 +1,206 @@
+"""
+BPM accuracy / speed harness across the tempo backends
+
+Backends (each skipped cleanly if its dependencies are missing):
+    librosa_full   audio_analyzer tempo path: beat tracking, validate_bpm_with_multiples,
+                   detect_halftime (full tier)
+    librosa_fast   the same path at the fast tier
+    improved       audio_analyzer_improved.analyze_audio_improved (plain beat_track)
+    essentia       bpm_essentia.detect_bpm_essentia (RhythmExtractor2013)
+
+Metrics per backend and genre category:
+    acc1       within 4% of the known tempo
+    acc2       within 4% of the known tempo or x2, x1/2, x3, x1/3 (metrical level errors allowed)
+    octave     wrong by exactly x2 or x1/2
+    other_ratio  wrong by x1.5, x2/3, x1.2 or x1/1.2 (the dubstep-style traps)
+    halftime   detect_halftime agrees with the annotation (librosa backends only)
+    time       mean wall seconds per track, decode included
+"""
+
+import io
+import time
+import contextlib
+
+import numpy as np
+
+from benchmarks.fixtures import ensure_tempo_corpus
+
+TOLERANCE = 0.04
+OCTAVE_RATIOS = (2.0, 0.5)
+METRICAL_RATIOS = (1.0, 2.0, 0.5, 3.0, 1 / 3)
+TRAP_RATIOS = (1.5, 2 / 3, 1.2, 1 / 1.2)
+
+
+def _close(estimate, target):
+    return abs(estimate - target) <= TOLERANCE * target
+
+
+def classify(estimate, truth):
+    """Which error bucket an estimate falls into"""
+    if estimate is None:
+        return 'failed'
+    if _close(estimate, truth):
+        return 'correct'
+    if any(_close(estimate, truth * r) for r in OCTAVE_RATIOS):
+        return 'octave'
+    if any(_close(estimate, truth * r) for r in TRAP_RATIOS):
+        return 'other_ratio'
+    if any(_close(estimate, truth * r) for r in METRICAL_RATIOS):
+        return 'metrical'
+    return 'wrong'
+
+
+def _librosa_backend(tier):
+    import librosa
+    import audio_analyzer as aa
+
+    settings = aa.get_tier(tier)
+
+    def detect(path):
+        if settings['sr'] is None:
+            y, sr = librosa.load(path, sr=None)
+        else:
+            y, sr = librosa.load(path, sr=settings['sr'], res_type=settings['res_type'])
+        ctx = aa.build_feature_context(y, sr, n_fft=settings['n_fft'], hop_length=settings['hop'])
+        tempo, beats = aa.track_beats(ctx['beat_onset_env'], sr, hop_length=ctx['hop_length'])
+        tempo = aa.validate_bpm_with_multiples(float(np.asarray(tempo).item()), y, sr, path, ctx=ctx,
+                                               octave_only=settings['octave_only'])
+        is_halftime, _ = aa.detect_halftime(y, sr, tempo, beats, onset_env=ctx['onset_env'],
+                                            hop_length=ctx['hop_length'])
+        return {'bpm': float(tempo), 'halftime': bool(is_halftime)}
+
+    return detect
+
+
+def _improved_backend():
+    import audio_analyzer_improved
+
+    def detect(path):
+        result = audio_analyzer_improved.analyze_audio_improved(path)
+        if 'error' in result:
+            raise RuntimeError(result['error'])
+        return {'bpm': result['bpm']}
+
+    return detect
+
+
+def _essentia_backend():
+    # bpm_essentia prints an error and exits at import time when essentia is missing
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            import bpm_essentia
+        except SystemExit:
+            raise ImportError('essentia is not installed')
+
+    def detect(path):
+        result = bpm_essentia.detect_bpm_essentia(path)
+        if 'error' in result:
+            raise RuntimeError(result['error'])
+        return {'bpm': result['bpm']}
+
+    return detect
+
+
+BACKENDS = {
+    'librosa_full': lambda: _librosa_backend('full'),
+    'librosa_fast': lambda: _librosa_backend('fast'),
+    'improved': _improved_backend,
+    'essentia': _essentia_backend,
+}
+
+
+def load_backends(names=None, log=print):
+    """Instantiate the requested backends, skipping any whose imports fail"""
+    loaded = {}
+    for name in names or BACKENDS:
+        try:
+            loaded[name] = BACKENDS[name]()
+        except ImportError as e:
+            log(f"Skipping {name}: {e}")
+    return loaded
+
+
+def run_bpm_harness(backends=None, fixture_dir=None, log=print):
+    """
+    Run every available backend over the tempo corpus
+    Returns a JSON-serialisable report with per-track rows and summaries
+    """
+    corpus = ensure_tempo_corpus(fixture_dir)
+    detectors = load_backends(backends, log=log)
+
+    rows = []
+    for name, detect in detectors.items():
+        # Warm-up on the first clip so JIT compilation isn't charged to one track
+        try:
+            detect(str(corpus[0][1]))
+        except Exception:
+            pass
+
+        for spec, path in corpus:
+            start = time.perf_counter()
+            try:
+                out = detect(str(path))
+                error = None
+            except Exception as e:
+                out, error = {}, str(e)
+            elapsed = time.perf_counter() - start
+
+            row = {
+                'backend': name,
+                'track': spec['name'],
+                'category': spec['category'],
+                'true_bpm': spec['bpm'],
+                'bpm': out.get('bpm'),
+                'outcome': classify(out.get('bpm'), spec['bpm']),
+                'time_s': elapsed,
+                'error': error
+            }
+            if 'halftime' in out:
+                row['halftime'] = out['halftime']
+                row['halftime_expected'] = spec['halftime']
+            rows.append(row)
+
+    return {'rows': rows, 'summary': summarize(rows)}
+
+
+def _stats(rows):
+    n = len(rows)
+    outcomes = [r['outcome'] for r in rows]
+    stats = {
+        'tracks': n,
+        'acc1': outcomes.count('correct') / n,
+        'acc2': sum(o in ('correct', 'octave', 'metrical') for o in outcomes) / n,
+        'octave': outcomes.count('octave') / n,
+        'other_ratio': outcomes.count('other_ratio') / n,
+        'failed': outcomes.count('failed') / n,
+        'time_s': float(np.mean([r['time_s'] for r in rows]))
+    }
+    halftime_rows = [r for r in rows if 'halftime' in r]
+    if halftime_rows:
+        stats['halftime'] = sum(r['halftime'] == r['halftime_expected'] for r in halftime_rows) / len(halftime_rows)
+    return stats
+
+
+def summarize(rows):
+    """Per-backend totals and per-backend x category breakdown"""
+    summary = {}
+    for backend in dict.fromkeys(r['backend'] for r in rows):
+        backend_rows = [r for r in rows if r['backend'] == backend]
+        summary[backend] = {
+            'all': _stats(backend_rows),
+            'categories': {
+                category: _stats([r for r in backend_rows if r['category'] == category])
+                for category in dict.fromkeys(r['category'] for r in backend_rows)
+            }
+        }
+    return summary
+
+
+def print_summary(summary, log=print):
+    log(f"{'backend':<14} {'category':<14} {'acc1':>6} {'acc2':>6} {'octave':>7} {'ratio':>6} "
+        f"{'halftime':>8} {'s/track':>8}")
+    for backend, data in summary.items():
+        for category, s in [('ALL', data['all'])] + list(data['categories'].items()):
+            halftime = f"{s['halftime']:8.0%}" if 'halftime' in s else f"{'-':>8}"
+            log(f"{backend:<14} {category:<14} {s['acc1']:6.0%} {s['acc2']:6.0%} {s['octave']:7.0%} "
+                f"{s['other_ratio']:6.0%} {halftime} {s['time_s']:8.3f}")
@@ -0,0 +1,280 @@
+"""
+Deterministic synthetic audio (and photo) fixtures
+
+Every signal is a pure function of the absolute sample index (plus a seeded
+noise stream per block), so files are bit-identical across runs and can be
+written block by block - a 2-hour fixture never sits in memory. Photo
+fixtures are seeded renders plus scikit-learn's bundled sample photos.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+DEFAULT_SR = 44100
+WRITE_BLOCK = 1 << 20  # samples per write
+NOTE_FREQS = {'A3': 220.0, 'C4': 261.63, 'E4': 329.63, 'G4': 392.0, 'D4': 293.66, 'F4': 349.23}
+
+
+def default_fixture_dir():
+    return Path(os.environ.get('STARFORGE_BENCH_FIXTURES',
+                               Path(tempfile.gettempdir()) / 'starforge_bench_fixtures'))
+
+
+def click_block(t, sr, bpm):
+    """Kick on every beat (60 Hz, 120 ms decay) plus a 1 kHz click accent on downbeats"""
+    beat_len = 60.0 / bpm
+    phase = np.mod(t, beat_len)
+    beat_no = np.floor(t / beat_len).astype(np.int64)
+
+    kick = np.sin(2 * np.pi * 60.0 * phase) * np.exp(-phase / 0.12)
+    click = np.sin(2 * np.pi * 1000.0 * phase) * np.exp(-phase / 0.01)
+    downbeat = (beat_no % 4) == 0
+
+    return 0.6 * kick + 0.3 * click * downbeat
+
+
+def pad_block(t, sr, notes):
+    """Sustained chord with a slow (0.25 Hz) swell"""
+    chord = sum(np.sin(2 * np.pi * NOTE_FREQS[n] * t) for n in notes) / len(notes)
+    swell = 0.6 + 0.4 * np.sin(2 * np.pi * 0.25 * t)
+    return 0.4 * chord * swell
+
+
+def render_block(spec, start, n, sr):
+    """Samples [start, start + n) of the fixture described by spec"""
+    t = (start + np.arange(n)) / sr
+    y = np.zeros(n)
+
+    if spec.get('bpm'):
+        y += click_block(t, sr, spec['bpm'])
+    if spec.get('notes'):
+        y += pad_block(t, sr, spec['notes'])
+    if spec.get('noise'):
+        # Seeded per block start so the stream is identical at any file size
+        rng = np.random.default_rng([spec.get('seed', 0), start])
+        y += spec['noise'] * rng.standard_normal(n)
+
+    # Silence padding at both ends
+    pad = int(spec.get('silence_pad', 0) * sr)
+    if pad:
+        total = int(spec['duration'] * sr)
+        idx = start + np.arange(n)
+        y[(idx < pad) | (idx >= total - pad)] = 0.0
+
+    return y.astype(np.float32)
+
+
+def fixture_specs(suite='quick'):
+    """
+    Named fixture sets
+        quick     seconds-long clips for a smoke run
+        standard  adds 5-minute tracks
+        long      adds a 30-minute and a 2-hour DJ-set-length file
+    """
+    specs = [
+        {'name': 'click_128_1s', 'duration': 1, 'bpm': 128},
+        {'name': 'click_128_30s', 'duration': 30, 'bpm': 128, 'noise': 0.01},
+        {'name': 'click_174_30s', 'duration': 30, 'bpm': 174, 'noise': 0.01},
+        {'name': 'pad_amin_30s', 'duration': 30, 'notes': ['A3', 'C4', 'E4'], 'noise': 0.005},
+        {'name': 'mix_90_padded_30s', 'duration': 30, 'bpm': 90, 'notes': ['C4', 'E4', 'G4'],
+         'noise': 0.01, 'silence_pad': 5},
+    ]
+    if suite in ('standard', 'long'):
+        specs += [
+            {'name': 'mix_124_5min', 'duration': 300, 'bpm': 124, 'notes': ['D4', 'F4', 'A3'], 'noise': 0.01},
+            {'name': 'mix_140_5min', 'duration': 300, 'bpm': 140, 'notes': ['A3', 'C4', 'E4'], 'noise': 0.01},
+        ]
+    if suite == 'long':
+        specs += [
+            {'name': 'mix_126_30min', 'duration': 1800, 'bpm': 126, 'notes': ['A3', 'C4', 'E4'], 'noise': 0.01},
+            {'name': 'mix_125_2h', 'duration': 7200, 'bpm': 125, 'notes': ['C4', 'E4', 'G4'], 'noise': 0.01,
+             'silence_pad': 30},
+        ]
+    if suite not in ('quick', 'standard', 'long'):
+        raise ValueError(f"Unknown suite: {suite} (choose from quick, standard, long)")
+    return specs
+
+
+def write_fixture(spec, directory, sr=DEFAULT_SR):
+    """Render one fixture to a 16-bit WAV (skipped if already present)"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{spec['name']}.wav"
+
+    total = int(spec['duration'] * sr)
+    if path.exists():
+        try:
+            if sf.info(str(path)).frames == total:
+                return path
+        except RuntimeError:
+            pass
+
+    tmp = path.with_suffix('.tmp.wav')
+    with sf.SoundFile(str(tmp), 'w', samplerate=sr, channels=1, subtype='PCM_16') as f:
+        for start in range(0, total, WRITE_BLOCK):
+            f.write(render_block(spec, start, min(WRITE_BLOCK, total - start), sr))
+    os.replace(tmp, path)
+    return path
+
+
+def ensure_fixtures(suite='quick', directory=None, sr=DEFAULT_SR):
+    """Write every fixture in a suite; returns [(spec, path)]"""
+    directory = directory or default_fixture_dir()
+    return [(spec, write_fixture(spec, directory, sr)) for spec in fixture_specs(suite)]
+
+
+# Drum patterns for the tempo corpus: (instrument, beat position) within one
+# 4-beat bar. Tempos are chosen to hit the cases BPM validation special-cases.
+DRUM_PATTERNS = {
+    # Kick on every beat, open hat on the off-beats
+    'four_on_floor': [('kick', b) for b in range(4)] + [('hat', b + 0.5) for b in range(4)]
+                     + [('snare', 1), ('snare', 3)],
+    # Two-step: kick on 1 and the and-of-3, snare on 2 and 4, 8th-note hats
+    'dnb_two_step': [('kick', 0), ('kick', 2.5), ('snare', 1), ('snare', 3)]
+                    + [('hat', b / 2) for b in range(8)],
+    # Half-time: kick on 1, a single snare on 3, sparse hats - feels like half the tempo
+    'half_time': [('kick', 0), ('kick', 1.75), ('snare', 2)] + [('hat', b) for b in range(4)],
+    # Triplet hats over a half-time backbeat (tends to pull detectors off by 1.5x / 1.2x)
+    'triplet_trap': [('kick', 0), ('kick', 2.5), ('snare', 2)] + [('hat', b / 3) for b in range(12)],
+}
+
+
+def tempo_corpus():
+    """
+    Known-tempo clips for the BPM harness
+    Names carry no numbers in the 60-200 range, so the filename BPM shortcut
+    in validate_bpm_with_multiples never kicks in.
+    """
+    cases = [
+        ('house', 'four_on_floor', [120, 124, 128]),
+        ('techno', 'four_on_floor', [132, 138]),
+        ('dnb', 'dnb_two_step', [170, 174, 176]),
+        ('halftime', 'half_time', [140, 150, 160]),
+        ('dubstep_trap', 'triplet_trap', [124, 140, 150]),
+        ('hiphop', 'half_time', [86, 92]),
+    ]
+    corpus = []
+    for category, pattern, tempos in cases:
+        for i, bpm in enumerate(tempos):
+            corpus.append({
+                'name': f'tempo_{category}_{chr(ord("a") + i)}',
+                'category': category,
+                'pattern': pattern,
+                'bpm': bpm,
+                'halftime': pattern == 'half_time' and bpm >= 140,
+                'duration': 30,
+                'seed': len(corpus)
+            })
+    return corpus
+
+
+def render_pattern(spec, sr=DEFAULT_SR):
+    """Render a drum-pattern clip (short, so built in memory)"""
+    n = int(spec['duration'] * sr)
+    y = np.zeros(n)
+    rng = np.random.default_rng(spec.get('seed', 0))
+    beat_len = 60.0 / spec['bpm']
+    bar_len = 4 * beat_len
+
+    sounds = {}
+    t = np.arange(int(0.3 * sr)) / sr
+    sounds['kick'] = 0.8 * np.sin(2 * np.pi * (50 + 80 * np.exp(-t / 0.02)) * t) * np.exp(-t / 0.15)
+    sounds['snare'] = 0.5 * rng.standard_normal(len(t)) * np.exp(-t / 0.05) \
+        + 0.3 * np.sin(2 * np.pi * 190 * t) * np.exp(-t / 0.08)
+    hat = rng.standard_normal(len(t))
+    sounds['hat'] = 0.15 * np.diff(hat, prepend=0) * np.exp(-t / 0.015)
+
+    for bar_start in np.arange(0, spec['duration'], bar_len):
+        for instrument, beat in DRUM_PATTERNS[spec['pattern']]:
+            start = int(round((bar_start + beat * beat_len) * sr))
+            if start >= n:
+                continue
+            sound = sounds[instrument][:n - start]
+            y[start:start + len(sound)] += sound
+
+    # Low bed so silence gating does not dominate
+    y += 0.005 * rng.standard_normal(n)
+    return (y / max(1.0, np.max(np.abs(y)))).astype(np.float32)
+
+
+def ensure_tempo_corpus(directory=None, sr=DEFAULT_SR):
+    """Write the tempo corpus; returns [(spec, path)]"""
+    directory = Path(directory or default_fixture_dir()) / 'tempo'
+    directory.mkdir(parents=True, exist_ok=True)
+
+    out = []
+    for spec in tempo_corpus():
+        path = directory / f"{spec['name']}.wav"
+        if not path.exists():
+            tmp = path.with_suffix('.tmp.wav')
+            sf.write(str(tmp), render_pattern(spec, sr), sr, subtype='PCM_16')
+            os.replace(tmp, path)
+        out.append((spec, path))
+    return out
+
+
+def image_specs():
+    """Synthetic photo-like scenes: (name, palette of RGB anchors, seed)"""
+    return [
+        {'name': 'img_sunset', 'colors': [(250, 140, 60), (200, 60, 80), (40, 30, 70), (250, 210, 150)], 'seed': 1},
+        {'name': 'img_forest', 'colors': [(30, 70, 30), (90, 130, 60), (140, 110, 70), (200, 220, 190)], 'seed': 2},
+        {'name': 'img_ocean', 'colors': [(20, 60, 120), (60, 150, 200), (230, 240, 245), (200, 180, 140)], 'seed': 3},
+        {'name': 'img_night_city', 'colors': [(10, 10, 20), (250, 200, 80), (200, 40, 160), (40, 40, 60)], 'seed': 4},
+        {'name': 'img_portrait', 'colors': [(220, 180, 150), (120, 80, 60), (60, 60, 65), (180, 190, 200)], 'seed': 5},
+        {'name': 'img_pastel', 'colors': [(240, 200, 210), (200, 220, 240), (230, 240, 200), (250, 250, 245)], 'seed': 6},
+    ]
+
+
+def render_image(spec, width=1200, height=800):
+    """
+    A photo-like RGB image: a vertical gradient between two anchor colors,
+    soft blobs in the others, and sensor-style noise
+    """
+    rng = np.random.default_rng(spec['seed'])
+    colors = np.array(spec['colors'], dtype=np.float64)
+    yy, xx = np.mgrid[0:height, 0:width] / max(width, height)
+
+    t = (yy / yy.max())[..., None]
+    img = colors[0] * (1 - t) + colors[1] * t
+    for color in colors[2:]:
+        for _ in range(3):
+            cx, cy = rng.uniform(0, width / max(width, height)), rng.uniform(0, height / max(width, height))
+            radius = rng.uniform(0.05, 0.2)
+            mask = np.exp(-((xx - cx) ** 2 + (yy - cy) ** 2) / (2 * radius ** 2))[..., None]
+            img = img * (1 - mask) + color * mask
+
+    img += rng.normal(0, 6, img.shape)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def ensure_image_fixtures(directory=None):
+    """Write the photo fixtures as JPEGs; returns [(name, path)]"""
+    from PIL import Image
+
+    directory = Path(directory or default_fixture_dir()) / 'images'
+    directory.mkdir(parents=True, exist_ok=True)
+
+    out = []
+    for spec in image_specs():
+        path = directory / f"{spec['name']}.jpg"
+        if not path.exists():
+            Image.fromarray(render_image(spec)).save(path, quality=90)
+        out.append((spec['name'], path))
+
+    # Real photos, if scikit-learn's sample images are installed
+    try:
+        from sklearn.datasets import load_sample_images
+        samples = load_sample_images()
+        for filename, image in zip(samples.filenames, samples.images):
+            path = directory / f"sample_{Path(filename).stem}.jpg"
+            if not path.exists():
+                Image.fromarray(image).save(path, quality=95)
+            out.append((path.stem, path))
+    except Exception:
+        pass
+
+    return out
@@ -0,0 +1,109 @@
+"""
+Color quantizer speed / palette similarity for Visual DNA
+
+Every quantizer in visual_dna_analyzer.QUANTIZERS extracts the palette of
+each photo; the KMeans (n_init=10) palette is the reference. Per quantizer:
+
+    time_s      median seconds per photo (decode and resize included)
+    speedup     kmeans time / this time
+    distance    palette distance to the reference: percentage-weighted mean
+                RGB distance from each color to the nearest color of the
+                other palette, averaged over both directions (0 = identical;
+                visual_dna_analyzer merges colors closer than 30)
+"""
+
+import time
+import statistics
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.fixtures import ensure_image_fixtures
+
+REFERENCE = 'kmeans'
+IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+def palette_distance(a, b):
+    """Symmetric weighted nearest-color RGB distance between two palettes"""
+    if not a or not b:
+        return None
+
+    def directed(src, dst):
+        src_rgb = np.array([c['rgb'] for c in src], dtype=np.float64)
+        dst_rgb = np.array([c['rgb'] for c in dst], dtype=np.float64)
+        weights = np.array([c['percentage'] for c in src], dtype=np.float64)
+        nearest = np.linalg.norm(src_rgb[:, None, :] - dst_rgb[None, :, :], axis=2).min(axis=1)
+        return float(np.average(nearest, weights=weights))
+
+    return (directed(a, b) + directed(b, a)) / 2
+
+
+def collect_images(image_dir=None, fixture_dir=None):
+    """[(name, path)] from a directory of photos, or the generated fixtures"""
+    if image_dir:
+        paths = sorted(p for p in Path(image_dir).iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+        return [(p.stem, p) for p in paths]
+    return ensure_image_fixtures(fixture_dir)
+
+
+def run_palette_bench(quantizers=None, repeats=3, image_dir=None, fixture_dir=None, log=print):
+    """
+    Time every quantizer on every photo and compare its palette with the
+    reference; returns a JSON-serialisable report
+    """
+    import visual_dna_analyzer as vda
+
+    quantizers = list(quantizers or vda.QUANTIZERS)
+    if REFERENCE not in quantizers:
+        quantizers.insert(0, REFERENCE)
+    images = collect_images(image_dir, fixture_dir)
+
+    # Warm-up: library imports and first-call overhead are not charged to a photo
+    for name in quantizers:
+        vda.extract_dominant_colors(str(images[0][1]), quantizer=name)
+
+    rows = []
+    for image_name, path in images:
+        palettes = {}
+        for name in quantizers:
+            times = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                palettes[name] = vda.extract_dominant_colors(str(path), quantizer=name)
+                times.append(time.perf_counter() - start)
+            rows.append({
+                'image': image_name,
+                'quantizer': name,
+                'time_s': statistics.median(times),
+                'palette': [c['hex'] for c in palettes[name] or []],
+                'distance': palette_distance(palettes[name], palettes[REFERENCE])
+            })
+        log(f"{image_name:<24} " + '  '.join(
+            f"{r['quantizer']} {r['time_s'] * 1000:6.1f}ms" for r in rows if r['image'] == image_name))
+
+    return {'repeats': repeats, 'images': len(images), 'rows': rows, 'summary': summarize(rows)}
+
+
+def summarize(rows):
+    """Per-quantizer mean time, speed-up over the reference and palette distances"""
+    reference_time = statistics.mean(r['time_s'] for r in rows if r['quantizer'] == REFERENCE)
+    summary = {}
+    for name in dict.fromkeys(r['quantizer'] for r in rows):
+        mine = [r for r in rows if r['quantizer'] == name]
+        distances = [r['distance'] for r in mine if r['distance'] is not None]
+        mean_time = statistics.mean(r['time_s'] for r in mine)
+        summary[name] = {
+            'time_s': mean_time,
+            'speedup': reference_time / mean_time if mean_time else None,
+            'distance_mean': statistics.mean(distances) if distances else None,
+            'distance_max': max(distances) if distances else None
+        }
+    return summary
+
+
+def print_summary(summary, log=print):
+    log(f"{'quantizer':<12} {'ms/photo':>9} {'speedup':>8} {'dist mean':>10} {'dist max':>9}")
+    for name, s in summary.items():
+        log(f"{name:<12} {s['time_s'] * 1000:9.1f} {s['speedup']:7.1f}x "
+            f"{s['distance_mean'] or 0:10.1f} {s['distance_max'] or 0:9.1f}")
@@ -0,0 +1,207 @@
+"""
+Benchmark runner
+
+Every case runs in a fresh spawned process so peak RSS is the case's own
+(ru_maxrss never goes down within a process) and imports/JIT warm-up are
+reported separately from steady-state time.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import resource
+import subprocess
+from pathlib import Path
+from multiprocessing import get_context
+from concurrent.futures import ProcessPoolExecutor
+
+# Analyzer modules live one level up; results must never come from the cache
+PYTHON_DIR = Path(__file__).resolve().parent.parent
+if str(PYTHON_DIR) not in sys.path:
+    sys.path.insert(0, str(PYTHON_DIR))
+os.environ['STARFORGE_FEATURE_CACHE'] = 'off'
+
+from benchmarks.fixtures import ensure_fixtures
+
+DEFAULT_RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+
+def peak_rss_mb(include_children=False):
+    """Peak resident set size of this process (and optionally its children)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if include_children:
+        peak = max(peak, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _case_analyze(path, tier):
+    import_start = time.perf_counter()
+    import audio_analyzer
+    import_s = time.perf_counter() - import_start
+
+    # First call pays numba JIT compilation; keep it out of the steady-state number
+    warm_start = time.perf_counter()
+    audio_analyzer.analyze_audio(str(path), use_cache=False, tier=tier)
+    first_call_s = time.perf_counter() - warm_start
+
+    start = time.perf_counter()
+    result = audio_analyzer.analyze_audio(str(path), use_cache=False, tier=tier, profile=True)
+    wall = time.perf_counter() - start
+
+    return {
+        'import_s': import_s,
+        'first_call_s': first_call_s,
+        'wall_s': wall,
+        'stages': result.get('timings', {}).get('stages', {}),
+        'bpm': result.get('bpm'),
+        'error': result.get('error'),
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def _case_batch(tracks, workers, tier):
+    import batch_analyzer
+
+    start = time.perf_counter()
+    results = batch_analyzer.analyze_batch(tracks, num_workers=workers, use_cache=False, tier=tier)
+    wall = time.perf_counter() - start
+
+    return {
+        'wall_s': wall,
+        'errors': sum(1 for r in results.values() if 'error' in r),
+        'peak_rss_mb': peak_rss_mb(include_children=True)
+    }
+
+
+def _case_sonic(path):
+    import sonic_palette_analyzer
+
+    sonic_palette_analyzer.extract_spectral_features(str(path), use_cache=False)
+    start = time.perf_counter()
+    features = sonic_palette_analyzer.extract_spectral_features(str(path), use_cache=False)
+    wall = time.perf_counter() - start
+
+    return {'wall_s': wall, 'error': None if features else 'no features', 'peak_rss_mb': peak_rss_mb()}
+
+
+def run_isolated(fn, *args):
+    """Run one case in a fresh interpreter"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def environment_info():
+    import numpy
+    import librosa
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PYTHON_DIR,
+                                capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': numpy.__version__,
+        'librosa': librosa.__version__
+    }
+
+
+def run_suite(suite='quick', workers=(1, 2, 4), tier='full', fixture_dir=None,
+              pipelines=('analyze', 'batch', 'sonic'), log=print):
+    """
+    Run every pipeline over a fixture suite
+    Returns a JSON-serialisable report
+    """
+    fixtures = ensure_fixtures(suite, fixture_dir)
+    report = {'suite': suite, 'tier': tier, 'environment': environment_info(), 'cases': []}
+
+    def add(case):
+        report['cases'].append(case)
+        rate = case.get('throughput_x_realtime')
+        log(f"{case['pipeline']:>8} {case['name']:<28} {case['wall_s']:8.2f}s "
+            f"{(rate or 0):8.1f}x realtime {case['peak_rss_mb']:8.0f} MB")
+
+    if 'analyze' in pipelines:
+        for spec, path in fixtures:
+            out = run_isolated(_case_analyze, path, tier)
+            out.update({
+                'pipeline': 'analyze_audio',
+                'name': spec['name'],
+                'audio_s': spec['duration'],
+                'expected_bpm': spec.get('bpm'),
+                'throughput_x_realtime': spec['duration'] / out['wall_s'] if out['wall_s'] else None
+            })
+            add(out)
+
+    if 'sonic' in pipelines:
+        for spec, path in fixtures:
+            out = run_isolated(_case_sonic, path)
+            # extract_spectral_features reads at most 30 s
+            audio_s = min(spec['duration'], 30)
+            out.update({
+                'pipeline': 'sonic',
+                'name': spec['name'],
+                'audio_s': audio_s,
+                'throughput_x_realtime': audio_s / out['wall_s'] if out['wall_s'] else None
+            })
+            add(out)
+
+    if 'batch' in pipelines:
+        # Scaling is measured on the clip-length fixtures only
+        batch = [(spec, path) for spec, path in fixtures if 1 < spec['duration'] <= 300]
+        tracks = [(spec['name'], str(path)) for spec, path in batch]
+        audio_s = sum(spec['duration'] for spec, _ in batch)
+        baseline = None
+
+        for n in workers:
+            out = run_isolated(_case_batch, tracks, n, tier)
+            if n == 1:
+                baseline = out['wall_s']
+            out.update({
+                'pipeline': 'batch',
+                'name': f'{len(tracks)} tracks x {n} workers',
+                'workers': n,
+                'audio_s': audio_s,
+                'throughput_x_realtime': audio_s / out['wall_s'] if out['wall_s'] else None
+            })
+            if baseline:
+                out['speedup'] = baseline / out['wall_s']
+                out['efficiency'] = out['speedup'] / n
+            add(out)
+
+    return report
+
+
+def save_report(report, output=None):
+    if output is None:
+        DEFAULT_RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        stamp = report['environment']['timestamp'].replace(':', '')
+        output = DEFAULT_RESULTS_DIR / f"bench-{report['suite']}-{stamp}.json"
+
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    return output
+
+
+def compare_reports(old, new, log=print):
+    """Print per-case wall time changes between two saved reports"""
+    old_cases = {(c['pipeline'], c['name']): c for c in old['cases']}
+
+    log(f"{'case':<48} {'old':>9} {'new':>9} {'speedup':>8} {'rss old':>8} {'rss new':>8}")
+    for case in new['cases']:
+        key = (case['pipeline'], case['name'])
+        before = old_cases.get(key)
+        if before is None:
+            log(f"{key[0] + '/' + key[1]:<48} {'-':>9} {case['wall_s']:9.2f}")
+            continue
+        speedup = before['wall_s'] / case['wall_s'] if case['wall_s'] else float('inf')
+        log(f"{key[0] + '/' + key[1]:<48} {before['wall_s']:9.2f} {case['wall_s']:9.2f} "
+            f"{speedup:7.2f}x {before['peak_rss_mb']:8.0f} {case['peak_rss_mb']:8.0f}")
@@ -0,0 +1,112 @@
+"""
+Start-up time guard for the analyzer entry points
+
+Each case runs in a fresh interpreter, the way the Node services spawn the
+scripts. It is timed as the median of several runs. The heavy modules it
+leaves loaded are recorded too, which is a machine-independent regression
+check: importing an analyzer, or serving a cache hit, must not pull in
+scipy.signal, pyloudnorm or scikit-learn.
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+import statistics
+from pathlib import Path
+
+from benchmarks.fixtures import ensure_fixtures
+
+PYTHON_DIR = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ('scipy.signal', 'pyloudnorm', 'sklearn', 'numba')
+
+# Snippet run in the child: execute the case, then report which heavy modules got loaded
+_PROBE = '''
+import sys, json, runpy
+sys.argv = {argv!r}
+sys.path.insert(0, {path!r})
+{body}
+loaded = [m for m in {heavy!r} if m in sys.modules]
+print("\\n__STARTUP__" + json.dumps(loaded), file=sys.stderr)
+'''
+
+
+def _cases(fixture):
+    run_script = 'runpy.run_path({script!r}, run_name="__main__")'
+    return [
+        ('import audio_analyzer', 'import audio_analyzer', []),
+        ('import batch_analyzer', 'import batch_analyzer', []),
+        ('import sonic_palette_analyzer', 'import sonic_palette_analyzer', []),
+        ('import visual_dna_analyzer', 'import visual_dna_analyzer', []),
+        ('starforge --help', 'import starforge; starforge.main(["--help"])', []),
+        ('audio_analyzer.py --help',
+         'try:\n    ' + run_script.format(script=str(PYTHON_DIR / 'audio_analyzer.py')) + '\nexcept SystemExit:\n    pass',
+         ['audio_analyzer.py', '--help']),
+        ('audio_analyzer.py (cache hit)',
+         run_script.format(script=str(PYTHON_DIR / 'audio_analyzer.py')),
+         ['audio_analyzer.py', str(fixture), '--json']),
+    ]
+
+
+def _run_case(body, argv, env):
+    code = _PROBE.format(argv=argv, path=str(PYTHON_DIR), body=body, heavy=HEAVY_MODULES)
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-c', code], cwd=PYTHON_DIR, env=env,
+                          capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+
+    loaded = None
+    for line in proc.stderr.splitlines():
+        if line.startswith('__STARTUP__'):
+            loaded = json.loads(line[len('__STARTUP__'):])
+    if proc.returncode != 0 or loaded is None:
+        raise RuntimeError(f"startup case failed ({proc.returncode}): {proc.stderr[-500:]}")
+    return elapsed, loaded
+
+
+def run_startup(repeats=5, fixture_dir=None, log=print):
+    """
+    Time every entry point case; returns a JSON-serialisable report
+    """
+    spec, fixture = ensure_fixtures('quick', fixture_dir)[1]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, STARFORGE_FEATURE_CACHE=str(Path(tmp) / 'startup_cache.db'))
+
+        # Prime the cache so the cache-hit case measures only start-up and lookup
+        subprocess.run([sys.executable, str(PYTHON_DIR / 'audio_analyzer.py'), str(fixture), '--json'],
+                       cwd=PYTHON_DIR, env=env, capture_output=True, check=True)
+
+        cases = []
+        for name, body, argv in _cases(fixture):
+            times = []
+            loaded = []
+            for _ in range(repeats):
+                elapsed, loaded = _run_case(body, argv, env)
+                times.append(elapsed)
+            case = {
+                'name': name,
+                'median_s': statistics.median(times),
+                'min_s': min(times),
+                'heavy_modules_loaded': loaded
+            }
+            cases.append(case)
+            log(f"{name:<32} {case['median_s']:7.3f}s median  {', '.join(loaded) or '-'}")
+
+    return {'repeats': repeats, 'python': sys.version.split()[0], 'cases': cases}
+
+
+def check_startup(report, max_seconds=None):
+    """
+    Regression problems in a report: heavy modules loaded anywhere, or a
+    case slower than max_seconds
+    """
+    problems = []
+    for case in report['cases']:
+        if case['heavy_modules_loaded']:
+            problems.append(f"{case['name']} loads {', '.join(case['heavy_modules_loaded'])}")
+        if max_seconds is not None and case['median_s'] > max_seconds:
+            problems.append(f"{case['name']} took {case['median_s']:.2f}s (limit {max_seconds:.2f}s)")
+    return problems
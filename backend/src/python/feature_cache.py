@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Content-addressed feature cache shared by the Python analyzers
+
+Results are keyed by a hash of the file's bytes plus the analyzer name,
+version and parameters, so renamed or re-uploaded copies still hit and any
+change to the file, the analyzer version or its parameters misses.
+
+Stored in a local SQLite database (WAL mode, safe across the batch worker
+processes) with a total size limit and least-recently-used eviction. The
+total is kept as a running sum in cache_meta (maintained by triggers), and
+eviction also drops memoized file hashes no cached entry refers to anymore.
+
+Environment:
+    STARFORGE_FEATURE_CACHE      database path, or "off" to disable
+    STARFORGE_FEATURE_CACHE_MB   size limit in megabytes (default: 512)
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parents[2] / 'starforge_feature_cache.db'
+DEFAULT_MAX_MB = 512
+HASH_CHUNK_SIZE = 1024 * 1024
+EVICT_BATCH = 256  # LRU rows read per eviction query
+
+_local = threading.local()
+
+
+def cache_path():
+    """Configured cache location, or None when caching is disabled"""
+    configured = os.environ.get('STARFORGE_FEATURE_CACHE', '')
+    if configured.lower() in ('off', '0', 'false', 'none'):
+        return None
+    return Path(configured) if configured else DEFAULT_CACHE_PATH
+
+
+def max_cache_bytes():
+    try:
+        return int(float(os.environ.get('STARFORGE_FEATURE_CACHE_MB', DEFAULT_MAX_MB)) * 1024 * 1024)
+    except ValueError:
+        return DEFAULT_MAX_MB * 1024 * 1024
+
+
+def _connect():
+    """
+    One connection per thread and process (connections must not cross a fork)
+    """
+    path = cache_path()
+    if path is None:
+        return None
+
+    key = (os.getpid(), str(path))
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and getattr(_local, 'key', None) == key:
+        return conn
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS features (
+            key TEXT PRIMARY KEY,
+            analyzer TEXT NOT NULL,
+            version TEXT NOT NULL,
+            value TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_features_last_access ON features(last_access);
+
+        CREATE TABLE IF NOT EXISTS file_hashes (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            digest TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS cache_meta (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+    ''')
+    _migrate(conn)
+
+    _local.conn = conn
+    _local.key = key
+    return conn
+
+
+def _migrate(conn):
+    """
+    Schema additions for caches created by older versions: the content digest
+    on each entry (for pruning file_hashes) and the running size total
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(features)')}
+        if 'digest' not in columns:
+            conn.execute('ALTER TABLE features ADD COLUMN digest TEXT')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_features_digest ON features(digest)')
+
+        if conn.execute("SELECT 1 FROM cache_meta WHERE name = 'total_size'").fetchone() is None:
+            conn.execute("INSERT INTO cache_meta (name, value) "
+                         "SELECT 'total_size', COALESCE(SUM(size), 0) FROM features")
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS features_size_insert AFTER INSERT ON features BEGIN
+                UPDATE cache_meta SET value = value + NEW.size WHERE name = 'total_size';
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS features_size_update AFTER UPDATE OF size ON features BEGIN
+                UPDATE cache_meta SET value = value + NEW.size - OLD.size WHERE name = 'total_size';
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS features_size_delete AFTER DELETE ON features BEGIN
+                UPDATE cache_meta SET value = value - OLD.size WHERE name = 'total_size';
+            END
+        ''')
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+
+def file_digest(file_path, conn=None):
+    """
+    SHA-256 of the file's contents
+    Memoized by (path, size, mtime) so unchanged files are hashed only once
+    """
+    stat = os.stat(file_path)
+    abs_path = os.path.abspath(file_path)
+
+    if conn is not None:
+        row = conn.execute(
+            'SELECT digest FROM file_hashes WHERE path = ? AND size = ? AND mtime_ns = ?',
+            (abs_path, stat.st_size, stat.st_mtime_ns)
+        ).fetchone()
+        if row:
+            return row[0]
+
+    h = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            h.update(chunk)
+    digest = h.hexdigest()
+
+    if conn is not None:
+        conn.execute(
+            'INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)',
+            (abs_path, stat.st_size, stat.st_mtime_ns, digest)
+        )
+        conn.commit()
+
+    return digest
+
+
+def cache_key(digest, analyzer, version, params=None):
+    """Key = content hash + analyzer identity + canonical parameters"""
+    identity = json.dumps({
+        'analyzer': analyzer,
+        'version': str(version),
+        'params': params or {}
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(f"{digest}:{identity}".encode('utf-8')).hexdigest()
+
+
+def get_cached(file_path, analyzer, version, params=None):
+    """
+    Look up a cached result for this file and analyzer configuration
+    Returns the stored value, or None on a miss (or if the cache is unusable)
+    """
+    try:
+        conn = _connect()
+        if conn is None:
+            return None
+
+        key = cache_key(file_digest(file_path, conn), analyzer, version, params)
+        row = conn.execute('SELECT value FROM features WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+
+        conn.execute('UPDATE features SET last_access = ? WHERE key = ?', (time.time(), key))
+        conn.commit()
+        return json.loads(row[0])
+
+    except (sqlite3.Error, OSError, ValueError) as e:
+        print(f"Feature cache lookup failed for {file_path}: {e}", file=sys.stderr)
+        return None
+
+
+def put_cached(file_path, analyzer, version, params, value):
+    """
+    Store a result, then evict least-recently-used entries over the size limit
+    Results containing an 'error' key are never cached
+    """
+    if value is None or (isinstance(value, dict) and 'error' in value):
+        return
+
+    try:
+        conn = _connect()
+        if conn is None:
+            return
+
+        digest = file_digest(file_path, conn)
+        key = cache_key(digest, analyzer, version, params)
+        encoded = json.dumps(value)
+        now = time.time()
+
+        # An upsert rather than INSERT OR REPLACE: REPLACE's implicit delete
+        # would bypass the size-total triggers
+        conn.execute(
+            'INSERT INTO features (key, analyzer, version, value, size, created_at, last_access, digest) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size, '
+            'created_at = excluded.created_at, last_access = excluded.last_access, digest = excluded.digest',
+            (key, analyzer, str(version), encoded, len(encoded), now, now, digest)
+        )
+        conn.commit()
+
+        evict(conn)
+
+    except (sqlite3.Error, OSError, ValueError, TypeError) as e:
+        print(f"Feature cache store failed for {file_path}: {e}", file=sys.stderr)
+
+
+def total_size(conn):
+    """Bytes of cached values, from the running total (no table scan)"""
+    row = conn.execute("SELECT value FROM cache_meta WHERE name = 'total_size'").fetchone()
+    return row[0] if row else 0
+
+
+def prune_file_hashes(conn):
+    """Forget memoized digests that no cached entry refers to anymore"""
+    cur = conn.execute(
+        'DELETE FROM file_hashes WHERE digest NOT IN (SELECT digest FROM features WHERE digest IS NOT NULL)'
+    )
+    return cur.rowcount
+
+
+def evict(conn, limit_bytes=None):
+    """
+    Drop least-recently-used entries until the cache fits its size limit,
+    then the file hashes only they referred to
+    Walks the last_access index EVICT_BATCH rows at a time, so only the
+    evicted rows are read, not the whole table
+    """
+    limit_bytes = max_cache_bytes() if limit_bytes is None else limit_bytes
+    total = total_size(conn)
+    if total <= limit_bytes:
+        return 0
+
+    evicted = 0
+    while total > limit_bytes:
+        rows = conn.execute('SELECT key, size FROM features ORDER BY last_access ASC LIMIT ?',
+                            (EVICT_BATCH,)).fetchall()
+        if not rows:
+            break
+        for key, size in rows:
+            if total <= limit_bytes:
+                break
+            conn.execute('DELETE FROM features WHERE key = ?', (key,))
+            total -= size
+            evicted += 1
+
+    prune_file_hashes(conn)
+    conn.commit()
+    return evicted
+
+
+def cache_stats():
+    """Entry counts and sizes per analyzer"""
+    conn = _connect()
+    if conn is None:
+        return {'enabled': False}
+
+    rows = conn.execute(
+        'SELECT analyzer, version, COUNT(*), COALESCE(SUM(size), 0) FROM features GROUP BY analyzer, version'
+    ).fetchall()
+    return {
+        'enabled': True,
+        'path': str(cache_path()),
+        'limit_bytes': max_cache_bytes(),
+        'analyzers': [
+            {'analyzer': a, 'version': v, 'entries': n, 'bytes': b}
+            for a, v, n, b in rows
+        ],
+        'total_bytes': sum(r[3] for r in rows)
+    }
+
+
+def clear_cache(analyzer=None):
+    """Remove all entries (or only one analyzer's)"""
+    conn = _connect()
+    if conn is None:
+        return 0
+
+    if analyzer:
+        cur = conn.execute('DELETE FROM features WHERE analyzer = ?', (analyzer,))
+    else:
+        cur = conn.execute('DELETE FROM features')
+    removed = cur.rowcount
+    prune_file_hashes(conn)
+    conn.commit()
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or clear the analyzer feature cache')
+    parser.add_argument('action', choices=['stats', 'clear'], help='What to do')
+    parser.add_argument('--analyzer', help='Limit clear to one analyzer')
+
+    args = parser.parse_args()
+
+    if args.action == 'stats':
+        print(json.dumps(cache_stats(), indent=2))
+    else:
+        removed = clear_cache(args.analyzer)
+        print(f"Removed {removed} cached entries", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -9,18 +9,44 @@ Audio equivalent of Visual DNA color palette.
 
 import sys
 import json
+import math
+import time
+import zlib
 import argparse
+from functools import lru_cache
 from pathlib import Path
 from collections import Counter
+from multiprocessing import TimeoutError, cpu_count, get_context
 import numpy as np
 
 try:
-    import librosa
-    from sklearn.cluster import KMeans
+    import librosa  # submodules load on first use
 except ImportError as e:
     print(json.dumps({"error": f"Missing dependency: {e}"}))
     sys.exit(1)
 
+import feature_cache
+
+# Bump when extracted features change so cached results are recomputed
+ANALYZER_VERSION = '2'
+# Bump when the stored profile state format changes
+STATE_VERSION = '1'
+
+# Tracks analyzed per collection by default, and the count at which the profile is fully confident
+MAX_ANALYZED_TRACKS = 30
+
+# Library mode: tracks extracted per chunk, the relative accuracy of the
+# quantile sketches, the per-track values they summarise, and the quantiles reported
+LIBRARY_CHUNK_TRACKS = 256
+# multiprocessing start method for extraction pools (None: platform default).
+# Callers running this from threads set 'forkserver' or 'spawn': forking a
+# multithreaded process can copy a lock held by another thread into the child
+POOL_START_METHOD = None
+QUANTILE_ACCURACY = 0.01
+QUANTILE_FEATURES = ('brightness', 'bpm')
+REPORTED_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+N_MFCC = 13
+
 
 # Frequency band definitions (Hz)
 FREQUENCY_BANDS = {
@@ -32,111 +58,729 @@ FREQUENCY_BANDS = {
 }
 
 
-def extract_spectral_features(audio_path, sr=22050, duration=30):
+N_FFT = 2048
+HOP_LENGTH = 512
+
+
+@lru_cache(maxsize=16)
+def _band_weights(sr, n_fft, bands):
+    weights = np.zeros((len(bands), 1 + n_fft // 2), dtype=np.float32)
+    freqs = librosa.fft_frequencies(sr=sr, n_fft=n_fft)
+    for i, (_, (low, high)) in enumerate(bands):
+        mask = (freqs >= low) & (freqs < high)
+        if np.any(mask):
+            weights[i, mask] = 1.0 / np.count_nonzero(mask)
+    weights.setflags(write=False)
+    return weights
+
+
+def band_weights(sr, n_fft=N_FFT, bands=None):
+    """
+    (n_bands, n_bins) averaging matrix: row b holds 1 / width over the STFT
+    bins in band b, so weights @ S is each band's mean magnitude per frame.
+    Built once per (sr, n_fft, bands) and cached; bands defaults to
+    FREQUENCY_BANDS. Bands with no bins get a zero row.
+    """
+    bands = FREQUENCY_BANDS if bands is None else bands
+    return _band_weights(sr, n_fft, tuple((name, tuple(edges)) for name, edges in bands.items()))
+
+
+def band_energy_frames(S, sr, n_fft=N_FFT, bands=None):
+    """
+    Per-frame band energies of a magnitude spectrogram in one matrix product
+    Returns (band names, (n_bands, n_frames) array)
+    """
+    bands = FREQUENCY_BANDS if bands is None else bands
+    return list(bands), band_weights(sr, n_fft, bands) @ S
+
+
+def extract_spectral_features(audio_path, sr=22050, duration=30, use_cache=True, bands=None):
     """
     Extract spectral features from audio file
     Returns frequency band energies and tonal characteristics
+    Centroid, rolloff, MFCCs and band energies all come from one STFT;
+    bands overrides FREQUENCY_BANDS ({name: (low_hz, high_hz)}, which must
+    include 'bass' and 'treble' for warmth)
     """
+    cache_params = {'sr': sr, 'duration': duration}
+    if bands is not None:
+        cache_params['bands'] = {name: list(edges) for name, edges in bands.items()}
+    if use_cache:
+        cached = feature_cache.get_cached(audio_path, 'sonic_palette', ANALYZER_VERSION, cache_params)
+        if cached is not None:
+            return cached
+
     try:
         # Load audio (first 30 seconds for speed)
         y, sr = librosa.load(audio_path, duration=duration, sr=sr)
         
+        # One magnitude spectrogram shared by every feature
+        S = np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH))
+
         # Extract spectral features
-        spectral_centroids = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
-        spectral_rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr)[0]
-        mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
+        spectral_centroids = librosa.feature.spectral_centroid(S=S, sr=sr, n_fft=N_FFT)[0]
+        spectral_rolloff = librosa.feature.spectral_rolloff(S=S, sr=sr, n_fft=N_FFT)[0]
+        mel = librosa.feature.melspectrogram(S=S ** 2, sr=sr, n_fft=N_FFT)
+        mfccs = librosa.feature.mfcc(S=librosa.power_to_db(mel), sr=sr, n_mfcc=N_MFCC)
         
-        # Get frequency spectrum
-        stft = np.abs(librosa.stft(y))
-        freqs = librosa.fft_frequencies(sr=sr)
-        
-        # Calculate energy in each frequency band
-        band_energies = {}
-        for band_name, (low, high) in FREQUENCY_BANDS.items():
-            # Find frequency bins in this range
-            mask = (freqs >= low) & (freqs < high)
-            band_energy = np.mean(stft[mask, :]) if np.any(mask) else 0
-            band_energies[band_name] = float(band_energy)
+        # Mean energy in each frequency band (all bands in one matrix product)
+        names, frames = band_energy_frames(S, sr, N_FFT, bands)
+        band_energies = {name: float(energy) for name, energy in zip(names, frames.mean(axis=1))}
         
         # Tonal characteristics
         brightness = np.mean(spectral_centroids)  # Higher = brighter
         warmth = band_energies['bass'] / (band_energies['treble'] + 1e-6)  # Bass vs treble ratio
         richness = np.std(mfccs)  # Timbral complexity
         
-        return {
+        features = {
             'band_energies': band_energies,
             'brightness': float(brightness),
             'warmth': float(warmth),
             'richness': float(richness),
             'spectral_centroid': float(np.mean(spectral_centroids)),
-            'spectral_rolloff': float(np.mean(spectral_rolloff))
+            'spectral_rolloff': float(np.mean(spectral_rolloff)),
+            'mfcc_mean': [float(v) for v in mfccs.mean(axis=1)]
         }
+
+        if use_cache:
+            feature_cache.put_cached(audio_path, 'sonic_palette', ANALYZER_VERSION, cache_params, features)
+
+        return features
         
     except Exception as e:
         print(f"Error analyzing {audio_path}: {e}", file=sys.stderr)
         return None
 
 
-def analyze_track_collection(tracks_data):
+# Per-track values a stored record must carry
+RECORD_FEATURES = ('band_energies', 'brightness', 'warmth', 'richness')
+# Per-track scalars summed by SonicAggregate
+AGGREGATE_SCALARS = ('brightness', 'warmth', 'richness', 'energy', 'bpm')
+
+
+def track_record(track, features):
+    """
+    Reusable per-track record: extracted features plus the track's own
+    bpm / energy. Records can be stored and merged later without audio.
+    """
+    record = {
+        'path': track.get('path'),
+        'band_energies': {band: float(features['band_energies'].get(band, 0.0)) for band in FREQUENCY_BANDS},
+        'brightness': float(features['brightness']),
+        'warmth': float(features['warmth']),
+        'richness': float(features['richness']),
+        'spectral_centroid': float(features.get('spectral_centroid', features['brightness'])),
+        'spectral_rolloff': float(features.get('spectral_rolloff', 0.0)),
+        'bpm': track.get('bpm', 120),
+        'energy': track.get('energy', 0.5)
+    }
+    if features.get('mfcc_mean') is not None:
+        record['mfcc_mean'] = [float(v) for v in features['mfcc_mean']]
+    return record
+
+
+class SonicAggregate:
+    """
+    Running sums behind a sonic DNA profile
+
+    Per-band energy sums and squared sums (for the spread), tonal and
+    bpm / energy sums, and the track count. Adding a track or merging
+    another aggregate is O(bands); the profile is rebuilt from the sums by
+    build_sonic_dna. to_dict / from_dict give a JSON-serialisable state.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.high_quality_count = 0
+        self.band_sums = {band: 0.0 for band in FREQUENCY_BANDS}
+        self.band_sq_sums = {band: 0.0 for band in FREQUENCY_BANDS}
+        self.sums = {name: 0.0 for name in AGGREGATE_SCALARS}
+        self.paths = set()
+
+    def contains(self, path):
+        return path is not None and path in self.paths
+
+    def add(self, record):
+        self.count += 1
+        if record['energy'] >= 0.7:
+            self.high_quality_count += 1
+        for band in FREQUENCY_BANDS:
+            energy = record['band_energies'][band]
+            self.band_sums[band] += energy
+            self.band_sq_sums[band] += energy * energy
+        for name in AGGREGATE_SCALARS:
+            self.sums[name] += float(record[name])
+        if record.get('path'):
+            self.paths.add(record['path'])
+
+    def merge(self, other):
+        self.count += other.count
+        self.high_quality_count += other.high_quality_count
+        for band in FREQUENCY_BANDS:
+            self.band_sums[band] += other.band_sums[band]
+            self.band_sq_sums[band] += other.band_sq_sums[band]
+        for name in AGGREGATE_SCALARS:
+            self.sums[name] += other.sums[name]
+        self.paths |= other.paths
+        return self
+
+    def mean(self, name):
+        return self.sums[name] / self.count if self.count else 0.0
+
+    def band_means(self):
+        return {band: (total / self.count if self.count else 0.0) for band, total in self.band_sums.items()}
+
+    def band_stds(self):
+        stds = {}
+        for band, mean in self.band_means().items():
+            variance = self.band_sq_sums[band] / self.count - mean * mean if self.count else 0.0
+            stds[band] = float(np.sqrt(max(variance, 0.0)))
+        return stds
+
+    def to_dict(self):
+        return {
+            'version': STATE_VERSION,
+            'count': self.count,
+            'highQualityCount': self.high_quality_count,
+            'bandSums': self.band_sums,
+            'bandSqSums': self.band_sq_sums,
+            'sums': self.sums,
+            'paths': sorted(self.paths)
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        if state.get('version') != STATE_VERSION:
+            raise ValueError(f"Sonic profile state is version {state.get('version')}, expected {STATE_VERSION}")
+        aggregate = cls()
+        aggregate.count = int(state['count'])
+        aggregate.high_quality_count = int(state['highQualityCount'])
+        aggregate.band_sums.update(state['bandSums'])
+        aggregate.band_sq_sums.update(state['bandSqSums'])
+        aggregate.sums.update(state['sums'])
+        aggregate.paths = set(state.get('paths', []))
+        return aggregate
+
+
+class MomentSketch:
+    """
+    Mergeable mean and covariance of d-dimensional observations
+
+    Keeps the count, mean vector and co-moment matrix (sum of outer products
+    of deviations), updated with Welford's step and merged with Chan et al.'s
+    pairwise formula, so shards summed in any order give the same result as
+    one pass without the cancellation of raw squared sums.
+    """
+
+    def __init__(self, dim):
+        self.count = 0
+        self.mean = np.zeros(dim)
+        self.comoment = np.zeros((dim, dim))
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        self.count += 1
+        delta = values - self.mean
+        self.mean += delta / self.count
+        self.comoment += np.outer(delta, values - self.mean)
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.comoment += other.comoment + np.outer(delta, delta) * (self.count * other.count / total)
+        self.mean = self.mean + delta * (other.count / total)
+        self.count = total
+        return self
+
+    def covariance(self):
+        """Population covariance (matches SonicAggregate's band spread)"""
+        return self.comoment / self.count if self.count else np.zeros_like(self.comoment)
+
+    def std(self):
+        return np.sqrt(np.clip(np.diag(self.covariance()), 0.0, None))
+
+    def to_dict(self):
+        return {'count': self.count, 'mean': self.mean.tolist(), 'comoment': self.comoment.tolist()}
+
+    @classmethod
+    def from_dict(cls, state):
+        sketch = cls(len(state['mean']))
+        sketch.count = int(state['count'])
+        sketch.mean = np.asarray(state['mean'], dtype=np.float64)
+        sketch.comoment = np.asarray(state['comoment'], dtype=np.float64)
+        return sketch
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with relative accuracy (DDSketch)
+
+    Positive values are counted in logarithmic buckets ((g^(i-1), g^i] with
+    g = (1 + alpha) / (1 - alpha)), so any quantile comes back within alpha
+    of the true value, the sketch size grows only with the log of the value
+    range, and merging two sketches is adding their bucket counts.
+    """
+
+    def __init__(self, alpha=QUANTILE_ACCURACY):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.buckets = Counter()
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+        if value <= 0:
+            self.zero_count += 1
+        else:
+            self.buckets[math.ceil(math.log(value, self.gamma))] += 1
+
+    def merge(self, other):
+        if other.alpha != self.alpha:
+            raise ValueError(f"Cannot merge quantile sketches with accuracy {self.alpha} and {other.alpha}")
+        self.buckets.update(other.buckets)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+
+    def quantile(self, q):
+        if self.count == 0:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def summary(self):
+        return {f'p{round(q * 100)}': round(self.quantile(q), 1) for q in REPORTED_QUANTILES}
+
+    def to_dict(self):
+        return {
+            'alpha': self.alpha,
+            'count': self.count,
+            'zeroCount': self.zero_count,
+            'buckets': {str(index): n for index, n in sorted(self.buckets.items())}
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        sketch = cls(state['alpha'])
+        sketch.count = int(state['count'])
+        sketch.zero_count = int(state['zeroCount'])
+        sketch.buckets = Counter({int(index): n for index, n in state['buckets'].items()})
+        return sketch
+
+
+class LibrarySketch(SonicAggregate):
+    """
+    SonicAggregate plus the library-scale summaries: band-energy moments,
+    MFCC mean / covariance (tracks whose features carry mfcc_mean) and
+    quantile sketches of QUANTILE_FEATURES. Every part merges exactly, so
+    shards of a library profiled by separate workers or nodes combine into
+    the profile of the whole.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.band_moments = MomentSketch(len(FREQUENCY_BANDS))
+        self.mfcc_moments = MomentSketch(N_MFCC)
+        self.quantiles = {name: QuantileSketch() for name in QUANTILE_FEATURES}
+
+    def add(self, record):
+        super().add(record)
+        self.band_moments.add([record['band_energies'][band] for band in FREQUENCY_BANDS])
+        if record.get('mfcc_mean') is not None:
+            self.mfcc_moments.add(record['mfcc_mean'])
+        for name in QUANTILE_FEATURES:
+            self.quantiles[name].add(float(record[name]))
+
+    def merge(self, other):
+        super().merge(other)
+        self.band_moments.merge(other.band_moments)
+        self.mfcc_moments.merge(other.mfcc_moments)
+        for name in QUANTILE_FEATURES:
+            self.quantiles[name].merge(other.quantiles[name])
+        return self
+
+    def band_stds(self):
+        return {band: float(std) for band, std in zip(FREQUENCY_BANDS, self.band_moments.std())}
+
+    def to_dict(self):
+        state = super().to_dict()
+        state.update({
+            'kind': 'library',
+            'bandMoments': self.band_moments.to_dict(),
+            'mfccMoments': self.mfcc_moments.to_dict(),
+            'quantiles': {name: sketch.to_dict() for name, sketch in self.quantiles.items()}
+        })
+        return state
+
+    @classmethod
+    def from_dict(cls, state):
+        if state.get('kind') != 'library':
+            raise ValueError("Not a library profile state (build one with profile_track_library)")
+        sketch = super().from_dict(state)
+        sketch.band_moments = MomentSketch.from_dict(state['bandMoments'])
+        sketch.mfcc_moments = MomentSketch.from_dict(state['mfccMoments'])
+        sketch.quantiles.update({name: QuantileSketch.from_dict(q) for name, q in state['quantiles'].items()})
+        return sketch
+
+
+def iter_track_features(paths, num_workers=None, deadline=None):
+    """
+    Yield extract_spectral_features(path) for each path, in input order
+
+    With more than one worker the extraction runs in a process pool that
+    works ahead of the consumer; stopping the generator early (or reaching
+    the deadline, a time.monotonic() value) terminates the pool and discards
+    work in flight. Failed tracks yield None.
+    """
+    if num_workers is None:
+        num_workers = max(1, cpu_count() - 1)  # Leave 1 core free
+
+    if num_workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+            yield extract_spectral_features(path)
+        return
+
+    with get_context(POOL_START_METHOD).Pool(processes=min(num_workers, len(paths))) as pool:
+        results = pool.imap(extract_spectral_features, paths, chunksize=1)
+        for _ in paths:
+            if deadline is None:
+                yield results.next()
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                yield results.next(timeout=remaining)
+            except TimeoutError:
+                return
+
+
+def top_records(records, max_tracks):
+    """
+    The max_tracks highest-energy records - the tracks analyze_track_collection
+    profiles - in that priority order
+    """
+    return sorted(records, key=lambda r: r['energy'], reverse=True)[:max_tracks]
+
+
+def build_collection_dna(records, max_tracks):
+    """
+    Sonic DNA of a collection from its per-track records (no audio is
+    touched), with the records and the reusable 'state'
+    """
+    aggregate = SonicAggregate()
+    for record in records:
+        aggregate.add(record)
+
+    result = build_sonic_dna(aggregate)
+    result['records'] = records
+    result['state'] = {
+        'version': STATE_VERSION,
+        'kind': 'collection',
+        'analyzerVersion': ANALYZER_VERSION,
+        'maxTracks': max_tracks,
+        'records': records
+    }
+    return result
+
+
+def analyze_track_collection(tracks_data, num_workers=None, time_budget=None, max_tracks=MAX_ANALYZED_TRACKS,
+                             include_state=False):
     """
     Analyze entire track collection to extract sonic DNA
     
     Args:
         tracks_data: List of dicts with 'path', 'bpm', 'energy', etc.
+        num_workers: Processes for feature extraction (default: CPU count - 1)
+        time_budget: Seconds to spend on extraction; when it runs out the
+            profile is built from the tracks finished so far
+        max_tracks: Number of tracks to analyze, highest energy first
+        include_state: Also return the per-track records as 'state', for
+            update_track_collection
     
     Returns:
-        Sonic DNA profile with frequency palette, style, characteristics
+        Sonic DNA profile with frequency palette, style, characteristics and
+        the per-track 'records' it was built from
     """
-    
-    # Extract spectral features from all tracks
-    all_features = []
-    
+    start = time.monotonic()
+    deadline = start + time_budget if time_budget is not None else None
+
     # Prioritize tracks with higher energy/quality
     sorted_tracks = sorted(tracks_data, key=lambda t: t.get('energy', 0.5), reverse=True)
-    
-    # Analyze up to 50 tracks for comprehensive profile
-    analyzed_count = 0
-    for track in sorted_tracks[:50]:
+    candidates = [t for t in sorted_tracks if t.get('path') and Path(t['path']).exists()]
+
+    # Results arrive in priority order, so the tracks used are the same as a
+    # sequential run's; stopping early terminates the remaining work
+    records = []
+    features_iter = iter_track_features([t['path'] for t in candidates], num_workers=num_workers,
+                                        deadline=deadline)
+    for track, features in zip(candidates, features_iter):
+        if features:
+            records.append(track_record(track, features))
+
+        if len(records) >= max_tracks:
+            break
+    features_iter.close()
+
+    result = build_collection_dna(records, max_tracks)
+    result['timeBudgetExhausted'] = deadline is not None and time.monotonic() >= deadline
+    result['analysisSeconds'] = round(time.monotonic() - start, 2)
+    if not include_state:
+        del result['state']
+    return result
+
+
+def update_track_collection(state, tracks_data, num_workers=None, time_budget=None, max_tracks=None,
+                            full_collection=False, removed_paths=()):
+    """
+    Refresh a stored collection profile, decoding only tracks that can change it
+
+    The state keeps one record per profiled track (band energies, tonal
+    values, bpm / energy), and the profile is always the max_tracks
+    highest-energy records - the same cap as analyze_track_collection, so
+    updating with the whole collection gives what a full analysis of it
+    would. New tracks below the current cut-off are skipped without being
+    decoded.
+
+    Args:
+        state: 'state' from an earlier analyze_track_collection (include_state)
+            / update_track_collection call (None starts an empty profile; a
+            state from another feature extractor version is rebuilt)
+        tracks_data: Tracks to add or refresh. Known paths only take the new
+            bpm / energy; entries that carry the extracted features
+            (band_energies, brightness, warmth, richness) are used as they
+            are; the rest are analyzed
+        max_tracks: Profile cap (default: the state's, else MAX_ANALYZED_TRACKS)
+        full_collection: tracks_data is the whole collection - records of
+            tracks not in it are dropped
+        removed_paths: Paths to drop from the profile
+        num_workers, time_budget: As analyze_track_collection
+
+    Returns:
+        Sonic DNA profile (same shape as analyze_track_collection) with the
+        updated 'state'
+    """
+    start = time.monotonic()
+    deadline = start + time_budget if time_budget is not None else None
+
+    records = {}
+    if state:
+        if state.get('kind') != 'collection' or state.get('version') != STATE_VERSION:
+            raise ValueError("Not a collection profile state (build one with analyze_track_collection)")
+        if state.get('analyzerVersion') == ANALYZER_VERSION:
+            records = {record['path']: record for record in state['records']}
+        if max_tracks is None:
+            max_tracks = state.get('maxTracks')
+    if max_tracks is None:
+        max_tracks = MAX_ANALYZED_TRACKS
+
+    if full_collection:
+        present = {track.get('path') for track in tracks_data}
+        records = {path: record for path, record in records.items() if path in present}
+    for path in removed_paths:
+        records.pop(path, None)
+
+    to_analyze = []
+    for track in tracks_data:
         path = track.get('path')
-        if not path or not Path(path).exists():
+        if not path:
             continue
-        
-        features = extract_spectral_features(path)
+        if path in records:
+            # Extracted features don't change; bpm / energy may have been edited
+            records[path] = {**records[path], 'bpm': track.get('bpm', 120), 'energy': track.get('energy', 0.5)}
+        elif all(key in track for key in RECORD_FEATURES):
+            records[path] = track_record(track, track)
+        elif Path(path).exists():
+            to_analyze.append(track)
+
+    def cut_off():
+        """Energy a new track must exceed to enter a full profile (None while there is room)"""
+        kept = top_records(records.values(), max_tracks)
+        return kept[-1]['energy'] if len(kept) >= max_tracks else None
+
+    # Highest energy first, as analyze_track_collection; once a track misses
+    # the cut-off, every later one does too
+    threshold = cut_off()
+    to_analyze = [t for t in to_analyze if threshold is None or t.get('energy', 0.5) > threshold]
+    to_analyze.sort(key=lambda t: t.get('energy', 0.5), reverse=True)
+
+    features_iter = iter_track_features([t['path'] for t in to_analyze], num_workers=num_workers,
+                                        deadline=deadline)
+    for i, (track, features) in enumerate(zip(to_analyze, features_iter)):
         if features:
-            all_features.append({
-                **features,
-                'bpm': track.get('bpm', 120),
-                'energy': track.get('energy', 0.5)
-            })
-            analyzed_count += 1
-        
-        # Limit analysis to avoid long processing times
-        if analyzed_count >= 30:
+            records[track['path']] = track_record(track, features)
+        threshold = cut_off()
+        if i + 1 < len(to_analyze) and threshold is not None and to_analyze[i + 1].get('energy', 0.5) <= threshold:
             break
-    
-    if len(all_features) == 0:
+    features_iter.close()
+
+    result = build_collection_dna(top_records(records.values(), max_tracks), max_tracks)
+    result['timeBudgetExhausted'] = deadline is not None and time.monotonic() >= deadline
+    result['analysisSeconds'] = round(time.monotonic() - start, 2)
+    return result
+
+
+def iter_tracks_file(path):
+    """
+    Track dicts from a JSON array file, or lazily line by line from an NDJSON
+    file (one track per line) so huge libraries are never held in memory
+    """
+    with open(path, 'r') as f:
+        first = f.read(1)
+        while first.isspace():
+            first = f.read(1)
+        f.seek(0)
+
+        if first == '[':
+            yield from json.load(f)
+            return
+
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                print(f"Skipping malformed track on line {line_number}", file=sys.stderr)
+
+
+def in_shard(path, shard):
+    """Whether path belongs to shard (index, count); paths are spread by hash"""
+    index, count = shard
+    return zlib.crc32(str(path).encode('utf-8')) % count == index
+
+
+def profile_track_library(tracks, state=None, num_workers=None, time_budget=None, shard=None,
+                          chunk_size=LIBRARY_CHUNK_TRACKS):
+    """
+    Library-scale sonic DNA: every track, not the 30 loudest, streamed into
+    a LibrarySketch
+
+    Args:
+        tracks: Iterable of track dicts (e.g. iter_tracks_file); consumed
+            once. Entries carrying extracted features are added as they are,
+            the rest are extracted in chunks of chunk_size (feature cache hits
+            cost a lookup)
+        state: 'state' from an earlier call; tracks already in it are skipped,
+            so refreshing costs only the new tracks
+        num_workers, time_budget: As analyze_track_collection. Tracks not
+            reached before the budget runs out are picked up by the next call
+        shard: (index, count) - only take this shard's tracks, so disjoint
+            parts of one library can be profiled separately and merged with
+            merge_library_states
+
+    Returns:
+        Sonic DNA profile (analyze_track_collection's shape plus
+        'distributions' and 'timbre') with the updated 'state'
+    """
+    start = time.monotonic()
+    deadline = start + time_budget if time_budget is not None else None
+    sketch = LibrarySketch.from_dict(state) if state else LibrarySketch()
+    pending = []
+
+    def extract_pending():
+        features_iter = iter_track_features([t['path'] for t in pending], num_workers=num_workers,
+                                            deadline=deadline)
+        for track, features in zip(pending, features_iter):
+            if features and not sketch.contains(track['path']):
+                sketch.add(track_record(track, features))
+        pending.clear()
+
+    for track in tracks:
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+        path = track.get('path')
+        if sketch.contains(path) or (shard is not None and not in_shard(path, shard)):
+            continue
+        if all(key in track for key in RECORD_FEATURES):
+            sketch.add(track_record(track, track))
+        elif path and Path(path).exists():
+            pending.append(track)
+            if len(pending) >= chunk_size:
+                extract_pending()
+    extract_pending()
+
+    result = build_library_dna(sketch)
+    result['timeBudgetExhausted'] = deadline is not None and time.monotonic() >= deadline
+    result['analysisSeconds'] = round(time.monotonic() - start, 2)
+    result['state'] = sketch.to_dict()
+    return result
+
+
+def merge_library_states(states):
+    """
+    Combine library states profiled separately (e.g. one per shard) into one
+    LibrarySketch. The parts must cover disjoint tracks; overlapping paths
+    would be counted twice, so they are rejected.
+    """
+    merged = LibrarySketch()
+    for state in states:
+        part = LibrarySketch.from_dict(state)
+        overlap = merged.paths & part.paths
+        if overlap:
+            raise ValueError(f"Library states overlap on {len(overlap)} tracks (profile disjoint shards)")
+        merged.merge(part)
+    return merged
+
+
+def build_library_dna(sketch):
+    """
+    build_sonic_dna for a LibrarySketch, plus brightness / BPM quantiles and
+    the MFCC timbre summary
+    """
+    result = build_sonic_dna(sketch)
+    if sketch.count == 0:
+        return result
+
+    result['distributions'] = {name: q.summary() for name, q in sketch.quantiles.items()}
+    if sketch.mfcc_moments.count:
+        result['timbre'] = {
+            'mfccMean': [round(v, 3) for v in sketch.mfcc_moments.mean.tolist()],
+            'mfccStd': [round(v, 3) for v in sketch.mfcc_moments.std().tolist()],
+            # Overall timbral variety across the library (root of the covariance trace)
+            'spread': round(float(np.sqrt(np.trace(sketch.mfcc_moments.covariance()))), 3),
+            'tracks': sketch.mfcc_moments.count
+        }
+    return result
+
+
+def build_sonic_dna(aggregate):
+    """
+    Sonic DNA profile from a SonicAggregate (no audio is touched)
+    """
+    if aggregate.count == 0:
         return {
             'styleDescription': 'No tracks could be analyzed',
             'confidence': 0,
             'trackCount': 0
         }
-    
-    # Aggregate frequency band energies
-    band_aggregates = {band: [] for band in FREQUENCY_BANDS.keys()}
-    for feat in all_features:
-        for band, energy in feat['band_energies'].items():
-            band_aggregates[band].append(energy)
-    
-    # Calculate average prominence for each band
+
+    # Average energy and prominence for each band
+    band_means = aggregate.band_means()
+    total_mean = sum(band_means.values())
+    band_stds = aggregate.band_stds()
+
     sonic_palette = []
-    for band, energies in band_aggregates.items():
-        avg_energy = np.mean(energies)
-        prominence = avg_energy / (sum(np.mean(e) for e in band_aggregates.values()) + 1e-6)
+    for band, avg_energy in band_means.items():
+        prominence = avg_energy / (total_mean + 1e-6)
         
         sonic_palette.append({
             'band': band,
             'frequency_range': f"{FREQUENCY_BANDS[band][0]}-{FREQUENCY_BANDS[band][1]}Hz",
             'energy': float(avg_energy),
+            'energy_std': float(band_stds[band]),
             'prominence': float(prominence)
         })
     
@@ -144,11 +788,11 @@ def analyze_track_collection(tracks_data):
     sonic_palette = sorted(sonic_palette, key=lambda x: x['prominence'], reverse=True)
     
     # Extract tonal characteristics
-    avg_brightness = np.mean([f['brightness'] for f in all_features])
-    avg_warmth = np.mean([f['warmth'] for f in all_features])
-    avg_richness = np.mean([f['richness'] for f in all_features])
-    
-    tonal_characteristics = describe_tonal_profile(avg_brightness, avg_warmth, avg_richness)
+    tonal_characteristics = describe_tonal_profile(
+        aggregate.mean('brightness'),
+        aggregate.mean('warmth'),
+        aggregate.mean('richness')
+    )
     
     # Identify dominant frequencies (top 3 bands)
     dominant_frequencies = [
@@ -164,8 +808,8 @@ def analyze_track_collection(tracks_data):
     style_description = generate_sonic_style_description(
         sonic_palette,
         tonal_characteristics,
-        all_features,
-        tracks_data
+        aggregate.mean('energy'),
+        aggregate.mean('bpm')
     )
     
     return {
@@ -173,9 +817,9 @@ def analyze_track_collection(tracks_data):
         'sonicPalette': sonic_palette,
         'tonalCharacteristics': tonal_characteristics,
         'dominantFrequencies': dominant_frequencies,
-        'totalAnalyzed': len(all_features),
-        'highQualityCount': len([f for f in all_features if f['energy'] >= 0.7]),
-        'confidence': min(len(all_features) / 30, 1.0)
+        'totalAnalyzed': aggregate.count,
+        'highQualityCount': aggregate.high_quality_count,
+        'confidence': min(aggregate.count / MAX_ANALYZED_TRACKS, 1.0)
     }
 
 
@@ -211,16 +855,12 @@ def describe_tonal_profile(brightness, warmth, richness):
     return ', '.join(descriptors)
 
 
-def generate_sonic_style_description(palette, tonal, features, tracks):
+def generate_sonic_style_description(palette, tonal, avg_energy, avg_bpm):
     """
     Generate marketing-grade sonic style description
     Like what Resident Advisor, Pitchfork, or a top music agency would say
     """
     
-    # Calculate average energy
-    avg_energy = np.mean([f['energy'] for f in features])
-    avg_bpm = np.mean([f['bpm'] for f in features])
-    
     # Primary aesthetic modifier based on energy
     if avg_energy >= 0.75:
         primary = "High-energy"
@@ -265,17 +905,77 @@ def generate_sonic_style_description(palette, tonal, features, tracks):
 
 def main():
     parser = argparse.ArgumentParser(description='Analyze sonic DNA from track collection')
-    parser.add_argument('tracks_json', help='JSON file with track data')
+    parser.add_argument('tracks_json', nargs='?',
+                        help='JSON file with track data (NDJSON also accepted with --library)')
     parser.add_argument('--json', action='store_true', help='Output JSON')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Parallel feature extraction processes (default: CPU count - 1)')
+    parser.add_argument('--time-budget', type=float, default=None,
+                        help='Seconds to spend analyzing tracks; the profile uses whatever finished')
+    parser.add_argument('--max-tracks', type=int, default=None,
+                        help=f'Tracks to analyze, highest energy first (default: {MAX_ANALYZED_TRACKS}, '
+                             f'or the cap stored in --state)')
+    parser.add_argument('--state', help='Profile state JSON: update it with the tracks (created if missing) '
+                                        'and write the updated state back')
+    parser.add_argument('--full-collection', action='store_true',
+                        help='With --state, the tracks are the whole collection: drop tracks no longer in it')
+    parser.add_argument('--library', action='store_true',
+                        help='Whole-library mode: stream every track into mergeable sketches '
+                             '(with --state, later runs only analyze new tracks)')
+    parser.add_argument('--shard', help='Library mode: only take shard I of N (as I/N)')
+    parser.add_argument('--merge', nargs='+', metavar='STATE',
+                        help='Merge library states from disjoint shards into one profile '
+                             '(written to --state if given)')
     
     args = parser.parse_args()
-    
-    # Load track data
-    with open(args.tracks_json, 'r') as f:
-        tracks_data = json.load(f)
-    
+    if not args.tracks_json and not args.merge:
+        parser.error('tracks_json is required unless --merge is given')
+
+    def load_state():
+        if args.state and Path(args.state).exists():
+            with open(args.state) as f:
+                return json.load(f)
+        return None
+
+    def save_state(result):
+        state = result.pop('state')
+        if args.state:
+            with open(args.state, 'w') as f:
+                json.dump(state, f)
+
     # Analyze
-    result = analyze_track_collection(tracks_data)
+    if args.merge:
+        states = []
+        for state_path in args.merge:
+            with open(state_path) as f:
+                states.append(json.load(f))
+        merged = merge_library_states(states)
+        result = build_library_dna(merged)
+        result['state'] = merged.to_dict()
+        save_state(result)
+    elif args.library:
+        shard = None
+        if args.shard:
+            index, count = (int(n) for n in args.shard.split('/'))
+            if not 0 <= index < count:
+                parser.error(f'--shard index must be in 0..{count - 1}')
+            shard = (index, count)
+        result = profile_track_library(iter_tracks_file(args.tracks_json), state=load_state(),
+                                       num_workers=args.workers, time_budget=args.time_budget, shard=shard)
+        save_state(result)
+    else:
+        # Load track data
+        with open(args.tracks_json, 'r') as f:
+            tracks_data = json.load(f)
+
+        if args.state:
+            result = update_track_collection(load_state(), tracks_data, num_workers=args.workers,
+                                             time_budget=args.time_budget, max_tracks=args.max_tracks,
+                                             full_collection=args.full_collection)
+            save_state(result)
+        else:
+            result = analyze_track_collection(tracks_data, num_workers=args.workers, time_budget=args.time_budget,
+                                              max_tracks=args.max_tracks or MAX_ANALYZED_TRACKS)
     
     if args.json:
         print(json.dumps(result, indent=2))
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Single entry point for the Python analyzers
+
+    python -m starforge audio track.mp3 --json --tier fast
+    python -m starforge batch tracks.json --stream
+    python -m starforge cache stats
+
+Only the module behind the chosen subcommand is imported, so `--help` and
+cheap subcommands start in a fraction of a second.
+"""
+
+import sys
+import importlib
+
+# subcommand -> (module, description)
+COMMANDS = {
+    'audio': ('audio_analyzer', 'Analyze one audio file'),
+    'stream': ('audio_stream_analyzer', 'Analyze a very long audio file with bounded memory'),
+    'batch': ('batch_analyzer', 'Analyze many audio files in parallel'),
+    'sonic': ('sonic_palette_analyzer', 'Sonic palette of a track collection'),
+    'visual': ('visual_dna_analyzer', 'Visual DNA of a photo collection'),
+    'server': ('analysis_server', 'Persistent JSON-lines analysis worker'),
+    'cache': ('feature_cache', 'Inspect or clear the feature cache'),
+    'bench': ('benchmarks.__main__', 'Benchmarks (run, compare, bpm, startup, palette)'),
+}
+
+
+def usage():
+    lines = ['usage: python -m starforge <command> [args...]', '', 'commands:']
+    lines += [f'  {name:<8} {description}' for name, (_, description) in COMMANDS.items()]
+    lines += ['', "Run 'python -m starforge <command> --help' for a command's options."]
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+
+    if not argv or argv[0] in ('-h', '--help'):
+        print(usage())
+        return 0
+
+    command, rest = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"Unknown command: {command}\n\n{usage()}", file=sys.stderr)
+        return 2
+
+    module_name, _ = COMMANDS[command]
+    # Each module's own argparse sees only its arguments
+    sys.argv = [f'starforge {command}'] + rest
+    # A subcommand's exit code (e.g. bench startup regressions) becomes ours
+    return importlib.import_module(module_name).main() or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,39 @@
+"""
+Shared fixtures for the analyzer tests
+
+Signals and photos come from benchmarks.fixtures (deterministic renders,
+written once to the benchmark fixture directory). The feature cache is
+disabled so every test computes its results.
+
+Run from backend/src/python:
+
+    python -m pytest tests
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+PYTHON_DIR = Path(__file__).resolve().parent.parent
+if str(PYTHON_DIR) not in sys.path:
+    sys.path.insert(0, str(PYTHON_DIR))
+
+from benchmarks.fixtures import ensure_fixtures, ensure_tempo_corpus  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def no_feature_cache(monkeypatch):
+    monkeypatch.setenv('STARFORGE_FEATURE_CACHE', 'off')
+
+
+@pytest.fixture(scope='session')
+def quick_fixtures():
+    """{name: path} of the quick synthetic audio suite"""
+    return {spec['name']: path for spec, path in ensure_fixtures('quick')}
+
+
+@pytest.fixture(scope='session')
+def tempo_fixtures():
+    """[(spec, path)] of the known-tempo drum corpus"""
+    return ensure_tempo_corpus()
@@ -0,0 +1,63 @@
+"""
+audio_analyzer: the shared feature front-end must reproduce what the
+per-feature librosa calls it replaced would compute
+"""
+
+import numpy as np
+import pytest
+
+librosa = pytest.importorskip('librosa')
+import audio_analyzer as aa  # noqa: E402
+
+CLIPS = ['click_128_30s', 'click_174_30s', 'pad_amin_30s', 'mix_90_padded_30s']
+
+
+def load(path):
+    return librosa.load(str(path), sr=None)
+
+
+@pytest.mark.parametrize('name', CLIPS)
+def test_shared_onset_envelope_matches_onset_strength(quick_fixtures, name):
+    y, sr = load(quick_fixtures[name])
+    ctx = aa.build_feature_context(y, sr)
+    np.testing.assert_allclose(ctx['onset_env'], librosa.onset.onset_strength(y=y, sr=sr), rtol=1e-5, atol=1e-6)
+
+
+@pytest.mark.parametrize('name', CLIPS)
+def test_track_beats_matches_beat_track(quick_fixtures, name):
+    y, sr = load(quick_fixtures[name])
+    expected_tempo, expected_beats = librosa.beat.beat_track(y=y, sr=sr)
+
+    ctx = aa.build_feature_context(y, sr)
+    tempo, beats = aa.track_beats(ctx['beat_onset_env'], sr, hop_length=ctx['hop_length'])
+
+    assert float(np.atleast_1d(tempo)[0]) == pytest.approx(float(np.atleast_1d(expected_tempo)[0]))
+    np.testing.assert_array_equal(beats, expected_beats)
+
+
+def test_track_beats_matches_beat_track_on_tempo_corpus(tempo_fixtures):
+    for spec, path in tempo_fixtures:
+        y, sr = load(path)
+        expected_tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
+        ctx = aa.build_feature_context(y, sr)
+        tempo, _ = aa.track_beats(ctx['beat_onset_env'], sr, hop_length=ctx['hop_length'])
+        assert float(np.atleast_1d(tempo)[0]) == pytest.approx(float(np.atleast_1d(expected_tempo)[0])), spec['name']
+
+
+@pytest.mark.parametrize('name', CLIPS)
+def test_chunked_silence_ratio_matches_per_sample(quick_fixtures, name):
+    y, sr = load(quick_fixtures[name])
+    expected = aa.calculate_silence_ratio(y, sr)
+    assert aa.calculate_silence_ratio_chunked(y) == pytest.approx(expected, abs=1e-6)
+    assert aa.calculate_silence_ratio_chunked(y, chunk_samples=4099) == pytest.approx(expected, abs=1e-6)
+
+
+def test_lean_mode_matches_default_on_tempo_corpus(tempo_fixtures):
+    for spec, path in tempo_fixtures:
+        full = aa.analyze_audio(str(path), include_quality=True, use_cache=False)
+        lean = aa.analyze_audio(str(path), include_quality=True, use_cache=False, lean=True)
+        assert lean['analysis_mode'] == 'lean'
+        assert 'analysis_mode' not in full
+        assert lean['bpm'] == pytest.approx(full['bpm']), spec['name']
+        assert lean['silence_ratio'] == pytest.approx(full['silence_ratio'], abs=1e-6), spec['name']
+        assert lean['quality_score'] == pytest.approx(full['quality_score']), spec['name']
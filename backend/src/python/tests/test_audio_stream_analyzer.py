@@ -0,0 +1,50 @@
+"""
+audio_stream_analyzer: block-wise gated loudness must match pyloudnorm's
+whole-signal meter
+"""
+
+import numpy as np
+import pytest
+
+pyln = pytest.importorskip('pyloudnorm')
+sf = pytest.importorskip('soundfile')
+pytest.importorskip('librosa')
+from audio_stream_analyzer import GatedLoudness, analyze_audio_streaming  # noqa: E402
+
+
+def load_mono(path):
+    y, sr = sf.read(str(path), dtype='float64')
+    return (y.mean(axis=1) if y.ndim > 1 else y), sr
+
+
+def streamed_loudness(y, sr, block):
+    loudness = GatedLoudness(sr)
+    for start in range(0, len(y), block):
+        loudness.add(y[start:start + block])
+    return loudness.integrated()
+
+
+@pytest.mark.parametrize('block', [4097, 1 << 16])
+def test_gated_loudness_matches_meter(quick_fixtures, block):
+    for name, path in quick_fixtures.items():
+        y, sr = load_mono(path)
+        expected = pyln.Meter(sr).integrated_loudness(y)
+        assert streamed_loudness(y, sr, block) == pytest.approx(expected, abs=1e-6), name
+
+
+def test_gated_loudness_matches_meter_on_tempo_corpus(tempo_fixtures):
+    for spec, path in tempo_fixtures:
+        y, sr = load_mono(path)
+        expected = pyln.Meter(sr).integrated_loudness(y)
+        assert streamed_loudness(y, sr, 1 << 15) == pytest.approx(expected, abs=1e-6), spec['name']
+
+
+def test_gated_loudness_of_silence_is_minus_infinity():
+    assert streamed_loudness(np.zeros(44100 * 2), 44100, 4096) == -np.inf
+
+
+def test_streaming_result_records_tier(quick_fixtures):
+    path = next(iter(quick_fixtures.values()))
+    result = analyze_audio_streaming(str(path))
+    assert result['analysis_mode'] == 'streaming'
+    assert result['analysis_tier'] == 'streaming'
@@ -0,0 +1,98 @@
+"""
+batch_analyzer: cache lookups run in the pool workers, and journals only
+resume runs made with the same analysis parameters
+"""
+
+import pytest
+
+pytest.importorskip('librosa')
+import batch_analyzer  # noqa: E402
+import feature_cache  # noqa: E402
+
+
+@pytest.fixture
+def cache_db(tmp_path, monkeypatch):
+    monkeypatch.setenv('STARFORGE_FEATURE_CACHE', str(tmp_path / 'cache.db'))
+    return tmp_path / 'cache.db'
+
+
+def test_batch_cache_lookups_run_in_workers(quick_fixtures, cache_db, monkeypatch):
+    tracks = [('a', str(quick_fixtures['click_128_1s'])), ('b', str(quick_fixtures['pad_amin_30s']))]
+    first = batch_analyzer.analyze_batch(tracks, num_workers=2)
+    assert sum(a['entries'] for a in feature_cache.cache_stats()['analyzers']) == 2
+
+    # Forked workers get their own copy of this list; only parent-side hashing lands here
+    hashed_in_parent = []
+    digest = feature_cache.file_digest
+    monkeypatch.setattr(feature_cache, 'file_digest', lambda *a, **kw: hashed_in_parent.append(a) or digest(*a, **kw))
+
+    second = batch_analyzer.analyze_batch(tracks, num_workers=2)
+    assert list(second) == ['a', 'b']
+    assert second == first
+    assert hashed_in_parent == []
+
+
+def test_journal_resumes_with_matching_params(tmp_path):
+    path = str(tmp_path / 'job.ndjson')
+    params = batch_analyzer.journal_params('fast')
+    journal = batch_analyzer.BatchJournal(path, params)
+    journal.record('a', {'bpm': 120.0})
+    journal.record('b', {'error': 'decode failed'})
+    journal.close()
+
+    with open(path, 'a') as f:
+        f.write('{"id": "c", "res')  # torn line from a killed run
+
+    journal = batch_analyzer.BatchJournal(path, batch_analyzer.journal_params('fast'))
+    journal.record('c', {'bpm': 90.0})
+    journal.close()
+
+    journal = batch_analyzer.BatchJournal(path, params)
+    todo, finished = journal.plan([('a', 'a.wav'), ('b', 'b.wav'), ('c', 'c.wav')])
+    journal.close()
+    assert todo == [('b', 'b.wav')]
+    assert finished == {'a': {'bpm': 120.0}, 'c': {'bpm': 90.0}}
+
+
+@pytest.mark.parametrize('tier, lean', [('full', False), ('fast', True)])
+def test_journal_refuses_other_params(tmp_path, tier, lean):
+    path = str(tmp_path / 'job.ndjson')
+    journal = batch_analyzer.BatchJournal(path, batch_analyzer.journal_params('fast'))
+    journal.record('a', {'bpm': 120.0})
+    journal.close()
+
+    with pytest.raises(ValueError):
+        batch_analyzer.BatchJournal(path, batch_analyzer.journal_params(tier, lean))
+
+
+def test_journal_with_other_params_can_be_discarded(tmp_path):
+    path = str(tmp_path / 'job.ndjson')
+    journal = batch_analyzer.BatchJournal(path, batch_analyzer.journal_params('fast'))
+    journal.record('a', {'bpm': 120.0})
+    journal.close()
+
+    params = batch_analyzer.journal_params('full')
+    journal = batch_analyzer.BatchJournal(path, params, discard_stale=True)
+    todo, finished = journal.plan([('a', 'a.wav')])
+    journal.close()
+    assert (todo, finished) == ([('a', 'a.wav')], {})
+    assert (tmp_path / 'job.ndjson.stale').exists()
+
+    # The fresh journal carries the new params and resumes normally
+    journal = batch_analyzer.BatchJournal(path, params)
+    assert journal.params == params
+    journal.close()
+
+
+def test_journal_without_header_is_refused(tmp_path):
+    path = tmp_path / 'job.ndjson'
+    path.write_text('{"id": "a", "result": {"bpm": 120.0}, "ts": 0}\n')
+    with pytest.raises(ValueError):
+        batch_analyzer.BatchJournal(str(path), batch_analyzer.journal_params())
+
+
+def test_iter_journaled_checks_run_params(tmp_path):
+    journal = batch_analyzer.BatchJournal(str(tmp_path / 'job.ndjson'), batch_analyzer.journal_params('fast'))
+    with pytest.raises(ValueError):
+        list(batch_analyzer.iter_journaled([('a', 'a.wav')], journal, tier='full'))
+    journal.close()
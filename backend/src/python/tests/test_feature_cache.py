@@ -0,0 +1,97 @@
+"""
+feature_cache: the running size total stays in step with the stored
+entries, and eviction forgets file hashes no entry refers to
+"""
+
+import sqlite3
+
+import pytest
+
+import feature_cache
+
+
+@pytest.fixture
+def cache_db(tmp_path, monkeypatch):
+    monkeypatch.setenv('STARFORGE_FEATURE_CACHE', str(tmp_path / 'cache.db'))
+    return tmp_path / 'cache.db'
+
+
+def make_files(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f'track_{i}.bin'
+        path.write_bytes(bytes([i]) * 1000)
+        paths.append(str(path))
+    return paths
+
+
+def scanned_total(conn):
+    return conn.execute('SELECT COALESCE(SUM(size), 0) FROM features').fetchone()[0]
+
+
+def test_running_total_tracks_puts_replaces_and_clears(cache_db, tmp_path):
+    paths = make_files(tmp_path, 3)
+    for i, path in enumerate(paths):
+        feature_cache.put_cached(path, 'test', '1', {}, {'value': i})
+    feature_cache.put_cached(paths[0], 'test', '1', {}, {'value': 'a much longer replacement value'})
+    feature_cache.put_cached(paths[1], 'other', '1', {}, {'value': 1})
+
+    conn = feature_cache._connect()
+    assert feature_cache.total_size(conn) == scanned_total(conn)
+    assert feature_cache.get_cached(paths[0], 'test', '1', {}) == {'value': 'a much longer replacement value'}
+
+    feature_cache.clear_cache('test')
+    assert feature_cache.total_size(conn) == scanned_total(conn) > 0
+    feature_cache.clear_cache()
+    assert feature_cache.total_size(conn) == 0
+    assert conn.execute('SELECT COUNT(*) FROM file_hashes').fetchone()[0] == 0
+
+
+def test_evict_drops_oldest_entries_and_their_file_hashes(cache_db, tmp_path):
+    paths = make_files(tmp_path, 4)
+    for path in paths:
+        feature_cache.put_cached(path, 'test', '1', {}, {'value': 'x' * 100})
+
+    conn = feature_cache._connect()
+    entry_size = feature_cache.total_size(conn) // 4
+    assert feature_cache.evict(conn, limit_bytes=2 * entry_size) == 2
+
+    assert feature_cache.total_size(conn) == scanned_total(conn) == 2 * entry_size
+    hashed = {row[0] for row in conn.execute('SELECT path FROM file_hashes')}
+    assert hashed == set(paths[2:])
+    assert feature_cache.get_cached(paths[0], 'test', '1', {}) is None
+    assert feature_cache.get_cached(paths[3], 'test', '1', {}) == {'value': 'x' * 100}
+
+
+def test_evict_walks_lru_order_in_batches(cache_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(feature_cache, 'EVICT_BATCH', 3)
+    paths = make_files(tmp_path, 8)
+    for path in paths:
+        feature_cache.put_cached(path, 'test', '1', {}, {'value': 'x' * 100})
+
+    conn = feature_cache._connect()
+    entry_size = feature_cache.total_size(conn) // 8
+    assert feature_cache.evict(conn, limit_bytes=entry_size) == 7
+    assert feature_cache.total_size(conn) == scanned_total(conn) == entry_size
+    assert feature_cache.get_cached(paths[-1], 'test', '1', {}) == {'value': 'x' * 100}
+
+
+def test_existing_cache_is_migrated(cache_db):
+    legacy = sqlite3.connect(str(cache_db))
+    legacy.executescript('''
+        CREATE TABLE features (
+            key TEXT PRIMARY KEY, analyzer TEXT NOT NULL, version TEXT NOT NULL, value TEXT NOT NULL,
+            size INTEGER NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL
+        );
+        CREATE TABLE file_hashes (
+            path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, digest TEXT NOT NULL
+        );
+        INSERT INTO features VALUES ('k1', 'test', '1', '{}', 40, 0, 0), ('k2', 'test', '1', '{}', 60, 0, 0);
+    ''')
+    legacy.close()
+
+    conn = feature_cache._connect()
+    assert feature_cache.total_size(conn) == 100
+    assert 'digest' in {row[1] for row in conn.execute('PRAGMA table_info(features)')}
+    assert feature_cache.evict(conn, limit_bytes=60) == 1
+    assert feature_cache.total_size(conn) == 60
@@ -0,0 +1,145 @@
+"""
+sonic_palette_analyzer: library states profiled in shards (or in several
+refreshes) merge into exactly the profile of a single pass
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip('librosa')
+import sonic_palette_analyzer as spa  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def library(quick_fixtures, tempo_fixtures):
+    """Track dicts carrying their extracted features, so profiling skips extraction"""
+    paths = list(quick_fixtures.values()) + [path for _, path in tempo_fixtures]
+    tracks = []
+    for i, path in enumerate(paths):
+        features = spa.extract_spectral_features(str(path), use_cache=False)
+        tracks.append({'path': str(path), 'bpm': 80 + 7 * i, 'energy': round(i / len(paths), 3), **features})
+    return tracks
+
+
+def assert_state_close(actual, expected, where='state'):
+    if isinstance(expected, dict):
+        assert set(actual) == set(expected), where
+        for key in expected:
+            assert_state_close(actual[key], expected[key], f'{where}.{key}')
+    elif isinstance(expected, list) and expected and not isinstance(expected[0], str):
+        assert len(actual) == len(expected), where
+        for i, (a, e) in enumerate(zip(actual, expected)):
+            assert_state_close(a, e, f'{where}[{i}]')
+    elif isinstance(expected, float):
+        assert actual == pytest.approx(expected, rel=1e-9, abs=1e-9), where
+    else:
+        assert actual == expected, where
+
+
+def test_merged_shards_match_single_pass(library):
+    single = spa.profile_track_library(library)
+    shards = [spa.profile_track_library(library, shard=(i, 3)) for i in range(3)]
+    assert sum(s['state']['count'] for s in shards) == len(library)
+
+    merged = spa.merge_library_states([s['state'] for s in shards])
+    assert_state_close(merged.to_dict(), single['state'])
+
+    dna = spa.build_library_dna(merged)
+    for key in ('distributions', 'timbre', 'dominantFrequencies', 'styleDescription', 'totalAnalyzed'):
+        assert dna[key] == single[key], key
+
+
+def test_refresh_matches_single_pass(library):
+    single = spa.profile_track_library(library)
+    half = len(library) // 2
+    first = spa.profile_track_library(library[:half])
+    # Re-sending already profiled tracks must not count them twice
+    refreshed = spa.profile_track_library(library, state=first['state'])
+    assert_state_close(refreshed['state'], single['state'])
+
+
+def test_overlapping_states_are_rejected(library):
+    single = spa.profile_track_library(library)
+    shard = spa.profile_track_library(library, shard=(0, 2))
+    with pytest.raises(ValueError):
+        spa.merge_library_states([single['state'], shard['state']])
+
+
+def test_state_round_trips_through_json(library):
+    state = spa.profile_track_library(library)['state']
+    restored = spa.LibrarySketch.from_dict(json.loads(json.dumps(state)))
+    assert restored.to_dict() == state
+    np.testing.assert_allclose(restored.mfcc_moments.covariance(),
+                               spa.LibrarySketch.from_dict(state).mfcc_moments.covariance())
+
+
+def test_state_kind_and_version_are_checked(library):
+    state = spa.profile_track_library(library[:2])['state']
+    with pytest.raises(ValueError):
+        spa.LibrarySketch.from_dict({**state, 'kind': None})
+    with pytest.raises(ValueError):
+        spa.LibrarySketch.from_dict({**state, 'version': -1})
+
+
+@pytest.fixture
+def collection(library):
+    """The fixture tracks as the collection path sees them: path, bpm and energy only"""
+    return [{'path': t['path'], 'bpm': t['bpm'], 'energy': t['energy']} for t in library]
+
+
+@pytest.fixture
+def decoded(monkeypatch):
+    """Paths whose audio gets decoded"""
+    paths = []
+    extract = spa.extract_spectral_features
+    monkeypatch.setattr(spa, 'extract_spectral_features', lambda path: paths.append(path) or extract(path))
+    return paths
+
+
+def test_update_matches_full_analysis(collection, decoded):
+    full = spa.analyze_track_collection(collection, num_workers=1, max_tracks=6, include_state=True)
+    assert len(full['records']) == 6
+
+    first = spa.analyze_track_collection(collection[::2], num_workers=1, max_tracks=6, include_state=True)
+    del decoded[:]
+    updated = spa.update_track_collection(first['state'], collection, num_workers=1)
+
+    assert updated['records'] == full['records']
+    assert updated['state'] == full['state']
+    assert updated['styleDescription'] == full['styleDescription']
+    # Only new tracks that make the cut are decoded
+    kept = {r['path'] for r in first['records']}
+    assert set(decoded) == {r['path'] for r in full['records']} - kept
+
+    del decoded[:]
+    again = spa.update_track_collection(updated['state'], collection, num_workers=1)
+    assert decoded == []
+    assert again['records'] == full['records']
+
+
+def test_update_reweights_and_removes_tracks(collection, decoded):
+    state = spa.analyze_track_collection(collection, num_workers=1, max_tracks=6, include_state=True)['state']
+    top = state['records'][0]['path']
+
+    demoted = [dict(t, energy=-1.0) if t['path'] == top else t for t in collection]
+    reweighted = spa.update_track_collection(state, demoted, num_workers=1, full_collection=True)
+    assert top not in {r['path'] for r in reweighted['records']}
+    assert reweighted['records'] == spa.analyze_track_collection(demoted, num_workers=1, max_tracks=6)['records']
+
+    removed = spa.update_track_collection(state, [], removed_paths=[top])
+    assert [r['path'] for r in removed['records']] == [r['path'] for r in state['records'][1:]]
+
+
+def test_update_rejects_other_states(library):
+    library_state = spa.profile_track_library(library[:2])['state']
+    with pytest.raises(ValueError):
+        spa.update_track_collection(library_state, [])
+
+
+def test_forkserver_pool_matches_sequential_extraction(quick_fixtures, monkeypatch):
+    # analysis_server runs requests on threads and switches pools to forkserver
+    monkeypatch.setattr(spa, 'POOL_START_METHOD', 'forkserver')
+    paths = [str(p) for p in list(quick_fixtures.values())[:3]]
+    assert list(spa.iter_track_features(paths, num_workers=2)) == list(spa.iter_track_features(paths, num_workers=1))
@@ -0,0 +1,30 @@
+"""
+starforge entry point: subcommand exit codes must reach the shell
+"""
+
+import sys
+import types
+
+import starforge
+
+
+def fake_command(monkeypatch, result):
+    module = types.ModuleType('fake_command')
+    module.main = lambda: result
+    monkeypatch.setitem(sys.modules, 'fake_command', module)
+    monkeypatch.setitem(starforge.COMMANDS, 'fake', ('fake_command', 'Test command'))
+    monkeypatch.setattr(sys, 'argv', list(sys.argv))
+
+
+def test_subcommand_exit_code_is_returned(monkeypatch):
+    fake_command(monkeypatch, 1)
+    assert starforge.main(['fake']) == 1
+
+
+def test_subcommand_without_exit_code_succeeds(monkeypatch):
+    fake_command(monkeypatch, None)
+    assert starforge.main(['fake']) == 0
+
+
+def test_unknown_command(capsys):
+    assert starforge.main(['nope']) == 2
@@ -0,0 +1,150 @@
+"""
+visual_dna_analyzer: the vectorized color helpers must agree with the
+per-color colorsys logic and the pairwise dedup loop they replaced
+"""
+
+import colorsys
+import copy
+import math
+
+import numpy as np
+import pytest
+
+pytest.importorskip('PIL')
+pytest.importorskip('sklearn')
+import visual_dna_analyzer as vda  # noqa: E402
+from benchmarks.fixtures import ensure_image_fixtures, image_specs, render_image  # noqa: E402
+
+
+def scalar_hsv(rgb):
+    h, s, v = colorsys.rgb_to_hsv(rgb[0] / 255, rgb[1] / 255, rgb[2] / 255)
+    return h * 360, s, v
+
+
+def scalar_hue_name(h):
+    bounds = [(15, 'red'), (30, 'vermillion'), (45, 'orange'), (60, 'amber'), (75, 'yellow'),
+              (105, 'chartreuse'), (135, 'green'), (165, 'teal'), (195, 'cyan'), (225, 'azure'),
+              (255, 'blue'), (285, 'purple'), (315, 'magenta'), (345, 'rose')]
+    for bound, name in bounds:
+        if h < bound:
+            return name
+    return 'red'
+
+
+def scalar_color_name(rgb):
+    h, s, v = scalar_hsv(rgb)
+    if v < 0.15:
+        return 'black'
+    if v < 0.35:
+        return 'charcoal' if s < 0.15 else f'dark {scalar_hue_name(h)}'
+    if s < 0.1:
+        return 'white' if v > 0.7 else 'grey'
+    hue_name = scalar_hue_name(h)
+    if v < 0.55:
+        return f'deep {hue_name}'
+    if v > 0.85 and s > 0.5:
+        return f'bright {hue_name}'
+    if s < 0.35:
+        return f'muted {hue_name}'
+    return hue_name
+
+
+def scalar_dedup(colors, min_distance, space):
+    coords = vda.color_coordinates([c['rgb'] for c in colors], space)
+    merged = [0]
+    for i in range(1, len(colors)):
+        for j in merged:
+            if math.dist(coords[i], coords[j]) < min_distance:
+                colors[j]['weight'] += colors[i]['weight']
+                colors[j]['percentage'] += colors[i]['percentage']
+                break
+        else:
+            merged.append(i)
+    return [colors[j] for j in merged]
+
+
+@pytest.fixture(scope='module')
+def pixels():
+    """Pixels of the photo fixtures, plus greys, primaries and hue-boundary colors"""
+    photos = [render_image(spec, width=90, height=60).reshape(-1, 3) for spec in image_specs()]
+    greys = np.repeat(np.arange(0, 256, 5)[:, None], 3, axis=1)
+    hues = [np.round(np.array(colorsys.hsv_to_rgb(h / 360, s, v)) * 255)
+            for h in range(0, 360, 15) for s in (0.05, 0.3, 1.0) for v in (0.1, 0.3, 0.5, 0.9, 1.0)]
+    return np.concatenate(photos + [greys, np.array(hues)]).astype(np.uint8)
+
+
+def test_hsv_array_matches_colorsys(pixels):
+    h, s, v = vda.rgb_to_hsv_array(pixels)
+    expected = np.array([scalar_hsv(p) for p in pixels.tolist()])
+    np.testing.assert_array_equal(np.stack([h, s, v], axis=1), expected)
+
+
+def test_color_names_and_masks_match_scalar_logic(pixels):
+    colors = pixels.tolist()
+    assert vda.color_names(pixels) == [scalar_color_name(c) for c in colors]
+
+    hsv = [scalar_hsv(c) for c in colors]
+    black = [v < 0.12 or (v < 0.30 and s < 0.25) for _, s, v in hsv]
+    white = [v > 0.95 and s < 0.1 for _, s, v in hsv]
+    np.testing.assert_array_equal(vda.near_black_mask(pixels), black)
+    np.testing.assert_array_equal(vda.near_white_mask(pixels), white)
+
+
+@pytest.mark.parametrize('space', ['rgb', 'lab'])
+def test_deduplicate_matches_pairwise_loop(pixels, space):
+    rng = np.random.default_rng(7)
+    sample = pixels[rng.choice(len(pixels), 600, replace=False)]
+    colors = [{'rgb': tuple(c), 'weight': float(w), 'percentage': float(w) * 10}
+              for c, w in zip(sample.tolist(), rng.random(len(sample)))]
+
+    actual = vda.deduplicate_colors(copy.deepcopy(colors), space=space)
+    expected = scalar_dedup(copy.deepcopy(colors), vda.MERGE_DISTANCES[space], space)
+    assert len(expected) < len(colors)
+    assert [c['rgb'] for c in actual] == [c['rgb'] for c in expected]
+    np.testing.assert_allclose([c['weight'] for c in actual], [c['weight'] for c in expected])
+    np.testing.assert_allclose([c['percentage'] for c in actual], [c['percentage'] for c in expected])
+
+
+def test_streamed_description_uses_whole_stream_average_score():
+    # Top-rated photos are over-represented in the score-weighted sample
+    # (its mean is 70.4, "Curated"); the whole stream averages 67.7
+    photos = [{'path': f'/missing/photos/{i}.jpg', 'score': 100 if i < 300 else 62, 'tags': []}
+              for i in range(2000)]
+    result = vda.stream_photo_collection(photos, sample_size=100)
+
+    assert result['averageScore'] == 67.7
+    assert result['styleDescription'].startswith('Evolving')
+
+
+def test_warm_start_keeps_previous_palette_order():
+    previous = np.array([[200, 10, 10], [10, 10, 200], [200, 10, 10], [100, 100, 100]], dtype=np.float64)
+    pixels = np.random.default_rng(0).uniform(0, 255, (500, 3))
+    centers = vda.warm_start_centers(pixels, np.ones(len(pixels)), previous, 2)
+    np.testing.assert_array_equal(centers, [[200, 10, 10], [10, 10, 200]])
+
+
+@pytest.fixture
+def photos(tmp_path, monkeypatch):
+    monkeypatch.setenv('STARFORGE_FEATURE_CACHE', str(tmp_path / 'cache.db'))
+    return [{'path': str(path), 'score': 60 + 5 * i, 'tags': []}
+            for i, (_, path) in enumerate(ensure_image_fixtures())]
+
+
+def test_pooled_mode_caches_pixel_samples(photos, monkeypatch):
+    first = vda.analyze_photo_collection(photos, mode='pooled')
+
+    loaded = []
+    load_image = vda.load_image
+    monkeypatch.setattr(vda, 'load_image', lambda path, **kw: loaded.append(path) or load_image(path, **kw))
+    assert vda.analyze_photo_collection(photos, mode='pooled') == first
+    assert loaded == []
+
+    assert vda.analyze_photo_collection(photos, mode='pooled', use_cache=False) == first
+    assert len(loaded) == len(photos)
+
+
+def test_pooled_mode_quantizers(photos):
+    result = vda.analyze_photo_collection(photos, mode='pooled', quantizer='minibatch', use_cache=False)
+    assert result['colorPalette']
+    with pytest.raises(ValueError):
+        vda.analyze_photo_collection(photos, mode='pooled', quantizer='mediancut')
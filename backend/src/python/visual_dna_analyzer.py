@@ -5,22 +5,69 @@ Extracts color palettes, style profiles, and aesthetic signatures
 from user's photo collection for marketing-grade insights.
 """
 
+import io
 import sys
 import json
 import argparse
 import math
 from pathlib import Path
-from collections import Counter
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+import zlib
+import heapq
 import colorsys
+import importlib.util
 
 try:
-    from PIL import Image
+    from PIL import Image, ExifTags
     import numpy as np
-    from sklearn.cluster import KMeans
+    # scikit-learn takes ~1 s to import; check it is installed here, import it when clustering
+    if importlib.util.find_spec('sklearn') is None:
+        raise ImportError("No module named 'sklearn'")
 except ImportError as e:
     print(json.dumps({"error": f"Missing dependency: {e}"}))
     sys.exit(1)
 
+import feature_cache
+
+# Bump when per-photo palette output changes so cached palettes are recomputed
+ANALYZER_VERSION = '1'
+
+# Pixels color extraction works on (photos are squashed to this size)
+ANALYSIS_SIZE = (150, 150)
+
+# Photo decoding ahead of color extraction: threads, and the most photos
+# decoding or decoded-and-waiting at once
+DECODE_WORKERS = 4
+MAX_DECODED = 8
+
+# Pooled palette mode: pixels sampled from each photo, and clusters fitted
+# over the whole pooled sample
+POOLED_PIXELS_PER_PHOTO = 2000
+POOLED_CLUSTERS = 6
+# Quantizers the pooled clustering can use (median cut has no weighted or warm-started form)
+POOLED_QUANTIZERS = ('kmeans', 'minibatch')
+PALETTE_MODES = ('per_photo', 'pooled')
+
+# Streaming mode: photos kept in the score-weighted library sample, and the
+# analyzed photo count at which a profile gets full confidence
+STREAM_SAMPLE_SIZE = 200
+FULL_CONFIDENCE_PHOTOS = 30
+
+# Distance under which collection palette colors are merged, per color space
+# (30 RGB units; about 12 delta-E in Lab, the "clearly same color" range)
+MERGE_DISTANCES = {'rgb': 30.0, 'lab': 12.0}
+
+# sRGB (linear) -> XYZ matrix and the D65 reference white, for Lab
+SRGB_TO_XYZ = np.array([[0.4124, 0.3576, 0.1805],
+                        [0.2126, 0.7152, 0.0722],
+                        [0.0193, 0.1192, 0.9505]])
+D65_WHITE = np.array([0.95047, 1.0, 1.08883])
+
+# EXIF IFD1 tags locating the embedded JPEG thumbnail
+EXIF_THUMBNAIL_OFFSET = 0x0201
+EXIF_THUMBNAIL_LENGTH = 0x0202
+
 
 def rgb_to_hex(rgb):
     """Convert RGB tuple to hex color code"""
@@ -33,92 +80,103 @@ def rgb_to_hsv(rgb):
     return h * 360, s, v
 
 
+def rgb_to_hsv_array(rgb):
+    """
+    rgb_to_hsv over an (n, 3) array of RGB (0-255) colors
+    Same arithmetic as colorsys, so results match the scalar version exactly
+    Returns h (0-360), s, v arrays
+    """
+    rgb = np.asarray(rgb, dtype=np.float64).reshape(-1, 3) / 255
+    r, g, b = rgb.T
+    maxc = rgb.max(axis=1)
+    delta = maxc - rgb.min(axis=1)
+    chromatic = delta > 0
+
+    s = np.divide(delta, maxc, out=np.zeros_like(maxc), where=chromatic)
+    span = np.where(chromatic, delta, 1.0)
+    rc, gc, bc = (maxc - r) / span, (maxc - g) / span, (maxc - b) / span
+    h = np.where(r == maxc, bc - gc, np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = np.where(chromatic, (h / 6.0) % 1.0, 0.0)
+    return h * 360, s, maxc
+
+
+def rgb_to_lab(rgb):
+    """(n, 3) sRGB (0-255) -> CIE L*a*b* (D65), where distance tracks perceived difference"""
+    c = np.asarray(rgb, dtype=np.float64).reshape(-1, 3) / 255
+    linear = np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+    xyz = linear @ SRGB_TO_XYZ.T / D65_WHITE
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    return np.stack([116 * f[:, 1] - 16, 500 * (f[:, 0] - f[:, 1]), 200 * (f[:, 1] - f[:, 2])], axis=1)
+
+
+def color_coordinates(rgb, space='rgb'):
+    """Colors as points for distance comparisons: raw RGB or Lab"""
+    if space not in MERGE_DISTANCES:
+        raise ValueError(f"Unknown color space: {space} (choose from {', '.join(MERGE_DISTANCES)})")
+    rgb = np.asarray(rgb, dtype=np.float64).reshape(-1, 3)
+    return rgb_to_lab(rgb) if space == 'lab' else rgb
+
+
+def near_black_mask(rgb, threshold=0.30):
+    """is_near_black over an (n, 3) array"""
+    _, s, v = rgb_to_hsv_array(rgb)
+    return (v < 0.12) | ((v < threshold) & (s < 0.25))
+
+
+def near_white_mask(rgb):
+    """is_near_white over an (n, 3) array"""
+    _, s, v = rgb_to_hsv_array(rgb)
+    return (v > 0.95) & (s < 0.1)
+
+
 def is_near_black(rgb, threshold=0.30):
     """Check if a color is near-black based on HSV value.
     Colors with V < threshold are filtered UNLESS they have
     significant saturation (dark but chromatic colors like
     deep navy, burgundy survive).
     """
-    _, s, v = rgb_to_hsv(rgb)
-    if v < 0.12:
-        return True
-    if v < threshold and s < 0.25:
-        return True
-    return False
+    return bool(near_black_mask([rgb], threshold)[0])
 
 
 def is_near_white(rgb):
     """Check if a color is near-white (high value, low saturation)"""
-    _, s, v = rgb_to_hsv(rgb)
-    return v > 0.95 and s < 0.1
-
-
-def get_color_name(rgb):
-    """Get descriptive name for color based on HSV with dark color support"""
-    h, s, v = rgb_to_hsv(rgb)
+    return bool(near_white_mask([rgb])[0])
 
-    # Very dark colors — catch these first regardless of saturation
-    if v < 0.15:
-        return "black"
 
-    # Dark but visible colors
-    if v < 0.35:
-        if s < 0.15:
-            return "charcoal"
-        # Has hue — describe as "dark {hue}"
-        hue_name = _hue_name(h)
-        return f"dark {hue_name}"
+# Hue wheel: HUE_NAMES[i] covers hues below HUE_BOUNDS[i] (red wraps around)
+HUE_BOUNDS = np.array([15, 30, 45, 60, 75, 105, 135, 165, 195, 225, 255, 285, 315, 345])
+HUE_NAMES = ['red', 'vermillion', 'orange', 'amber', 'yellow', 'chartreuse', 'green', 'teal', 'cyan',
+             'azure', 'blue', 'purple', 'magenta', 'rose', 'red']
 
-    # Achromatic (low saturation)
-    if s < 0.1:
-        if v > 0.7:
-            return "white"
-        return "grey"
 
-    # Full color classification
-    hue_name = _hue_name(h)
+def color_names(rgb):
+    """
+    get_color_name over an (n, 3) array
+    Very dark colors are black / charcoal / dark {hue}; low-saturation ones
+    white / grey; the rest a hue name with a deep / bright / muted qualifier
+    """
+    h, s, v = rgb_to_hsv_array(rgb)
+    hues = np.searchsorted(HUE_BOUNDS, h, side='right')
+
+    # Conditions are checked in order; the first that holds picks the pattern
+    patterns = ['black', 'charcoal', 'dark {}', 'white', 'grey', 'deep {}', 'bright {}', 'muted {}', '{}']
+    choice = np.select(
+        [v < 0.15, (v < 0.35) & (s < 0.15), v < 0.35, (s < 0.1) & (v > 0.7), s < 0.1,
+         v < 0.55, (v > 0.85) & (s > 0.5), s < 0.35],
+        np.arange(8),
+        default=8
+    )
+    return [patterns[c].format(HUE_NAMES[i]) for c, i in zip(choice, hues)]
 
-    # Add brightness qualifier
-    if v < 0.55:
-        return f"deep {hue_name}"
-    elif v > 0.85 and s > 0.5:
-        return f"bright {hue_name}"
-    elif s < 0.35:
-        return f"muted {hue_name}"
 
-    return hue_name
+def get_color_name(rgb):
+    """Get descriptive name for color based on HSV with dark color support"""
+    return color_names([rgb])[0]
 
 
 def _hue_name(h):
     """Map hue angle to color name"""
-    if h < 15 or h >= 345:
-        return "red"
-    elif h < 30:
-        return "vermillion"
-    elif h < 45:
-        return "orange"
-    elif h < 60:
-        return "amber"
-    elif h < 75:
-        return "yellow"
-    elif h < 105:
-        return "chartreuse"
-    elif h < 135:
-        return "green"
-    elif h < 165:
-        return "teal"
-    elif h < 195:
-        return "cyan"
-    elif h < 225:
-        return "azure"
-    elif h < 255:
-        return "blue"
-    elif h < 285:
-        return "purple"
-    elif h < 315:
-        return "magenta"
-    else:
-        return "rose"
+    return HUE_NAMES[int(np.searchsorted(HUE_BOUNDS, h, side='right'))]
 
 
 def rgb_distance(rgb1, rgb2):
@@ -126,80 +184,266 @@ def rgb_distance(rgb1, rgb2):
     return math.sqrt(sum((a - b) ** 2 for a, b in zip(rgb1, rgb2)))
 
 
-def deduplicate_colors(colors, min_distance=30):
-    """Merge colors that are very similar (within min_distance in RGB space)"""
+def merge_within_radius(points, radius):
+    """
+    Greedy in-order radius merge: each point joins the earliest kept point
+    closer than radius, or is kept itself. Points are hashed into a grid of
+    radius-sized cells, so only the 27 surrounding cells are searched and
+    the whole pass is O(n) rather than O(n^2).
+    Returns owner: for every point, the index of the kept point it joined
+    (itself if kept)
+    """
+    points = np.asarray(points, dtype=np.float64)
+    cells = np.floor(points / radius).astype(np.int64)
+    offsets = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)]
+    grid = {}
+    owner = np.arange(len(points))
+
+    for i, (cx, cy, cz) in enumerate(cells.tolist()):
+        candidates = [j for dx, dy, dz in offsets for j in grid.get((cx + dx, cy + dy, cz + dz), ())]
+        if candidates:
+            candidates = np.sort(candidates)
+            close = np.linalg.norm(points[candidates] - points[i], axis=1) < radius
+            if close.any():
+                owner[i] = candidates[np.argmax(close)]
+                continue
+        grid.setdefault((cx, cy, cz), []).append(i)
+
+    return owner
+
+
+def deduplicate_colors(colors, min_distance=None, space='rgb'):
+    """
+    Merge colors that are very similar (within min_distance in RGB or Lab
+    space; default MERGE_DISTANCES[space]). Colors are taken in order and
+    each merges into the earliest kept color in range.
+    """
     if not colors:
         return colors
+    if min_distance is None:
+        min_distance = MERGE_DISTANCES[space]
+
+    owner = merge_within_radius(color_coordinates([c['rgb'] for c in colors], space), min_distance)
 
-    merged = [colors[0]]
-    for color in colors[1:]:
-        is_duplicate = False
-        for existing in merged:
-            if rgb_distance(color['rgb'], existing['rgb']) < min_distance:
-                # Merge into the higher-weight one
-                existing['weight'] += color['weight']
-                existing['percentage'] += color['percentage']
-                is_duplicate = True
-                break
-        if not is_duplicate:
+    merged = []
+    for i, color in enumerate(colors):
+        if owner[i] == i:
             merged.append(color)
+        else:
+            # Merge into the higher-weight one
+            existing = colors[owner[i]]
+            existing['weight'] += color['weight']
+            existing['percentage'] += color['percentage']
 
     return merged
 
 
-def extract_dominant_colors(image_path, n_colors=8):
-    """Extract dominant colors from an image using k-means clustering.
-    Uses 8 initial clusters and filters near-black/near-white for better results.
+def quantize_kmeans(img, n_colors):
+    """Full k-means, best of 10 initialisations (the original, slowest path)"""
+    from sklearn.cluster import KMeans
+
+    pixels = np.array(img).reshape(-1, 3)
+    kmeans = KMeans(n_clusters=n_colors, random_state=42, n_init=10)
+    kmeans.fit(pixels)
+    return kmeans.cluster_centers_, kmeans.labels_
+
+
+def quantize_minibatch(img, n_colors):
+    """Mini-batch k-means, single k-means++ initialisation"""
+    from sklearn.cluster import MiniBatchKMeans
+
+    pixels = np.array(img).reshape(-1, 3).astype(np.float64)
+    kmeans = MiniBatchKMeans(n_clusters=n_colors, random_state=42, n_init=1, batch_size=2048)
+    kmeans.fit(pixels)
+    return kmeans.cluster_centers_, kmeans.labels_
+
+
+def quantize_mediancut(img, n_colors):
+    """
+    Median cut over a 5-bit-per-channel color cube (PIL's C implementation)
+    Boxes are split at the median of their widest channel; each palette
+    entry is the mean color of its box
+    """
+    reduced = Image.eval(img, lambda v: v & 0xF8)
+    quantized = reduced.quantize(colors=n_colors, method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE)
+    labels = np.array(quantized).reshape(-1)
+
+    # Box means from the full-precision pixels, not the reduced cube
+    pixels = np.array(img).reshape(-1, 3)
+    counts = np.bincount(labels, minlength=n_colors)
+    sums = np.stack([np.bincount(labels, weights=pixels[:, c], minlength=n_colors) for c in range(3)], axis=1)
+    centers = sums / np.maximum(counts, 1)[:, None]
+    return centers, labels
+
+
+# name -> fn(RGB PIL image, n_colors) -> (centers (k, 3), per-pixel labels)
+QUANTIZERS = {
+    'kmeans': quantize_kmeans,
+    'minibatch': quantize_minibatch,
+    'mediancut': quantize_mediancut,
+}
+DEFAULT_QUANTIZER = 'kmeans'
+
+
+def get_quantizer(name):
+    if name not in QUANTIZERS:
+        raise ValueError(f"Unknown quantizer: {name} (choose from {', '.join(QUANTIZERS)})")
+    return QUANTIZERS[name]
+
+
+def exif_thumbnail(img, size=ANALYSIS_SIZE):
+    """
+    The JPEG thumbnail embedded in a photo's EXIF data, or None
+    Only used when it covers at least half the pixels of size and has the
+    photo's aspect ratio (letterboxed thumbnails would add black bars)
     """
     try:
-        img = Image.open(image_path)
+        ifd1 = img.getexif().get_ifd(ExifTags.IFD.IFD1)
+        offset = ifd1.get(EXIF_THUMBNAIL_OFFSET)
+        length = ifd1.get(EXIF_THUMBNAIL_LENGTH)
+        raw = img.info.get('exif', b'')
+        if not offset or not length or not raw.startswith(b'Exif\x00\x00'):
+            return None
+        # Offsets count from the TIFF header, after the 6-byte Exif marker
+        thumb = Image.open(io.BytesIO(raw[6 + offset:6 + offset + length]))
+        thumb.load()
+    except Exception:
+        return None
+
+    (tw, th), (w, h) = thumb.size, img.size
+    if tw * th < size[0] * size[1] / 2:
+        return None
+    if abs(tw / th - w / h) > 0.03 * (w / h):
+        return None
+    return thumb
 
-        # Resize for faster processing
-        img = img.resize((150, 150))
 
-        # Convert to RGB if needed
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
+def load_image(image_path, size=ANALYSIS_SIZE, use_thumbnail=True):
+    """
+    Open a photo at the resolution color extraction needs, as RGB at size
 
-        # Get pixel data
-        pixels = np.array(img).reshape(-1, 3)
+    JPEGs never get a full decode: the EXIF thumbnail is used when it is good
+    enough, otherwise the decoder scales down in the DCT (draft mode, 1/2 to
+    1/8) to the smallest image still at least size.
+    """
+    img = Image.open(image_path)
+
+    if img.format == 'JPEG':
+        thumb = exif_thumbnail(img, size) if use_thumbnail else None
+        if thumb is not None:
+            img = thumb
+        else:
+            img.draft('RGB', size)
+
+    # Resize for faster processing
+    img = img.resize(size)
+
+    # Convert to RGB if needed
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    return img
+
+
+def _load_or_none(image_path, **options):
+    try:
+        return load_image(image_path, **options)
+    except Exception:
+        return None
+
+
+def iter_loaded_images(paths, workers=DECODE_WORKERS, max_pending=MAX_DECODED, **options):
+    """
+    Yield (path, image) in input order while a thread pool decodes ahead
+    (PIL releases the GIL while decoding). At most max_pending images are
+    in flight or waiting, which bounds memory; unreadable photos yield None.
+    """
+    paths = iter(paths)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
 
-        # Use k-means to find dominant colors (more clusters for better filtering)
-        kmeans = KMeans(n_clusters=n_colors, random_state=42, n_init=10)
-        kmeans.fit(pixels)
+        def submit_next():
+            path = next(paths, None)
+            if path is not None:
+                pending.append((path, pool.submit(_load_or_none, path, **options)))
 
-        colors = kmeans.cluster_centers_
-        labels = kmeans.labels_
+        for _ in range(max(1, max_pending)):
+            submit_next()
+
+        while pending:
+            path, future = pending.popleft()
+            image = future.result()
+            submit_next()
+            yield path, image
+
+
+def palette_cache_params(n_colors, quantizer):
+    """Feature cache parameters for one photo's palette"""
+    return {'n_colors': n_colors, 'quantizer': quantizer, 'size': list(ANALYSIS_SIZE)}
+
+
+def extract_dominant_colors(image_path, n_colors=8, quantizer=DEFAULT_QUANTIZER, use_cache=True):
+    """Extract dominant colors from an image by color quantization.
+    Uses 8 initial clusters and filters near-black/near-white for better results.
+    quantizer picks the algorithm (see QUANTIZERS); all return the same structure.
+    Results are served from / stored in the shared feature cache unless use_cache=False.
+    """
+    params = palette_cache_params(n_colors, quantizer)
+    if use_cache:
+        cached = feature_cache.get_cached(image_path, 'visual_dna', ANALYZER_VERSION, params)
+        if cached is not None:
+            return cached
+
+    try:
+        img = load_image(image_path)
+    except Exception:
+        return None
+    colors = extract_image_colors(img, n_colors, quantizer)
+
+    if use_cache:
+        feature_cache.put_cached(image_path, 'visual_dna', ANALYZER_VERSION, params, colors)
+    return colors
+
+
+def extract_image_colors(img, n_colors=8, quantizer=DEFAULT_QUANTIZER):
+    """extract_dominant_colors for an image already loaded by load_image"""
+    quantize = get_quantizer(quantizer)
+
+    try:
+        # Find dominant colors (more clusters than needed for better filtering)
+        colors, labels = quantize(img, n_colors)
 
         # Count occurrences to get dominance
-        counts = Counter(labels)
+        # (ties keep the order clusters first appear in)
+        present, first = np.unique(labels, return_index=True)
+        counts = np.bincount(labels, minlength=len(colors))
+        present = present[np.argsort(first, kind='stable')]
+        order = present[np.argsort(-counts[present], kind='stable')]
+        rgbs = colors[order]
 
         # Build color list
-        all_cluster_colors = []
-        for i in sorted(counts, key=counts.get, reverse=True):
-            rgb = colors[i]
-            all_cluster_colors.append({
+        all_cluster_colors = [
+            {
                 'rgb': rgb.tolist(),
                 'hex': rgb_to_hex(rgb),
-                'name': get_color_name(rgb),
+                'name': name,
                 'percentage': (counts[i] / len(labels)) * 100
-            })
+            }
+            for i, rgb, name in zip(order, rgbs, color_names(rgbs))
+        ]
 
         # Filter near-black and near-white
-        filtered = [c for c in all_cluster_colors
-                     if not is_near_black(c['rgb']) and not is_near_white(c['rgb'])]
+        keep = ~near_black_mask(rgbs) & ~near_white_mask(rgbs)
+        filtered = [c for c, k in zip(all_cluster_colors, keep) if k]
 
         # If all colors were filtered (very dark photo), relax threshold
         if len(filtered) < 2:
-            filtered = [c for c in all_cluster_colors
-                         if not is_near_black(c['rgb'], threshold=0.12)]
+            keep = ~near_black_mask(rgbs, threshold=0.12)
+            filtered = [c for c, k in zip(all_cluster_colors, keep) if k]
 
         # If still empty, take the brightest cluster(s)
         if not filtered:
-            by_brightness = sorted(all_cluster_colors,
-                                    key=lambda c: colorsys.rgb_to_hsv(c['rgb'][0]/255, c['rgb'][1]/255, c['rgb'][2]/255)[2],
-                                    reverse=True)
-            filtered = by_brightness[:3]
+            _, _, v = rgb_to_hsv_array(rgbs)
+            filtered = [all_cluster_colors[i] for i in np.argsort(-v, kind='stable')[:3]]
 
         return filtered[:5]
 
@@ -207,70 +451,271 @@ def extract_dominant_colors(image_path, n_colors=8):
         return None
 
 
-def analyze_photo_collection(photos_data):
+def aggregate_colors(colors, space='rgb'):
+    """
+    Pool per-photo palette colors into collection colors, heaviest first:
+    drop near-blacks, sum weights of identical hex codes, then merge
+    colors closer than MERGE_DISTANCES[space]
+    """
+    if not colors:
+        return []
+
+    rgbs = np.array([c['rgb'] for c in colors], dtype=np.float64)
+    weights = np.array([c['weight'] for c in colors], dtype=np.float64)
+
+    # Filter near-black from aggregated pool before deduplication
+    keep = np.flatnonzero(~near_black_mask(rgbs))
+    if not len(keep):
+        return []
+
+    # Aggregate colors by hex, keeping each hex's first occurrence
+    hexes = np.array([colors[i]['hex'] for i in keep])
+    _, first, group = np.unique(hexes, return_index=True, return_inverse=True)
+    totals = np.bincount(group.ravel(), weights=weights[keep])
+
+    # Sort by weight; ties stay in order of first appearance
+    by_appearance = np.argsort(first, kind='stable')
+    ranked = by_appearance[np.argsort(-totals[by_appearance], kind='stable')]
+    sorted_colors = [{**colors[keep[first[g]]], 'weight': float(totals[g])} for g in ranked]
+
+    # Deduplicate similar colors
+    return deduplicate_colors(sorted_colors, space=space)
+
+
+def per_photo_colors(photos, quantizer=DEFAULT_QUANTIZER, decode_workers=DECODE_WORKERS, use_cache=True):
+    """
+    Every photo's own palette, weighted by photo score
+    Palettes of unchanged photos come from the cache; only the rest are decoded
+    Returns (colors, number of photos that yielded a palette)
+    """
+    params = palette_cache_params(8, quantizer)
+    palettes = {}
+    if use_cache:
+        for photo in photos:
+            palettes[photo['path']] = feature_cache.get_cached(photo['path'], 'visual_dna', ANALYZER_VERSION, params)
+
+    missing = list(dict.fromkeys(p['path'] for p in photos if palettes.get(p['path']) is None))
+    for path, img in iter_loaded_images(missing, workers=decode_workers):
+        colors = extract_image_colors(img, n_colors=8, quantizer=quantizer) if img is not None else None
+        if use_cache:
+            feature_cache.put_cached(path, 'visual_dna', ANALYZER_VERSION, params, colors)
+        palettes[path] = colors
+
+    all_colors = []
+    analyzed = 0
+    for photo in photos:
+        colors = palettes[photo['path']]
+        if colors:
+            analyzed += 1
+            # Weight colors by photo score
+            score_weight = photo.get('score', 50) / 100
+            for color in colors:
+                all_colors.append({
+                    **color,
+                    'weight': color['percentage'] * score_weight
+                })
+    return all_colors, analyzed
+
+
+def sample_pixels(img, path, count=POOLED_PIXELS_PER_PHOTO):
+    """
+    Up to count pixels of a loaded photo, picked by an RNG seeded from its
+    path: a photo contributes the same pixels on every refresh, and adding
+    photos doesn't reshuffle the others' samples
+    """
+    pixels = np.asarray(img, dtype=np.float64).reshape(-1, 3)
+    if len(pixels) <= count:
+        return pixels
+    rng = np.random.default_rng(zlib.crc32(str(path).encode('utf-8')))
+    return pixels[np.sort(rng.choice(len(pixels), count, replace=False))]
+
+
+def palette_rgb(palette):
+    """Palette given as hex codes or colorPalette entries -> (k, 3) RGB array"""
+    hexes = [c['hex'] if isinstance(c, dict) else c for c in palette or []]
+    return np.array([[int(h.lstrip('#')[i:i + 2], 16) for i in (0, 2, 4)] for h in hexes],
+                    dtype=np.float64).reshape(-1, 3)
+
+
+def warm_start_centers(pixels, weights, previous, n_clusters, seed=42):
+    """
+    Initial centers for the pooled clustering: the previous palette, topped
+    up k-means++ style (new centers drawn with probability proportional to
+    weighted squared distance from the centers so far)
+    """
+    # Drop repeated colors but keep the palette's (weight) order, so a
+    # truncated palette keeps its dominant colors
+    _, first = np.unique(previous, axis=0, return_index=True)
+    centers = list(previous[np.sort(first)][:n_clusters])
+    rng = np.random.default_rng(seed)
+    dist = np.min([((pixels - c) ** 2).sum(axis=1) for c in centers], axis=0)
+
+    while len(centers) < n_clusters:
+        p = dist * weights
+        if p.sum() <= 0:
+            break
+        center = pixels[rng.choice(len(pixels), p=p / p.sum())]
+        centers.append(center)
+        dist = np.minimum(dist, ((pixels - center) ** 2).sum(axis=1))
+
+    return np.array(centers)
+
+
+def pooled_pixel_samples(photos, decode_workers=DECODE_WORKERS, use_cache=True):
+    """
+    sample_pixels of every photo, as {path: (n, 3) array, or None if unreadable}
+    Samples of unchanged photos come from the cache; only the rest are decoded
+    """
+    params = {'pixels': POOLED_PIXELS_PER_PHOTO, 'size': list(ANALYSIS_SIZE)}
+    samples = {}
+    if use_cache:
+        for photo in photos:
+            cached = feature_cache.get_cached(photo['path'], 'visual_dna_pixels', ANALYZER_VERSION, params)
+            if cached is not None:
+                samples[photo['path']] = np.frombuffer(bytes.fromhex(cached), dtype=np.uint8).reshape(-1, 3)
+
+    missing = list(dict.fromkeys(p['path'] for p in photos if p['path'] not in samples))
+    for path, img in iter_loaded_images(missing, workers=decode_workers):
+        pixels = sample_pixels(img, path).astype(np.uint8) if img is not None else None
+        if use_cache and pixels is not None:
+            feature_cache.put_cached(path, 'visual_dna_pixels', ANALYZER_VERSION, params, pixels.tobytes().hex())
+        samples[path] = pixels
+    return samples
+
+
+def pooled_photo_colors(photos, quantizer=DEFAULT_QUANTIZER, decode_workers=DECODE_WORKERS, use_cache=True,
+                        previous_palette=None, n_clusters=POOLED_CLUSTERS):
+    """
+    One weighted k-means over pixels sampled from every photo, instead of a
+    clustering per photo. Each photo's sample weighs score / 100 in total,
+    so cluster weights are on the same scale as per_photo_colors.
+    quantizer picks full ('kmeans') or mini-batch ('minibatch') k-means;
+    pixel samples are cached per photo unless use_cache=False.
+    Starting from previous_palette keeps the clusters (and the palette) from
+    jittering between refreshes.
+    Returns (colors, number of photos sampled)
+    """
+    if quantizer not in POOLED_QUANTIZERS:
+        raise ValueError(f"Pooled mode clusters with {' or '.join(POOLED_QUANTIZERS)}, not {quantizer}")
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+
+    samples, sample_weights = [], []
+    pixel_samples = pooled_pixel_samples(photos, decode_workers=decode_workers, use_cache=use_cache)
+    for photo in photos:
+        pixels = pixel_samples[photo['path']]
+        if pixels is None:
+            continue
+        pixels = pixels.astype(np.float64)
+        samples.append(pixels)
+        sample_weights.append(np.full(len(pixels), photo.get('score', 50) / 100 / len(pixels)))
+
+    if not samples:
+        return [], 0
+    pixels = np.concatenate(samples)
+    weights = np.concatenate(sample_weights)
+    if weights.sum() <= 0:
+        weights = np.ones_like(weights)
+
+    n_clusters = min(n_clusters, len(np.unique(pixels, axis=0)))
+    previous = palette_rgb(previous_palette)
+    if len(previous):
+        init = warm_start_centers(pixels, weights, previous, n_clusters)
+        n_clusters, n_init = len(init), 1
+    else:
+        init, n_init = 'k-means++', 10
+    if quantizer == 'minibatch':
+        kmeans = MiniBatchKMeans(n_clusters=n_clusters, init=init, n_init=1, batch_size=2048, random_state=42)
+    else:
+        kmeans = KMeans(n_clusters=n_clusters, init=init, n_init=n_init, random_state=42)
+    kmeans.fit(pixels, sample_weight=weights)
+
+    centers = kmeans.cluster_centers_
+    cluster_weights = np.bincount(kmeans.labels_, weights=weights, minlength=len(centers)) * 100
+    present = np.flatnonzero(cluster_weights > 0)
+    centers, cluster_weights = centers[present], cluster_weights[present]
+
+    # Near-blacks are dropped when the colors are aggregated; drop near-whites here,
+    # as per-photo extraction does
+    keep = ~near_white_mask(centers)
+    if keep.any():
+        centers, cluster_weights = centers[keep], cluster_weights[keep]
+
+    total = cluster_weights.sum()
+    colors = [
+        {
+            'rgb': rgb.tolist(),
+            'hex': rgb_to_hex(rgb),
+            'name': name,
+            'percentage': float(w / total * 100),
+            'weight': float(w)
+        }
+        for rgb, name, w in zip(centers, color_names(centers), cluster_weights)
+    ]
+    return colors, len(samples)
+
+
+def palette_entries(top_colors):
+    """colorPalette output: hex, name, weight and share of the palette's weight"""
+    total_weight = sum(c['weight'] for c in top_colors) or 1
+    return [
+        {
+            'hex': c['hex'],
+            'name': c['name'],
+            'weight': round(c['weight'], 2),
+            'percentage': round(c['weight'] / total_weight * 100, 1)
+        }
+        for c in top_colors
+    ]
+
+
+def analyze_photo_collection(photos_data, quantizer=DEFAULT_QUANTIZER, decode_workers=DECODE_WORKERS,
+                             color_space='rgb', use_cache=True, mode='per_photo', previous_palette=None):
     """
     Analyze entire photo collection to extract visual DNA
 
     Args:
         photos_data: List of dicts with 'path', 'score', 'tags'
+        quantizer: Color quantizer for each photo (see QUANTIZERS); pooled
+            mode takes one of POOLED_QUANTIZERS
+        decode_workers: Threads decoding photos ahead of color extraction
+        color_space: 'rgb' or 'lab' (perceptual) distance for merging similar colors
+        use_cache: Reuse per-photo palettes (pooled mode: pixel samples) from
+            the feature cache; only photos without one are decoded
+        mode: 'per_photo' clusters each photo and merges the palettes;
+            'pooled' fits one clustering over a pixel sample from all photos
+        previous_palette: pooled mode only - the last colorPalette (or its hex
+            codes), used as the starting centers so refreshes stay stable
 
     Returns:
         Visual DNA profile with colors, style, aesthetic
     """
 
-    # Extract colors from top-rated photos
-    all_colors = []
+    color_coordinates([], color_space)  # reject an unknown space before decoding anything
+
+    if mode not in PALETTE_MODES:
+        raise ValueError(f"Unknown palette mode: {mode} (choose from {', '.join(PALETTE_MODES)})")
+
     style_tags = []
 
     # Prioritize highly-rated photos
     top_photos = sorted(photos_data, key=lambda p: p.get('score', 0), reverse=True)[:30]
 
-    for photo in top_photos:
-        path = photo.get('path')
-        if not path or not Path(path).exists():
-            continue
+    readable = [p for p in top_photos if p.get('path') and Path(p['path']).exists()]
 
-        colors = extract_dominant_colors(path, n_colors=8)
-        if colors:
-            # Weight colors by photo score
-            score_weight = photo.get('score', 50) / 100
-            for color in colors:
-                all_colors.append({
-                    **color,
-                    'weight': color['percentage'] * score_weight
-                })
+    if mode == 'pooled':
+        all_colors, _ = pooled_photo_colors(readable, quantizer=quantizer, decode_workers=decode_workers,
+                                            use_cache=use_cache, previous_palette=previous_palette)
+    else:
+        all_colors, _ = per_photo_colors(readable, quantizer=quantizer, decode_workers=decode_workers,
+                                         use_cache=use_cache)
 
-        # Collect style tags
+    # Collect style tags
+    for photo in readable:
         tags = photo.get('tags', [])
         if tags:
             style_tags.extend(tags)
 
-    # Filter near-black from aggregated pool before deduplication
-    all_colors = [c for c in all_colors if not is_near_black(c['rgb'])]
-
-    # If too few colors after filtering, relax threshold
-    if len(all_colors) < 5:
-        # Re-run without filter — use original extraction which already filtered per-image
-        pass  # all_colors already has per-image filtering applied
-
-    # Aggregate colors by hex
-    color_aggregation = {}
-    for color in all_colors:
-        hex_code = color['hex']
-        if hex_code in color_aggregation:
-            color_aggregation[hex_code]['weight'] += color['weight']
-        else:
-            color_aggregation[hex_code] = {**color}
-
-    # Sort by weight
-    sorted_colors = sorted(
-        color_aggregation.values(),
-        key=lambda c: c['weight'],
-        reverse=True
-    )
-
-    # Deduplicate similar colors
-    sorted_colors = deduplicate_colors(sorted_colors, min_distance=30)
+    sorted_colors = aggregate_colors(all_colors, space=color_space)
 
     # Get top 5
     top_colors = sorted_colors[:5]
@@ -285,18 +730,9 @@ def analyze_photo_collection(photos_data):
     # Generate sophisticated style description
     style_description = generate_style_description(top_tags, palette_description, top_photos, top_colors)
 
-    total_weight = sum(c['weight'] for c in top_colors) or 1
     return {
         'styleDescription': style_description,
-        'colorPalette': [
-            {
-                'hex': c['hex'],
-                'name': c['name'],
-                'weight': round(c['weight'], 2),
-                'percentage': round(c['weight'] / total_weight * 100, 1)
-            }
-            for c in top_colors
-        ],
+        'colorPalette': palette_entries(top_colors),
         'paletteCharacteristics': palette_description,
         'dominantThemes': top_tags,
         'totalAnalyzed': len(photos_data),
@@ -305,6 +741,147 @@ def analyze_photo_collection(photos_data):
     }
 
 
+def iter_photos_file(path):
+    """
+    Photo dicts from a JSON array file, or lazily line by line from an NDJSON
+    file (one {"path", "score", "tags"} per line) so huge libraries are never
+    held in memory
+    """
+    with open(path, 'r') as f:
+        first = f.read(1)
+        while first.isspace():
+            first = f.read(1)
+        f.seek(0)
+
+        if first == '[':
+            yield from json.load(f)
+            return
+
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                print(f"Skipping malformed photo on line {line_number}", file=sys.stderr)
+
+
+class PhotoReservoir:
+    """
+    Score-weighted reservoir sample of a photo stream (Efraimidis-Spirakis
+    A-Res), plus running library statistics
+
+    Each photo gets the key log(u) / weight and the sample keeps the largest
+    keys, so a photo's chance of being kept grows with its score. u is
+    derived from the path, not drawn at random: the same library always
+    yields the same sample, and new photos only displace others when they
+    outrank them. Memory is bounded by the sample size and the tag vocabulary.
+    """
+
+    def __init__(self, size=STREAM_SAMPLE_SIZE):
+        self.size = size
+        self.heap = []  # (key, order, photo); heap[0] is the first to be displaced
+        self.sampled_paths = set()
+        self.seen = 0
+        self.high_rated = 0
+        self.score_total = 0.0
+        self.tag_counts = Counter()
+
+    def add(self, photo):
+        if not isinstance(photo, dict):
+            return
+        self.seen += 1
+        score = photo.get('score', 0) or 0
+        self.score_total += score
+        if score >= 80:
+            self.high_rated += 1
+        self.tag_counts.update(photo.get('tags') or [])
+
+        path = photo.get('path')
+        if not path or self.size <= 0 or path in self.sampled_paths:
+            return
+        u = (zlib.crc32(str(path).encode('utf-8')) + 0.5) / 2 ** 32
+        key = math.log(u) / max(score, 1)
+        entry = (key, self.seen, {'path': path, 'score': score})
+        if len(self.heap) < self.size:
+            heapq.heappush(self.heap, entry)
+        elif key > self.heap[0][0]:
+            self.sampled_paths.discard(heapq.heapreplace(self.heap, entry)[2]['path'])
+        else:
+            return
+        self.sampled_paths.add(path)
+
+    def sample(self):
+        """Sampled photos, highest score first"""
+        return sorted((photo for _, _, photo in self.heap), key=lambda p: p['score'], reverse=True)
+
+    @property
+    def mean_score(self):
+        return self.score_total / self.seen if self.seen else 0.0
+
+
+def stream_photo_collection(photos, sample_size=STREAM_SAMPLE_SIZE, quantizer=DEFAULT_QUANTIZER,
+                            decode_workers=DECODE_WORKERS, color_space='rgb', use_cache=True,
+                            mode='per_photo', previous_palette=None):
+    """
+    Visual DNA of a whole library in bounded memory and predictable time
+
+    Args:
+        photos: Iterable of photo dicts with 'path', 'score', 'tags' (e.g.
+            iter_photos_file); consumed once
+        sample_size: Photos kept in the score-weighted sample whose colors
+            are extracted; bounds the decoding work whatever the library size
+        Other options as analyze_photo_collection
+
+    Tags, rating counts and the average score cover every photo in the
+    stream. The palette is extracted once, from the final sample: photos
+    are only decoded if they are still sampled at the end, so decoding is
+    bounded by sample_size rather than by how often the sample changed.
+    Confidence reflects how many photos actually yielded colors.
+    """
+    if mode not in PALETTE_MODES:
+        raise ValueError(f"Unknown palette mode: {mode} (choose from {', '.join(PALETTE_MODES)})")
+    color_coordinates([], color_space)
+
+    reservoir = PhotoReservoir(sample_size)
+    for photo in photos:
+        reservoir.add(photo)
+
+    sample = reservoir.sample()
+    readable = [p for p in sample if Path(p['path']).exists()]
+
+    # Sampling already favours high scores; weight the sampled photos
+    # equally so scores aren't counted twice
+    equal = [{**p, 'score': 100} for p in readable]
+    if mode == 'pooled':
+        all_colors, analyzed = pooled_photo_colors(equal, quantizer=quantizer, decode_workers=decode_workers,
+                                                   use_cache=use_cache, previous_palette=previous_palette)
+    else:
+        all_colors, analyzed = per_photo_colors(equal, quantizer=quantizer, decode_workers=decode_workers,
+                                                use_cache=use_cache)
+
+    top_colors = aggregate_colors(all_colors, space=color_space)[:5]
+    palette_description = describe_color_palette(top_colors)
+    top_tags = [tag for tag, _ in reservoir.tag_counts.most_common(5)]
+    # The sample is biased towards high scores; describe the whole stream's average
+    style_description = generate_style_description(top_tags, palette_description, sample, top_colors,
+                                                   avg_score=reservoir.mean_score)
+
+    return {
+        'styleDescription': style_description,
+        'colorPalette': palette_entries(top_colors),
+        'paletteCharacteristics': palette_description,
+        'dominantThemes': top_tags,
+        'totalAnalyzed': reservoir.seen,
+        'highRatedCount': reservoir.high_rated,
+        'averageScore': round(reservoir.mean_score, 1),
+        'sampledPhotos': len(sample),
+        'analyzedPhotos': analyzed,
+        'coverage': round(analyzed / reservoir.seen, 4) if reservoir.seen else 0.0,
+        'confidence': min(analyzed / FULL_CONFIDENCE_PHOTOS, 1.0)
+    }
+
+
 def describe_color_palette(colors):
     """Generate sophisticated description of color palette"""
     if not colors:
@@ -377,14 +954,16 @@ def describe_color_palette(colors):
     }
 
 
-def generate_style_description(tags, palette_info, photos, top_colors):
+def generate_style_description(tags, palette_info, photos, top_colors, avg_score=None):
     """
     Generate marketing-grade style description using actual color data
     and photo characteristics.
+    avg_score overrides the average score of photos (e.g. when photos is a sample)
     """
 
     # Calculate average score
-    avg_score = sum(p.get('score', 50) for p in photos) / len(photos) if photos else 50
+    if avg_score is None:
+        avg_score = sum(p.get('score', 50) for p in photos) / len(photos) if photos else 50
 
     parts = []
 
@@ -458,17 +1037,46 @@ def generate_style_description(tags, palette_info, photos, top_colors):
 
 def main():
     parser = argparse.ArgumentParser(description='Analyze visual DNA from photo collection')
-    parser.add_argument('photos_json', help='JSON file with photo data')
+    parser.add_argument('photos_json', help='JSON file with photo data (NDJSON also accepted with --stream)')
     parser.add_argument('--json', action='store_true', help='Output JSON')
+    parser.add_argument('--quantizer', choices=list(QUANTIZERS), default=DEFAULT_QUANTIZER,
+                        help=f'Color quantizer (default: {DEFAULT_QUANTIZER}; mediancut is fastest)')
+    parser.add_argument('--decode-workers', type=int, default=DECODE_WORKERS,
+                        help=f'Threads decoding photos ahead of color extraction (default: {DECODE_WORKERS})')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the shared feature cache')
+    parser.add_argument('--mode', choices=PALETTE_MODES, default='per_photo',
+                        help='per_photo: cluster each photo, then merge; pooled: one clustering over '
+                             'pixels sampled from all photos (default: per_photo)')
+    parser.add_argument('--previous-palette',
+                        help='Comma-separated hex codes of the last palette (pooled mode starts from them)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Whole-library mode: read photos lazily and analyze a score-weighted sample')
+    parser.add_argument('--sample-size', type=int, default=STREAM_SAMPLE_SIZE,
+                        help=f'Photos sampled in --stream mode (default: {STREAM_SAMPLE_SIZE})')
+    parser.add_argument('--color-space', choices=list(MERGE_DISTANCES), default='rgb',
+                        help='Distance used to merge similar palette colors (default: rgb; lab is perceptual)')
 
     args = parser.parse_args()
 
-    # Load photo data
-    with open(args.photos_json, 'r') as f:
-        photos_data = json.load(f)
+    options = dict(
+        quantizer=args.quantizer,
+        decode_workers=args.decode_workers,
+        color_space=args.color_space,
+        use_cache=not args.no_cache,
+        mode=args.mode,
+        previous_palette=args.previous_palette.split(',') if args.previous_palette else None
+    )
+
+    if args.stream:
+        result = stream_photo_collection(iter_photos_file(args.photos_json), sample_size=args.sample_size,
+                                         **options)
+    else:
+        # Load photo data
+        with open(args.photos_json, 'r') as f:
+            photos_data = json.load(f)
 
-    # Analyze
-    result = analyze_photo_collection(photos_data)
+        # Analyze
+        result = analyze_photo_collection(photos_data, **options)
 
     if args.json:
         print(json.dumps(result, indent=2))
@@ -5,6 +5,7 @@ const Database = require('better-sqlite3');
 const path = require('path');
 const fs = require('fs');
 const os = require('os');
+const readline = require('readline');
 const { spawn } = require('child_process');
 
 const dbPath = path.join(__dirname, '../../starforge_audio.db');
@@ -14,21 +15,32 @@ const upload = multer({ dest: 'uploads/audio/' });
 const batchJobs = new Map();
 
 /**
- * Run parallel Python batch analyzer
+ * Run parallel Python batch analyzer in streaming mode
+ * onResult(trackId, analysis) is called as each track finishes, so results
+ * can be persisted immediately instead of after the whole batch.
  */
-async function runParallelAnalysis(tracksData) {
+async function runParallelAnalysis(tracksData, onResult) {
   return new Promise((resolve, reject) => {
     const tempFile = path.join(os.tmpdir(), `tracks_${Date.now()}.json`);
     fs.writeFileSync(tempFile, JSON.stringify(tracksData, null, 2));
 
     const pythonScript = path.join(__dirname, '../python/batch_analyzer.py');
-    const python = spawn('python3', [pythonScript, tempFile]);
+    // Bulk imports can trade fidelity for speed (fast | standard | full)
+    const tier = process.env.AUDIO_BATCH_TIER || 'full';
+    const python = spawn('python3', [pythonScript, tempFile, '--stream', '--tier', tier]);
 
-    let output = '';
     let error = '';
+    let received = 0;
 
-    python.stdout.on('data', (data) => {
-      output += data.toString();
+    readline.createInterface({ input: python.stdout }).on('line', (line) => {
+      if (!line.trim()) return;
+      try {
+        const { id, result } = JSON.parse(line);
+        received++;
+        onResult(id, result);
+      } catch (e) {
+        console.error(`Failed to handle batch result line: ${e.message}`);
+      }
     });
 
     python.stderr.on('data', (data) => {
@@ -41,11 +53,7 @@ async function runParallelAnalysis(tracksData) {
       if (code !== 0) {
         reject(new Error(`Batch analysis failed: ${error}`));
       } else {
-        try {
-          resolve(JSON.parse(output));
-        } catch (e) {
-          reject(new Error(`Failed to parse JSON: ${output}`));
-        }
+        resolve(received);
       }
     });
   });
@@ -100,22 +108,15 @@ async function processFilesInBackground(jobId, files, userId) {
 
     console.log(`[${jobId}] Starting parallel analysis of ${files.length} files...`);
 
-    // Run parallel analysis
-    const results = await runParallelAnalysis(tracksData);
-
-    console.log(`[${jobId}] Analysis complete, storing in database...`);
-
-    // Store results in database
-    for (const trackData of tracksData) {
-      const analysis = results[trackData.id];
-
+    // Store each result in the database as soon as it arrives
+    const storeResult = (trackData, analysis) => {
       if (!analysis || analysis.error) {
         job.errors.push({
           filename: trackData.originalName,
           error: analysis?.error || 'Analysis failed'
         });
         job.processed++;
-        continue;
+        return;
       }
 
       try {
@@ -162,6 +163,21 @@ async function processFilesInBackground(jobId, files, userId) {
       }
 
       job.processed++;
+    };
+
+    const tracksById = new Map(tracksData.map(t => [t.id, t]));
+
+    // Run parallel analysis (streamed: one result per finished track)
+    await runParallelAnalysis(tracksData, (trackId, analysis) => {
+      const trackData = tracksById.get(trackId);
+      if (!trackData) return;
+      tracksById.delete(trackId);
+      storeResult(trackData, analysis);
+    });
+
+    // Anything the analyzer never reported counts as failed
+    for (const trackData of tracksById.values()) {
+      storeResult(trackData, null);
     }
 
     // Mark job complete
@@ -267,15 +283,12 @@ async function refreshAnalyticsInBackground(jobId, tracks) {
 
     console.log(`[${jobId}] Refreshing analytics for ${tracks.length} tracks...`);
 
-    const results = await runParallelAnalysis(tracksData);
-
-    for (const track of tracks) {
-      const analysis = results[track.id];
-
+    // Update each track as soon as its result arrives
+    const updateResult = (track, analysis) => {
       if (!analysis || analysis.error) {
         job.errors.push({ filename: track.filename, error: analysis?.error || 'Analysis failed' });
         job.processed++;
-        continue;
+        return;
       }
 
       // Update database (keep existing BPM)
@@ -300,6 +313,20 @@ async function refreshAnalyticsInBackground(jobId, tracks) {
       });
 
       job.processed++;
+    };
+
+    const tracksById = new Map(tracks.map(t => [t.id, t]));
+
+    await runParallelAnalysis(tracksData, (trackId, analysis) => {
+      const track = tracksById.get(trackId);
+      if (!track) return;
+      tracksById.delete(trackId);
+      updateResult(track, analysis);
+    });
+
+    // Anything the analyzer never reported counts as failed
+    for (const track of tracksById.values()) {
+      updateResult(track, null);
     }
 
     job.status = 'completed';
@@ -0,0 +1,181 @@
+const path = require('path');
+const readline = require('readline');
+const { spawn } = require('child_process');
+
+// Errors meaning the worker could not answer at all (as opposed to an analysis
+// error it reported); only these justify retrying in a one-off process
+const TRANSPORT_ERRORS = new Set(['WORKER_DISABLED', 'WORKER_EXITED', 'WORKER_TIMEOUT']);
+
+function workerError(message, code) {
+  const error = new Error(message);
+  error.code = code;
+  return error;
+}
+
+/**
+ * Persistent Python Analysis Worker
+ * Keeps one long-lived analysis_server.py process (librosa, sklearn etc. already
+ * imported) and sends it newline-delimited JSON requests, instead of spawning a
+ * fresh interpreter per file.
+ *
+ * Set ANALYSIS_WORKER=off to disable; callers then fall back to per-call spawn.
+ * Callers should fall back only when isUnavailable(error) - an analysis error
+ * reported by the worker would fail the same way in a fresh process. A timed
+ * out request restarts the worker, so the abandoned analysis stops with it.
+ */
+class AnalysisWorkerService {
+  constructor() {
+    this.serverScript = path.join(__dirname, '../python/analysis_server.py');
+    this.enabled = process.env.ANALYSIS_WORKER !== 'off';
+    this.concurrency = parseInt(process.env.ANALYSIS_WORKER_CONCURRENCY, 10) || 2;
+    this.process = null;
+    this.pending = new Map();
+    this.nextId = 1;
+  }
+
+  /**
+   * Start the worker process on first use
+   */
+  start() {
+    if (this.process) return this.process;
+
+    const python = spawn('python3', [this.serverScript, '--workers', String(this.concurrency)], {
+      stdio: ['pipe', 'pipe', 'pipe']
+    });
+
+    readline.createInterface({ input: python.stdout }).on('line', (line) => {
+      this.handleResponse(line);
+    });
+
+    // Writes to a dying worker surface through 'close'
+    python.stdin.on('error', () => {});
+
+    python.stderr.on('data', (data) => {
+      const msg = data.toString().trim();
+      if (msg) console.warn(`[analysis-worker] ${msg}`);
+    });
+
+    python.on('error', (error) => {
+      this.failAll(python, workerError(`Analysis worker failed to start: ${error.message}`, 'WORKER_EXITED'));
+      if (this.process === python) this.process = null;
+    });
+
+    python.on('close', (code) => {
+      this.failAll(python, workerError(`Analysis worker exited (code ${code})`, 'WORKER_EXITED'));
+      if (this.process === python) this.process = null;
+    });
+
+    this.process = python;
+    console.log(`Analysis worker started (pid ${python.pid})`);
+    return python;
+  }
+
+  handleResponse(line) {
+    let message;
+    try {
+      message = JSON.parse(line);
+    } catch (e) {
+      console.warn('[analysis-worker] Unparseable response:', line);
+      return;
+    }
+
+    const entry = this.pending.get(message.id);
+    if (!entry) return;
+
+    this.pending.delete(message.id);
+    clearTimeout(entry.timer);
+
+    if (message.error !== undefined) {
+      entry.reject(new Error(message.error));
+    } else {
+      entry.resolve(message.result);
+    }
+  }
+
+  /**
+   * Reject every request still waiting on the given worker process
+   */
+  failAll(python, error) {
+    for (const [id, entry] of this.pending) {
+      if (entry.process !== python) continue;
+      this.pending.delete(id);
+      clearTimeout(entry.timer);
+      entry.reject(error);
+    }
+  }
+
+  /**
+   * Kill the worker and let the next request start a fresh one
+   * SIGKILL, not SIGTERM: a graceful shutdown would wait for the very
+   * analysis that timed out. Its other in-flight requests fail as WORKER_EXITED.
+   */
+  restart(reason) {
+    const python = this.process;
+    if (!python) return;
+
+    console.warn(`[analysis-worker] Restarting worker: ${reason}`);
+    this.process = null;
+    this.failAll(python, workerError(`Analysis worker restarted: ${reason}`, 'WORKER_EXITED'));
+    python.kill('SIGKILL');
+  }
+
+  /**
+   * True when a request failed because the worker was unavailable (disabled,
+   * exited or timed out) rather than because the analysis itself failed
+   */
+  isUnavailable(error) {
+    return !!error && TRANSPORT_ERRORS.has(error.code);
+  }
+
+  /**
+   * Send one request to the worker
+   * @param {string} method - analyze_audio | analyze_track_collection | analyze_photo_collection
+   * @param {Object} params - Method parameters
+   * @param {Object} options - { timeout } in milliseconds
+   */
+  request(method, params = {}, options = {}) {
+    if (!this.enabled) {
+      return Promise.reject(workerError('Analysis worker disabled', 'WORKER_DISABLED'));
+    }
+
+    const python = this.start();
+    const id = `req_${this.nextId++}`;
+
+    return new Promise((resolve, reject) => {
+      const entry = { resolve, reject, timer: null, process: python };
+
+      if (options.timeout) {
+        entry.timer = setTimeout(() => {
+          this.pending.delete(id);
+          reject(workerError(`Analysis worker request timed out after ${options.timeout}ms`, 'WORKER_TIMEOUT'));
+          // The Python thread keeps running otherwise, alongside any fallback
+          if (this.process === python) this.restart(`${method} timed out`);
+        }, options.timeout);
+      }
+
+      this.pending.set(id, entry);
+      python.stdin.write(JSON.stringify({ id, method, params }) + '\n');
+    });
+  }
+
+  /**
+   * Ask the worker to finish in-flight requests and exit
+   */
+  stop() {
+    if (!this.process) return;
+    try {
+      this.process.stdin.write(JSON.stringify({ id: 'shutdown', method: 'shutdown' }) + '\n');
+      this.process.stdin.end();
+    } catch (e) {
+      this.process.kill('SIGTERM');
+    }
+  }
+}
+
+const analysisWorker = new AnalysisWorkerService();
+
+process.once('exit', () => {
+  if (analysisWorker.process) analysisWorker.process.kill('SIGTERM');
+});
+
+module.exports = analysisWorker;
@@ -2,6 +2,10 @@ const fs = require('fs');
 const path = require('path');
 const { spawn } = require('child_process');
 const xml2js = require('xml2js');
+const analysisWorker = require('./analysisWorker');
+
+// A worker request running longer than this is abandoned (and the worker restarted)
+const ANALYSIS_TIMEOUT_MS = parseInt(process.env.ANALYSIS_TIMEOUT_MS, 10) || 600000;
 
 /**
  * Enhanced SINK service with:
@@ -393,9 +397,32 @@ class SinkEnhancedService {
   }
 
   /**
-   * Run Python audio analysis script
+   * Run Python audio analysis
+   * Uses the persistent analysis worker, falling back to a one-off process
    */
   async runPythonAnalysis(audioPath, options = {}) {
+    if (analysisWorker.enabled) {
+      try {
+        return await analysisWorker.request('analyze_audio', {
+          audio_path: audioPath,
+          include_quality: !!options.includeQuality,
+          detect_highlights: !!options.detectHighlights,
+          num_highlights: options.numHighlights || 3
+        }, { timeout: ANALYSIS_TIMEOUT_MS });
+      } catch (error) {
+        // An analysis error would fail the same way in a fresh process
+        if (!analysisWorker.isUnavailable(error)) throw error;
+        console.warn(`Analysis worker unavailable, spawning analyzer: ${error.message}`);
+      }
+    }
+
+    return this.runPythonAnalysisProcess(audioPath, options);
+  }
+
+  /**
+   * Run Python audio analysis script in a one-off process
+   */
+  async runPythonAnalysisProcess(audioPath, options = {}) {
     return new Promise((resolve, reject) => {
       const args = [
         this.pythonScript,
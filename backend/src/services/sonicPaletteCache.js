@@ -41,6 +41,10 @@ class SonicPaletteCacheService {
     if (!columns.includes('style_description')) {
       this.db.exec(`ALTER TABLE sonic_palette_cache ADD COLUMN style_description TEXT NOT NULL DEFAULT ''`);
     }
+    // Per-track records from the analyzer, so refreshes only decode new tracks
+    if (!columns.includes('profile_state')) {
+      this.db.exec(`ALTER TABLE sonic_palette_cache ADD COLUMN profile_state TEXT`);
+    }
 
     console.log('Sonic Palette cache initialized');
   }
@@ -127,6 +131,22 @@ class SonicPaletteCacheService {
     };
   }
 
+  /**
+   * Stored analyzer state (per-track records) for update_track_collection,
+   * kept across invalidation and expiry; null if there is none
+   */
+  getState(userId) {
+    try {
+      const row = this.db.prepare(`
+        SELECT profile_state FROM sonic_palette_cache WHERE user_id = ?
+      `).get(userId);
+      return row && row.profile_state ? JSON.parse(row.profile_state) : null;
+    } catch (error) {
+      console.error('Failed to read sonic profile state:', error);
+      return null;
+    }
+  }
+
   /**
    * Save Sonic Palette to cache
    */
@@ -146,8 +166,9 @@ class SonicPaletteCacheService {
           confidence,
           track_count,
           track_hash,
+          profile_state,
           updated_at
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
       `).run(
         userId,
         JSON.stringify(sonicPalette.sonicPalette || []),
@@ -158,7 +179,8 @@ class SonicPaletteCacheService {
         sonicPalette.highQualityCount || 0,
         sonicPalette.confidence || 0,
         tracks.length,
-        trackHash
+        trackHash,
+        sonicPalette.state ? JSON.stringify(sonicPalette.state) : null
       );
 
       console.log(`Sonic Palette cached for user ${userId}`);
@@ -169,10 +191,11 @@ class SonicPaletteCacheService {
 
   /**
    * Invalidate cache (force refresh)
+   * The profile state survives, so the refresh only decodes new tracks
    */
   invalidateCache(userId) {
     try {
-      this.db.prepare('DELETE FROM sonic_palette_cache WHERE user_id = ?').run(userId);
+      this.db.prepare('UPDATE sonic_palette_cache SET track_hash = NULL WHERE user_id = ?').run(userId);
       console.log(`Sonic Palette cache invalidated for user ${userId}`);
     } catch (error) {
       console.error('Failed to invalidate cache:', error);
@@ -2,6 +2,7 @@ const Database = require('better-sqlite3');
 const path = require('path');
 const fs = require('fs');
 const sonicPaletteCache = require('./sonicPaletteCache');
+const analysisWorker = require('./analysisWorker');
 
 /**
  * Sonic Palette Service
@@ -87,59 +88,44 @@ class SonicPaletteService {
         valence: t.valence
       }));
 
-      // Write to temp file for Python script
-      const tmpFile = `/tmp/sonic_palette_tracks_${Date.now()}.json`;
-      fs.writeFileSync(tmpFile, JSON.stringify(tracksData));
-
-      // Run sophisticated Python analysis
-      const { spawn } = require('child_process');
-      const pythonScript = path.join(__dirname, '../python/sonic_palette_analyzer.py');
-
-      const result = await new Promise((resolve, reject) => {
-        const python = spawn('python3', [pythonScript, tmpFile, '--json']);
-
-        let stdout = '';
-        let stderr = '';
-
-        python.stdout.on('data', (data) => {
-          stdout += data.toString();
-        });
-
-        python.stderr.on('data', (data) => {
-          stderr += data.toString();
-        });
-
-        python.on('close', (code) => {
-          // Clean up temp file
-          try { fs.unlinkSync(tmpFile); } catch (e) {}
-
-          if (code !== 0) {
-            console.error('Python sonic palette analysis failed:', stderr);
-            // Fall back to simple description
-            resolve({
-              styleDescription: this.generateSimpleSonicDescription(tracks),
-              sonicPalette: [],
-              confidence: 0.5
-            });
-          } else {
-            try {
-              const analysis = JSON.parse(stdout);
-              resolve(analysis);
-            } catch (error) {
-              reject(new Error(`Failed to parse Python output: ${error.message}`));
-            }
-          }
-        });
-      });
+      // A stored profile state holds per-track records, so a refresh only
+      // decodes tracks that are new and loud enough to enter the profile
+      const state = sonicPaletteCache.getState(userId);
+
+      // Run sophisticated Python analysis (persistent worker, one-off process as fallback)
+      let result = null;
+      if (analysisWorker.enabled) {
+        try {
+          result = state
+            ? await analysisWorker.request('update_track_collection', {
+              state,
+              tracks: tracksData,
+              full_collection: true
+            }, { timeout: 240000 })
+            : await analysisWorker.request('analyze_track_collection', {
+              tracks: tracksData,
+              include_state: true
+            }, { timeout: 240000 });
+        } catch (error) {
+          // An analysis error would fail the same way in a fresh process
+          if (!analysisWorker.isUnavailable(error)) throw error;
+          console.warn(`Analysis worker unavailable, spawning analyzer: ${error.message}`);
+        }
+      }
+
+      if (!result) {
+        result = await this.runSonicPaletteProcess(tracksData, tracks, state);
+      }
 
       const sonicPalette = {
         ...result,
         trackCount: tracks.length
       };
 
-      // Cache the results for future requests
+      // Cache the results (and the state for the next refresh) for future requests
       sonicPaletteCache.saveCache(userId, sonicPalette, tracks);
 
+      delete sonicPalette.state;
       return sonicPalette;
     } catch (error) {
       console.error('Error extracting sonic palette:', error);
@@ -152,6 +138,64 @@ class SonicPaletteService {
     }
   }
 
+  /**
+   * Run sonic_palette_analyzer.py in a one-off process
+   * The profile state goes through a temp file, updated in place by --state
+   */
+  async runSonicPaletteProcess(tracksData, tracks, state = null) {
+    // Write to temp file for Python script
+    const stamp = Date.now();
+    const tmpFile = `/tmp/sonic_palette_tracks_${stamp}.json`;
+    const stateFile = `/tmp/sonic_palette_state_${stamp}.json`;
+    fs.writeFileSync(tmpFile, JSON.stringify(tracksData));
+    if (state) fs.writeFileSync(stateFile, JSON.stringify(state));
+
+    const { spawn } = require('child_process');
+    const pythonScript = path.join(__dirname, '../python/sonic_palette_analyzer.py');
+
+    return new Promise((resolve, reject) => {
+      const python = spawn('python3', [pythonScript, tmpFile, '--json', '--state', stateFile, '--full-collection']);
+
+      let stdout = '';
+      let stderr = '';
+
+      python.stdout.on('data', (data) => {
+        stdout += data.toString();
+      });
+
+      python.stderr.on('data', (data) => {
+        stderr += data.toString();
+      });
+
+      python.on('close', (code) => {
+        let updatedState = null;
+        try { updatedState = JSON.parse(fs.readFileSync(stateFile, 'utf8')); } catch (e) {}
+
+        // Clean up temp files
+        try { fs.unlinkSync(tmpFile); } catch (e) {}
+        try { fs.unlinkSync(stateFile); } catch (e) {}
+
+        if (code !== 0) {
+          console.error('Python sonic palette analysis failed:', stderr);
+          // Fall back to simple description
+          resolve({
+            styleDescription: this.generateSimpleSonicDescription(tracks),
+            sonicPalette: [],
+            confidence: 0.5
+          });
+        } else {
+          try {
+            const analysis = JSON.parse(stdout);
+            if (updatedState) analysis.state = updatedState;
+            resolve(analysis);
+          } catch (error) {
+            reject(new Error(`Failed to parse Python output: ${error.message}`));
+          }
+        }
+      });
+    });
+  }
+
   /**
    * Refresh cache for a user
    */
@@ -3,6 +3,7 @@ const path = require('path');
 const fs = require('fs');
 const axios = require('axios');
 const visualDnaCache = require('./visualDnaCache');
+const analysisWorker = require('./analysisWorker');
 
 const Tizita_API_URL = process.env.TIZITA_API_URL || process.env.Tizita_API_URL || 'http://localhost:8001/api/v1';
 
@@ -258,6 +259,9 @@ class TizitaDirectService {
         };
       }
 
+      // Pooled palette mode starts from the last palette so refreshes stay stable
+      const previousPalette = visualDnaCache.getPreviousPalette(userId);
+
       // Check cache first (unless force refresh)
       if (forceRefresh) {
         visualDnaCache.invalidateCache(userId);
@@ -277,65 +281,40 @@ class TizitaDirectService {
         tags: p.tags || []
       }));
 
-      // Write to temp file for Python script
-      const tmpFile = `/tmp/tizita_photos_${Date.now()}.json`;
-      fs.writeFileSync(tmpFile, JSON.stringify(photosData));
-
-      // Run sophisticated Python analysis
-      const { spawn } = require('child_process');
-      const pythonScript = path.join(__dirname, '../python/visual_dna_analyzer.py');
-
-      const result = await new Promise((resolve, reject) => {
-        const python = spawn('python3', [pythonScript, tmpFile, '--json']);
-
-        let stdout = '';
-        let stderr = '';
-
-        // Kill after 240s. K-means on 50 large photos takes ~67s in isolation
-        // and significantly longer under concurrent server load. 90s was too
-        // tight and caused empty palettes on every refresh.
-        const timeout = setTimeout(() => {
-          python.kill('SIGTERM');
-          try { fs.unlinkSync(tmpFile); } catch (e) {}
-          console.warn('Python visual DNA analysis timed out after 240s');
-          resolve({
-            styleDescription: this.generateSimpleStyleDescription(allPhotos),
-            colorPalette: [],
-            confidence: 0.5
-          });
-        }, 240000);
-
-        python.stdout.on('data', (data) => {
-          stdout += data.toString();
-        });
-
-        python.stderr.on('data', (data) => {
-          stderr += data.toString();
-        });
-
-        python.on('close', (code) => {
-          clearTimeout(timeout);
-          // Clean up temp file
-          try { fs.unlinkSync(tmpFile); } catch (e) {}
-
-          if (code !== 0) {
-            console.error('Python visual DNA analysis failed:', stderr);
-            // Fall back to simple description
-            resolve({
+      // Run sophisticated Python analysis (persistent worker, one-off process as fallback)
+      let result = null;
+      if (analysisWorker.enabled) {
+        try {
+          result = await analysisWorker.request(
+            'analyze_photo_collection',
+            {
+              photos: photosData,
+              quantizer: process.env.VISUAL_DNA_QUANTIZER || 'kmeans',
+              mode: process.env.VISUAL_DNA_PALETTE_MODE || 'per_photo',
+              previous_palette: previousPalette
+            },
+            { timeout: 240000 }
+          );
+        } catch (error) {
+          if (error.code === 'WORKER_TIMEOUT') {
+            console.warn('Python visual DNA analysis timed out after 240s');
+            result = {
               styleDescription: this.generateSimpleStyleDescription(allPhotos),
               colorPalette: [],
               confidence: 0.5
-            });
+            };
+          } else if (analysisWorker.isUnavailable(error)) {
+            console.warn(`Analysis worker unavailable, spawning analyzer: ${error.message}`);
           } else {
-            try {
-              const analysis = JSON.parse(stdout);
-              resolve(analysis);
-            } catch (error) {
-              reject(new Error(`Failed to parse Python output: ${error.message}`));
-            }
+            // An analysis error would fail the same way in a fresh process
+            throw error;
           }
-        });
-      });
+        }
+      }
+
+      if (!result) {
+        result = await this.runVisualDnaProcess(photosData, allPhotos, previousPalette);
+      }
 
       // Apply color rating feedback
       const colorRatingService = require('./colorRatingService');
@@ -385,6 +364,78 @@ class TizitaDirectService {
     }
   }
 
+  /**
+   * Run visual_dna_analyzer.py in a one-off process
+   */
+  async runVisualDnaProcess(photosData, allPhotos, previousPalette = []) {
+    // Write to temp file for Python script
+    const tmpFile = `/tmp/tizita_photos_${Date.now()}.json`;
+    fs.writeFileSync(tmpFile, JSON.stringify(photosData));
+
+    const { spawn } = require('child_process');
+    const pythonScript = path.join(__dirname, '../python/visual_dna_analyzer.py');
+
+    return new Promise((resolve, reject) => {
+      // Color quantizer per photo: kmeans | minibatch | mediancut
+      const quantizer = process.env.VISUAL_DNA_QUANTIZER || 'kmeans';
+      // Palette mode: per_photo | pooled (one clustering over all photos)
+      const mode = process.env.VISUAL_DNA_PALETTE_MODE || 'per_photo';
+      const args = [pythonScript, tmpFile, '--json', '--quantizer', quantizer, '--mode', mode];
+      if (previousPalette.length > 0) {
+        args.push('--previous-palette', previousPalette.join(','));
+      }
+      const python = spawn('python3', args);
+
+      let stdout = '';
+      let stderr = '';
+
+      // Kill after 240s. K-means on 50 large photos takes ~67s in isolation
+      // and significantly longer under concurrent server load. 90s was too
+      // tight and caused empty palettes on every refresh.
+      const timeout = setTimeout(() => {
+        python.kill('SIGTERM');
+        try { fs.unlinkSync(tmpFile); } catch (e) {}
+        console.warn('Python visual DNA analysis timed out after 240s');
+        resolve({
+          styleDescription: this.generateSimpleStyleDescription(allPhotos),
+          colorPalette: [],
+          confidence: 0.5
+        });
+      }, 240000);
+
+      python.stdout.on('data', (data) => {
+        stdout += data.toString();
+      });
+
+      python.stderr.on('data', (data) => {
+        stderr += data.toString();
+      });
+
+      python.on('close', (code) => {
+        clearTimeout(timeout);
+        // Clean up temp file
+        try { fs.unlinkSync(tmpFile); } catch (e) {}
+
+        if (code !== 0) {
+          console.error('Python visual DNA analysis failed:', stderr);
+          // Fall back to simple description
+          resolve({
+            styleDescription: this.generateSimpleStyleDescription(allPhotos),
+            colorPalette: [],
+            confidence: 0.5
+          });
+        } else {
+          try {
+            const analysis = JSON.parse(stdout);
+            resolve(analysis);
+          } catch (error) {
+            reject(new Error(`Failed to parse Python output: ${error.message}`));
+          }
+        }
+      });
+    });
+  }
+
   /**
    * Generate simple style description (fallback)
    */
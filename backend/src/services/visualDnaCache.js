@@ -160,6 +160,25 @@ class VisualDnaCacheService {
     }
   }
 
+  /**
+   * Hex codes of the last stored palette, valid or not (seeds pooled refreshes)
+   */
+  getPreviousPalette(userId) {
+    try {
+      const cached = this.db.prepare(`
+        SELECT color_palette FROM visual_dna_cache WHERE user_id = ?
+      `).get(userId);
+
+      if (!cached) {
+        return [];
+      }
+      return JSON.parse(cached.color_palette).map(c => c.hex).filter(Boolean);
+    } catch (error) {
+      console.error('Failed to read previous palette:', error);
+      return [];
+    }
+  }
+
   /**
    * Invalidate cache (force refresh)
    */